@@ -1,77 +1,221 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from app.api.models.chat import ChatInput
-from app.services.llm import LLMService
-from app.services.rag import RAGService
-from app.services.redis_service import RedisService
-from app.services.query_generator import QueryGenerator
+from app.api.streaming import CancellableStreamingResponse
+from app.services.admission import Admission, AdmissionRejected
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.resources import Resources
+from observability import instrumentation
+from app.core.config import settings
+from app.services.events import StreamEvent, answer_text, coalesce, encode_stream
+import asyncio
 import logging
-import json
-from typing import AsyncIterator
+import time
+from typing import AsyncIterator, List, Optional
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["chat"])
-llm_service = LLMService()
-rag_service = RAGService()
-redis_service = RedisService()
-query_generator = QueryGenerator(llm_service)
 
+STREAMS_ABANDONED = instrumentation.Counter(
+    "chat_streams_abandoned_total",
+    "Chat turns whose client disconnected before the answer was complete.",
+    ("phase",),
+)
+TURNS_REJECTED = instrumentation.Counter(
+    "chat_turns_rejected_total",
+    "Chat turns turned away with a 429 by admission control.",
+    ("reason",),
+)
 
-async def process_request(chat_id: str, user_input: str) -> AsyncIterator[str]:
-    try:
-        yield f"data: {json.dumps({'text': 'Starting request processing...', 'type': 'system'})}\n\n"
 
-        chat_history = await redis_service.get_chat_history(chat_id)
+def get_resources(request: Request) -> Resources:
+    return request.app.state.resources
+
 
-        print(chat_history)
+async def process_request(
+    resources: Resources,
+    chat_id: str,
+    user_input: str,
+    admission: Optional[Admission] = None,
+) -> AsyncIterator[StreamEvent]:
+    """Stream one chat turn.
 
-        yield f"data: {json.dumps({'text': 'Generating optimized query...', 'type': 'system'})}\n\n"
-        optimized_query = await query_generator.generate_optimized_query(
-            user_input, chat_history
+    If the client disconnects, the stream is cancelled wherever it is
+    (retrieval or generation); the aborted turn is counted and not written
+    to history or the answer cache. ``admission`` is released when the
+    stream ends, however it ends.
+    """
+    phase = "retrieval"
+    events: List[StreamEvent] = []
+    try:
+        yield StreamEvent.system("Starting request processing...")
+
+        yield StreamEvent.system("Generating optimized query...")
+        yield StreamEvent.system("Retrieving relevant context...")
+        orchestrated = await resources.orchestrator.run(
+            chat_id,
+            "default_user",
+            user_input,
+            include_embedding=settings.ANSWER_CACHE_ENABLED,
+        )
+        retrieval = orchestrated.retrieval
+        with instrumentation.span("pack"):
+            packed = resources.context_packer.pack(
+                retrieval.chunks, orchestrated.chat_history, orchestrated.summary.text
+            )
+        context = packed.context
+        logger.info(
+            "Context packed",
+            extra={
+                "props": {
+                    "chat_id": chat_id,
+                    "tokens": packed.tokens,
+                    "budget": resources.context_packer.budget,
+                    "turns_used": packed.turns_used,
+                    "chunks_used": packed.chunks_used,
+                    "chunks_dropped": packed.chunks_dropped,
+                }
+            },
         )
 
-        yield f"data: {json.dumps({'text': 'Retrieving relevant context...', 'type': 'system'})}\n\n"
-        context = await rag_service.get_relevant_context(
-            "default_user", optimized_query
+        cacheable = settings.ANSWER_CACHE_ENABLED and retrieval.query_embedding
+        fingerprint = SemanticAnswerCache.fingerprint(context, packed.history)
+        cached = (
+            resources.answer_cache.lookup(retrieval.query_embedding, fingerprint)
+            if cacheable
+            else None
         )
+        if cached is not None:
+            logger.info(
+                "Answer cache hit",
+                extra={
+                    "props": {"chat_id": chat_id, **resources.answer_cache.stats()}
+                },
+            )
+            phase = "replay"
+            for event in cached.events:
+                events.append(event)
+                yield event
+            phase = None
+            await resources.redis_service.append_turn(
+                chat_id,
+                {"role": "user", "content": user_input},
+                {"role": "assistant", "content": answer_text(cached.events)},
+            )
+            resources.history_summarizer.schedule(chat_id)
+            return
 
         if not context:
             context = "No relevant context found"
 
         full_context = {
-            "chat_history": chat_history,
+            "chat_history": packed.history,
             "current_input": user_input,
             "retrieved_context": context,
         }
 
         # Generate response
-        response_text = ""
-        async for chunk in llm_service.generate_stream(user_input, full_context):
-            response_text += json.loads(chunk.split("data: ")[1])["text"]
-            yield chunk
+        phase = "generation"
+        started = time.perf_counter()
+        first_token = True
+        stream = resources.llm_service.generate_stream(user_input, full_context)
+        async for event in stream:
+            if first_token and event.type == "assistant":
+                instrumentation.record("ttft", time.perf_counter() - started)
+                first_token = False
+            events.append(event)
+            yield event
+        instrumentation.record("generation", time.perf_counter() - started)
+        phase = None
+        response_text = answer_text(events)
+        failed = any(event.type == "error" for event in events)
+
+        if cacheable and not failed:
+            resources.answer_cache.store(
+                retrieval.query_embedding,
+                fingerprint,
+                events,
+                generation_ms=(time.perf_counter() - started) * 1000,
+            )
 
         # Store in Redis
-        await redis_service.append_to_history(
-            chat_id, {"role": "user", "content": user_input}
-        )
-        await redis_service.append_to_history(
-            chat_id, {"role": "assistant", "content": response_text}
+        await resources.redis_service.append_turn(
+            chat_id,
+            {"role": "user", "content": user_input},
+            {"role": "assistant", "content": response_text},
         )
+        resources.history_summarizer.schedule(chat_id)
 
+    except (asyncio.CancelledError, GeneratorExit):
+        if phase is not None:
+            STREAMS_ABANDONED.inc(phase)
+            logger.info(
+                "Stream abandoned",
+                extra={
+                    "props": {
+                        "chat_id": chat_id,
+                        "phase": phase,
+                        "delivered_chars": len(answer_text(events)),
+                    }
+                },
+            )
+        raise
     except Exception as e:
         logger.error("Error in request processing", extra={"props": {"error": str(e)}})
-        yield f"data: {json.dumps({'text': f'Error: {str(e)}', 'type': 'error'})}\n\n"
+        yield StreamEvent.error(f"Error: {str(e)}")
+    finally:
+        if admission is not None:
+            admission.release()
 
 
 @router.post(
     "/chat",
     response_class=StreamingResponse,
     summary="Chat Endpoint",
-    description="Streams a chat response using RAG and agents with chat history",
+    description="Streams a chat response using RAG and agents with chat history. Generation stops as soon as the client disconnects. Only one turn per chat runs at a time; when the service is at capacity, or the chat already has a turn running, it answers 429 with a Retry-After header.",
+    responses={429: {"description": "Too many concurrent chat turns"}},
 )
-async def chat_endpoint(chat_input: ChatInput):
-    return StreamingResponse(
-        process_request(chat_input.chat_id, chat_input.input),
-        media_type="text/event-stream",
-    )
+async def chat_endpoint(
+    chat_input: ChatInput, resources: Resources = Depends(get_resources)
+):
+    admission_controller = resources.admission_controller
+    try:
+        admission = await admission_controller.admit(chat_input.chat_id)
+    except AdmissionRejected as e:
+        TURNS_REJECTED.inc(e.reason)
+        logger.warning(
+            "Chat turn rejected",
+            extra={
+                "props": {
+                    "chat_id": chat_input.chat_id,
+                    "reason": e.reason,
+                    **admission_controller.stats(),
+                }
+            },
+        )
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many concurrent chat turns ({e.reason})",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    # The slots are held until the stream ends, however it ends: the stream
+    # and the response both release them (``release`` is idempotent), and so
+    # does a failure before the response exists.
+    try:
+        return CancellableStreamingResponse(
+            encode_stream(
+                coalesce(
+                    process_request(
+                        resources, chat_input.chat_id, chat_input.input, admission
+                    ),
+                    window_ms=settings.SSE_COALESCE_WINDOW_MS,
+                    max_bytes=settings.SSE_COALESCE_MAX_BYTES,
+                )
+            ),
+            media_type="text/event-stream",
+            on_close=admission.release,
+        )
+    except BaseException:
+        admission.release()
+        raise
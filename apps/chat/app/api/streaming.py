@@ -0,0 +1,53 @@
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+from typing import Callable, Optional
+import asyncio
+
+
+class CancellableStreamingResponse(StreamingResponse):
+    """A StreamingResponse that stops producing as soon as the client leaves.
+
+    The body is streamed in one task while another waits for
+    ``http.disconnect``; whichever ends first cancels the other. The body
+    iterator is then closed explicitly, so the generators feeding it
+    (retrieval, the LLM stream) are cancelled immediately instead of running
+    on until the abandoned generator happens to be garbage collected. Unlike
+    Starlette's ASGI 2.4 path this also notices a disconnect while nothing is
+    being written, e.g. before the first token.
+
+    ``on_close`` runs once the body has been closed, however the response
+    ended, e.g. to release the resources a stream was admitted with.
+    """
+
+    def __init__(self, *args, on_close: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stream = asyncio.create_task(self._stream(send))
+        watcher = asyncio.create_task(self.listen_for_disconnect(receive))
+        try:
+            await asyncio.wait({stream, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stream.cancel()
+            watcher.cancel()
+            await asyncio.gather(stream, watcher, return_exceptions=True)
+            try:
+                aclose = getattr(self.body_iterator, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+            finally:
+                if self.on_close is not None:
+                    self.on_close()
+
+        if not stream.cancelled() and stream.exception() is not None:
+            raise stream.exception()
+        if self.background is not None:
+            await self.background()
+
+    async def _stream(self, send: Send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            # The connection is gone; treat it like http.disconnect.
+            pass
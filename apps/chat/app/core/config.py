@@ -1,17 +1,27 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 import os
 
+# Concurrent embedding-service calls per chat turn: the raw and the rewritten
+# query are retrieved side by side (see RetrievalOrchestrator).
+RETRIEVALS_PER_TURN = 2
+
 
 class Settings(BaseSettings):
     # API Settings
     API_V1_STR: str = ""
     PROJECT_NAME: str = "RAGing Service"
+    LOG_LEVEL: str = "INFO"
 
     # LLM Settings
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
     MODEL_NAME: str = "gpt-3.5-turbo"
     TEMPERATURE: float = 0.7
+    LLM_TIMEOUT_SECONDS: float = 60
+    LLM_MAX_CONNECTIONS: int = 100  # covers ADMISSION_MAX_CONCURRENT streams
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 64
 
     # CORS Settings
     BACKEND_CORS_ORIGINS: list[str] = ["*"]
@@ -19,12 +29,80 @@ class Settings(BaseSettings):
     # Embedding Service Settings
     EMBEDDING_SERVICE_URL: str = "http://localhost:8000"
     EMBEDDING_SERVICE_ENDPOINT: str = "/api/retrieve"
+    EMBEDDING_TIMEOUT_SECONDS: float = 30
+    EMBEDDING_HTTP2: bool = True  # needs TLS or an h2-capable proxy, else HTTP/1.1
+    # Unset, the pool is sized for every admitted turn retrieving at once
+    # (ADMISSION_MAX_CONCURRENT * RETRIEVALS_PER_TURN) and keeps one idle
+    # connection per admitted turn; a smaller explicit cap is rejected.
+    EMBEDDING_MAX_CONNECTIONS: Optional[int] = None
+    EMBEDDING_MAX_KEEPALIVE_CONNECTIONS: Optional[int] = None
+
+    # HTTP Client Pool Settings (shared by the LLM and embedding clients)
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60
+
+    # Redis / Chat History Settings
+    REDIS_HOST: str = "127.0.0.1"
+    REDIS_PORT: int = 6379
+    CHAT_HISTORY_WINDOW: int = 20
+    CHAT_HISTORY_MAX_LENGTH: Optional[int] = None
+    CHAT_HISTORY_TTL_SECONDS: Optional[int] = None
+
+    # Query Rewrite Settings
+    QUERY_REWRITE_HISTORY_WINDOW: int = 3
+    QUERY_REWRITE_CACHE_SIZE: int = 1024
+    QUERY_REWRITE_MIN_WORDS: int = 6
+
+    # Retrieval Orchestration Settings
+    RETRIEVAL_MODE: str = "concurrent"  # "concurrent" or "sequential"
+    RETRIEVAL_DEADLINE_MS: float = 2500
+
+    # Semantic Answer Cache Settings
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    ANSWER_CACHE_TTL_SECONDS: float = 3600
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+
+    # Context Assembly Settings
+    CONTEXT_TOKEN_BUDGET: int = 6000
+    CONTEXT_RESERVED_TOKENS: int = 1500  # prompt template and the answer
+    CONTEXT_HISTORY_SHARE: float = 0.35
+    SUMMARY_ENABLED: bool = True
+    SUMMARY_MIN_NEW_MESSAGES: int = 8
+    SUMMARY_MAX_WORDS: int = 250
+
+    # Streaming Settings (a window of 0 sends every token as its own frame)
+    SSE_COALESCE_WINDOW_MS: float = 20
+    SSE_COALESCE_MAX_BYTES: int = 1024
+
+    # Admission Control Settings (turns over the caps get a 429)
+    ADMISSION_MAX_CONCURRENT: int = 64
+    ADMISSION_MAX_PER_CHAT: int = 1  # more lets turns interleave history writes
+    ADMISSION_MAX_QUEUED: int = 128
+    ADMISSION_QUEUE_TIMEOUT_MS: float = 2000
+    ADMISSION_RETRY_AFTER_SECONDS: int = 2
 
     class Config:
         env_file = ".env"
         case_sensitive = True
         extra = "ignore"
 
+    @model_validator(mode="after")
+    def size_embedding_pool(self) -> "Settings":
+        admitted = self.ADMISSION_MAX_CONCURRENT * RETRIEVALS_PER_TURN
+        if self.EMBEDDING_MAX_CONNECTIONS is None:
+            self.EMBEDDING_MAX_CONNECTIONS = admitted
+        elif self.EMBEDDING_MAX_CONNECTIONS < admitted:
+            raise ValueError(
+                f"EMBEDDING_MAX_CONNECTIONS={self.EMBEDDING_MAX_CONNECTIONS} is below "
+                f"the admitted load of {admitted} concurrent retrievals "
+                f"(ADMISSION_MAX_CONCURRENT={self.ADMISSION_MAX_CONCURRENT} x "
+                f"{RETRIEVALS_PER_TURN}); raise it or lower ADMISSION_MAX_CONCURRENT"
+            )
+        if self.EMBEDDING_MAX_KEEPALIVE_CONNECTIONS is None:
+            self.EMBEDDING_MAX_KEEPALIVE_CONNECTIONS = self.ADMISSION_MAX_CONCURRENT
+        return self
+
 
 @lru_cache()
 def get_settings() -> Settings:
@@ -1,16 +1,40 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
-from app.core.logging import setup_logging
+from observability.instrumentation import (
+    METRICS_CONTENT_TYPE,
+    Gauge,
+    InstrumentationMiddleware,
+    render_metrics,
+)
+from observability.logging import setup_logging, shutdown_logging
 from app.api.routes import chat
+from app.services.resources import Resources
 import logging
 
 # Setup logging
-setup_logging()
+setup_logging(settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Starting up the application")
+    # Tests may install their own Resources (with fake clients) beforehand.
+    resources = getattr(app.state, "resources", None) or Resources()
+    app.state.resources = resources
+    yield
+    logger.info("Shutting down the application")
+    await resources.aclose()
+    shutdown_logging()
+
+
 app = FastAPI(
-    title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    title=settings.PROJECT_NAME,
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -20,17 +44,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
 )
+app.add_middleware(InstrumentationMiddleware)
 
 # Include routers
 app.include_router(chat.router, prefix=settings.API_V1_STR)
 
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Starting up the application")
+def _admission_stat(name: str):
+    def read() -> int:
+        resources = getattr(app.state, "resources", None)
+        return resources.admission_controller.stats()[name] if resources else 0
 
+    return read
+
+
+Gauge(
+    "chat_turns_running", "Chat turns currently streaming.", _admission_stat("running")
+)
+Gauge(
+    "chat_turns_queued", "Chat turns waiting for a free slot.", _admission_stat("queued")
+)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Shutting down the application")
@@ -0,0 +1,104 @@
+from observability import instrumentation
+from app.core.config import settings
+from typing import Dict
+import asyncio
+import time
+
+
+class AdmissionRejected(Exception):
+    """A chat turn was turned away; retry after ``retry_after`` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Admission:
+    """A running turn's hold on its slots. ``release`` is idempotent."""
+
+    def __init__(self, controller: "AdmissionController", chat_id: str):
+        self._controller = controller
+        self.chat_id = chat_id
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self.chat_id)
+
+
+class AdmissionController:
+    """Caps how many chat turns stream at once.
+
+    At most ``max_concurrent`` turns run globally and ``max_per_chat`` per
+    chat (one by default, so a chat's history is never written by two turns
+    at the same time). A turn for a busy chat is rejected straight away;
+    when only the global cap is reached, up to ``max_queued`` turns wait for
+    a slot, each for at most ``queue_timeout_ms``, and the rest are rejected.
+    Rejections carry a ``Retry-After`` hint instead of letting every running
+    turn slow down together.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = settings.ADMISSION_MAX_CONCURRENT,
+        max_per_chat: int = settings.ADMISSION_MAX_PER_CHAT,
+        max_queued: int = settings.ADMISSION_MAX_QUEUED,
+        queue_timeout_ms: float = settings.ADMISSION_QUEUE_TIMEOUT_MS,
+        retry_after_seconds: int = settings.ADMISSION_RETRY_AFTER_SECONDS,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_chat = max_per_chat
+        self.max_queued = max_queued
+        self.queue_timeout_ms = queue_timeout_ms
+        self.retry_after_seconds = retry_after_seconds
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._chats: Dict[str, int] = {}
+        self.running = 0
+        self.queued = 0
+
+    async def admit(self, chat_id: str) -> Admission:
+        """Wait for a slot for a turn of ``chat_id``; raises ``AdmissionRejected``."""
+        if self._chats.get(chat_id, 0) >= self.max_per_chat:
+            raise AdmissionRejected("chat_busy", self.retry_after_seconds)
+        if self._slots.locked() and self.queued >= self.max_queued:
+            raise AdmissionRejected("queue_full", self.retry_after_seconds)
+
+        # Reserve the chat while queued, so a duplicate is rejected right away.
+        self._chats[chat_id] = self._chats.get(chat_id, 0) + 1
+        if not self._slots.locked():
+            await self._slots.acquire()
+        else:
+            self.queued += 1
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(
+                    self._slots.acquire(), timeout=self.queue_timeout_ms / 1000
+                )
+            except asyncio.TimeoutError:
+                self._leave_chat(chat_id)
+                raise AdmissionRejected("queue_timeout", self.retry_after_seconds)
+            except BaseException:
+                self._leave_chat(chat_id)
+                raise
+            finally:
+                self.queued -= 1
+                instrumentation.record("admission", time.perf_counter() - started)
+        self.running += 1
+        return Admission(self, chat_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {"running": self.running, "queued": self.queued}
+
+    def _release(self, chat_id: str):
+        self.running -= 1
+        self._leave_chat(chat_id)
+        self._slots.release()
+
+    def _leave_chat(self, chat_id: str):
+        remaining = self._chats.get(chat_id, 0) - 1
+        if remaining > 0:
+            self._chats[chat_id] = remaining
+        else:
+            self._chats.pop(chat_id, None)
@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import hashlib
+import itertools
+import time
+import numpy as np
+from app.core.config import settings
+from app.services.events import StreamEvent
+
+
+@dataclass
+class CachedAnswer:
+    vector: np.ndarray
+    fingerprint: str
+    events: List[StreamEvent]
+    created_at: float
+    generation_ms: float
+
+
+class SemanticAnswerCache:
+    """Bounded, TTL'd cache of generated answers keyed by query meaning.
+
+    An entry matches when its query embedding has cosine similarity of at
+    least ``similarity_threshold`` with the new query *and* it was generated
+    from the same prompt context (by fingerprint): the retrieved documents
+    and the packed conversation history, rolling summary included. Answers
+    are invalidated as soon as the documents change, and a follow-up such as
+    "and the second one?" is never answered from another conversation.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = settings.ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold: float = settings.ANSWER_CACHE_SIMILARITY,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: OrderedDict[int, CachedAnswer] = OrderedDict()
+        self._by_fingerprint: Dict[str, List[int]] = {}
+        self._ids = itertools.count()
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved_ms = 0.0
+
+    @staticmethod
+    def fingerprint(context: str, history: str = "") -> str:
+        digest = hashlib.sha256(context.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(history.encode("utf-8"))
+        return digest.hexdigest()
+
+    def lookup(
+        self, embedding: List[float], fingerprint: str
+    ) -> Optional[CachedAnswer]:
+        now = time.monotonic()
+        candidates = []
+        for entry_id in list(self._by_fingerprint.get(fingerprint, [])):
+            entry = self._entries[entry_id]
+            if now - entry.created_at > self.ttl_seconds:
+                self._evict(entry_id)
+            else:
+                candidates.append(entry_id)
+
+        if candidates:
+            vectors = np.stack([self._entries[i].vector for i in candidates])
+            similarities = vectors @ self._normalize(embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                entry_id = candidates[best]
+                self._entries.move_to_end(entry_id)
+                entry = self._entries[entry_id]
+                self.hits += 1
+                self.latency_saved_ms += entry.generation_ms
+                return entry
+
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        embedding: List[float],
+        fingerprint: str,
+        events: List[StreamEvent],
+        generation_ms: float,
+    ):
+        entry_id = next(self._ids)
+        self._entries[entry_id] = CachedAnswer(
+            vector=self._normalize(embedding),
+            fingerprint=fingerprint,
+            events=events,
+            created_at=time.monotonic(),
+            generation_ms=generation_ms,
+        )
+        self._by_fingerprint.setdefault(fingerprint, []).append(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "latency_saved_ms": round(self.latency_saved_ms, 2),
+        }
+
+    def _evict(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        ids = self._by_fingerprint[entry.fingerprint]
+        ids.remove(entry_id)
+        if not ids:
+            del self._by_fingerprint[entry.fingerprint]
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
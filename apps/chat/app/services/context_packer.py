@@ -0,0 +1,112 @@
+from app.core.config import settings
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+import tiktoken
+
+# Context windows of the chat models we deploy; unknown models fall back to
+# the smallest so the budget is never larger than the model accepts.
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+
+@lru_cache()
+def get_encoding(model_name: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def context_budget(model_name: str) -> int:
+    window = MODEL_CONTEXT_WINDOWS.get(model_name, DEFAULT_CONTEXT_WINDOW)
+    available = window - settings.CONTEXT_RESERVED_TOKENS
+    return max(0, min(settings.CONTEXT_TOKEN_BUDGET, available))
+
+
+@dataclass
+class PackedContext:
+    history: str
+    context: str
+    tokens: int
+    turns_used: int
+    chunks_used: int
+    chunks_dropped: int
+
+
+class ContextPacker:
+    """Assembles the prompt context within a token budget.
+
+    Up to ``history_share`` of the budget goes to conversation memory: the
+    rolling summary of older turns (capped at half of that share), then the
+    most recent turns, newest first. Retrieved chunks fill the rest in rank order; a chunk that
+    doesn't fit is skipped so smaller, lower-ranked ones can still be used.
+    """
+
+    def __init__(
+        self,
+        model_name: str = settings.MODEL_NAME,
+        budget: Optional[int] = None,
+        history_share: float = settings.CONTEXT_HISTORY_SHARE,
+    ):
+        self.encoding = get_encoding(model_name)
+        self.budget = context_budget(model_name) if budget is None else budget
+        self.history_share = history_share
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def pack(
+        self, chunks: List[dict], chat_history: List[Dict], summary: str = ""
+    ) -> PackedContext:
+        history_budget = int(self.budget * self.history_share)
+        used = 0
+
+        summary_text = ""
+        if summary:
+            summary_budget = history_budget // 2
+            summary_text = f"Summary of earlier conversation: {summary}"
+            summary_tokens = self.count(summary_text)
+            if summary_tokens > summary_budget:
+                summary_text = self._truncate(summary_text, summary_budget)
+                summary_tokens = summary_budget
+            used += summary_tokens
+
+        turns: List[str] = []
+        for message in reversed(chat_history):
+            role = "User" if message["role"] == "user" else "Assistant"
+            line = f"{role}: {message['content']}"
+            tokens = self.count(line)
+            if used + tokens > history_budget:
+                break
+            turns.append(line)
+            used += tokens
+        turns.reverse()
+
+        selected: List[str] = []
+        for chunk in chunks:
+            tokens = self.count(chunk["text"])
+            if used + tokens > self.budget:
+                continue
+            selected.append(chunk["text"])
+            used += tokens
+
+        history = "\n".join(([summary_text] if summary_text else []) + turns)
+        return PackedContext(
+            history=history,
+            context="\n\n".join(selected),
+            tokens=used,
+            turns_used=len(turns),
+            chunks_used=len(selected),
+            chunks_dropped=len(chunks) - len(selected),
+        )
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        encoded = self.encoding.encode(text, disallowed_special=())
+        return self.encoding.decode(encoded[:tokens])
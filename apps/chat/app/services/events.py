@@ -0,0 +1,122 @@
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Iterator, List
+import asyncio
+import orjson
+
+
+@dataclass(frozen=True, slots=True)
+class StreamEvent:
+    """One server-sent event of the chat stream, serialized only at the edge."""
+
+    type: str  # "system", "assistant" or "error"
+    text: str
+
+    @classmethod
+    def system(cls, text: str) -> "StreamEvent":
+        return cls("system", text)
+
+    @classmethod
+    def assistant(cls, text: str) -> "StreamEvent":
+        return cls("assistant", text)
+
+    @classmethod
+    def error(cls, text: str) -> "StreamEvent":
+        return cls("error", text)
+
+    def encode(self) -> bytes:
+        payload = orjson.dumps({"text": self.text, "type": self.type})
+        return b"data: " + payload + b"\n\n"
+
+
+def answer_text(events: Iterable[StreamEvent]) -> str:
+    return "".join(event.text for event in events if event.type == "assistant")
+
+
+async def coalesce(
+    events: AsyncIterator[StreamEvent], window_ms: float, max_bytes: int
+) -> AsyncIterator[StreamEvent]:
+    """Merge runs of assistant tokens into fewer events.
+
+    A reader task drains ``events`` into a buffer; the buffer is flushed
+    ``window_ms`` after its first event arrives, or immediately once it holds
+    ``max_bytes`` of text or any non-assistant event. Consecutive assistant
+    tokens in a flush are sent as one event. A window of 0 disables
+    coalescing. Closing the coalesced stream cancels the reader, and with it
+    whatever ``events`` is awaiting.
+    """
+    if window_ms <= 0:
+        async with aclosing(events):
+            async for event in events:
+                yield event
+        return
+
+    buffer: List[StreamEvent] = []
+    buffered_bytes = 0
+    finished = False
+    ready = asyncio.Event()
+    flush_now = asyncio.Event()
+
+    async def read():
+        nonlocal buffered_bytes, finished
+        try:
+            async for event in events:
+                buffer.append(event)
+                if event.type == "assistant":
+                    buffered_bytes += len(event.text.encode("utf-8"))
+                    if buffered_bytes >= max_bytes:
+                        flush_now.set()
+                else:
+                    flush_now.set()
+                ready.set()
+        finally:
+            finished = True
+            flush_now.set()
+            ready.set()
+
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            await ready.wait()
+            if not flush_now.is_set():
+                try:
+                    await asyncio.wait_for(flush_now.wait(), window_ms / 1000)
+                except asyncio.TimeoutError:
+                    pass
+            batch = buffer[:]
+            buffer.clear()
+            buffered_bytes = 0
+            ready.clear()
+            flush_now.clear()
+            for event in _merge_tokens(batch, max_bytes):
+                yield event
+            if finished and not buffer:
+                break
+        await reader
+    finally:
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+
+
+def _merge_tokens(batch: List[StreamEvent], max_bytes: int) -> Iterator[StreamEvent]:
+    tokens: List[str] = []
+    size = 0
+    for event in batch:
+        if event.type == "assistant":
+            tokens.append(event.text)
+            size += len(event.text.encode("utf-8"))
+            if size < max_bytes:
+                continue
+        if tokens:
+            yield StreamEvent.assistant("".join(tokens))
+            tokens, size = [], 0
+        if event.type != "assistant":
+            yield event
+    if tokens:
+        yield StreamEvent.assistant("".join(tokens))
+
+
+async def encode_stream(events: AsyncIterator[StreamEvent]) -> AsyncIterator[bytes]:
+    async with aclosing(events):
+        async for event in events:
+            yield event.encode()
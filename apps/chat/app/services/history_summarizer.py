@@ -0,0 +1,93 @@
+from app.core.config import settings
+from app.services.llm import LLMService
+from app.services.redis_service import RedisService
+from typing import Dict, List
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class HistorySummarizer:
+    """Maintains a rolling summary of turns that fell out of the history window.
+
+    After a turn is stored, ``schedule`` folds messages older than the last
+    ``keep_recent`` into the existing summary in a background task, once at
+    least ``min_new_messages`` of them have accumulated. Requests only ever
+    read the stored summary, so it is never recomputed on the request path.
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisService,
+        llm_service: LLMService,
+        keep_recent: int = settings.CHAT_HISTORY_WINDOW,
+        min_new_messages: int = settings.SUMMARY_MIN_NEW_MESSAGES,
+        max_words: int = settings.SUMMARY_MAX_WORDS,
+    ):
+        self.redis_service = redis_service
+        self.llm_service = llm_service
+        self.keep_recent = keep_recent
+        self.min_new_messages = min_new_messages
+        self.max_words = max_words
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def schedule(self, chat_id: str):
+        if not settings.SUMMARY_ENABLED or chat_id in self._tasks:
+            return
+        task = asyncio.create_task(self._summarize(chat_id))
+        self._tasks[chat_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(chat_id, None))
+
+    async def close(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _summarize(self, chat_id: str):
+        started = time.perf_counter()
+        try:
+            backlog = await self.redis_service.get_summary_backlog(
+                chat_id, self.keep_recent
+            )
+            summary, messages, covered = backlog
+            if len(messages) < self.min_new_messages:
+                return
+            text = await self.llm_service.summarize(
+                self._create_summary_prompt(summary.text, messages)
+            )
+            await self.redis_service.save_summary(chat_id, text.strip(), covered)
+            logger.info(
+                "Chat summary updated",
+                extra={
+                    "props": {
+                        "chat_id": chat_id,
+                        "summarized_messages": len(messages),
+                        "covered": covered,
+                        "summary_ms": round(
+                            (time.perf_counter() - started) * 1000, 2
+                        ),
+                    }
+                },
+            )
+        except Exception as e:
+            logger.error(
+                "Error updating chat summary",
+                extra={"props": {"chat_id": chat_id, "error": str(e)}},
+            )
+
+    def _create_summary_prompt(self, summary: str, messages: List[Dict]) -> str:
+        conversation = "\n".join(
+            f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
+            for msg in messages
+        )
+        return f"""Update the running summary of a conversation with the new messages below.
+
+Current Summary:
+{summary or "(none)"}
+
+New Messages:
+{conversation}
+
+Write the updated summary in at most {self.max_words} words. Keep facts, decisions and open questions the user may refer back to; drop pleasantries."""
@@ -2,27 +2,32 @@ from langchain_openai import ChatOpenAI
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
-from typing import AsyncIterator
+from typing import AsyncIterator, Optional
+import httpx
 import logging
 from app.core.config import settings
-import json
+from app.services.events import StreamEvent
 
 logger = logging.getLogger(__name__)
 
 
 class LLMService:
-    def __init__(self):
+    """Answers, query rewrites and summaries from one chat model.
+
+    The three model configurations are built once and share ``http_client``,
+    so every call reuses the pool's open keep-alive connections. The client
+    belongs to the caller, which closes it.
+    """
+
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         self.api_key = settings.OPENAI_API_KEY
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
 
         # Initialize LLM with streaming
-        self.llm = ChatOpenAI(
-            api_key=self.api_key,
-            model=settings.MODEL_NAME,
-            temperature=settings.TEMPERATURE,
-            streaming=True,
-        )
+        self.llm = self._chat_model(http_client, settings.TEMPERATURE, streaming=True)
+        self.query_llm = self._chat_model(http_client, 0.3)
+        self.summary_llm = self._chat_model(http_client, 0)
 
         # Create prompt template
         self.prompt = ChatPromptTemplate.from_template(
@@ -59,11 +64,25 @@ class LLMService:
             llm=self.llm, prompt=self.prompt
         )
 
+    def _chat_model(
+        self,
+        http_client: Optional[httpx.AsyncClient],
+        temperature: float,
+        streaming: bool = False,
+    ) -> ChatOpenAI:
+        return ChatOpenAI(
+            api_key=self.api_key,
+            model=settings.MODEL_NAME,
+            temperature=temperature,
+            streaming=streaming,
+            http_async_client=http_client,
+        )
+
     async def generate_stream(
         self, query: str, full_context: dict
-    ) -> AsyncIterator[str]:
+    ) -> AsyncIterator[StreamEvent]:
         try:
-            yield f"data: {json.dumps({'text': 'Processing query...', 'type': 'system'})}\n\n"
+            yield StreamEvent.system("Processing query...")
 
             context_str = f"""
 Chat History:
@@ -78,27 +97,28 @@ Retrieved Context:
             async for chunk in self.document_chain.astream(
                 {"input": query, "context": [doc]}
             ):
-                if isinstance(chunk, str):
-                    yield f"data: {json.dumps({'text': chunk, 'type': 'assistant'})}\n\n"
-                else:
-                    yield f"data: {json.dumps({'text': str(chunk), 'type': 'assistant'})}\n\n"
+                yield StreamEvent.assistant(
+                    chunk if isinstance(chunk, str) else str(chunk)
+                )
 
         except Exception as e:
             logger.error(f"Error in generate_stream: {str(e)}")
-            yield f"data: {json.dumps({'text': f'Error: {str(e)}', 'type': 'error'})}\n\n"
+            yield StreamEvent.error(f"Error: {str(e)}")
 
     async def generate_query(self, prompt: str) -> str:
         try:
-            non_streaming_llm = ChatOpenAI(
-                api_key=self.api_key,
-                model=settings.MODEL_NAME,
-                temperature=0.3,
-                streaming=False,
-            )
-
-            response = await non_streaming_llm.ainvoke(prompt)
+            response = await self.query_llm.ainvoke(prompt)
             return response.content
 
         except Exception as e:
             logger.error(f"Error in generate_query: {str(e)}")
             raise
+
+    async def summarize(self, prompt: str) -> str:
+        try:
+            response = await self.summary_llm.ainvoke(prompt)
+            return response.content
+
+        except Exception as e:
+            logger.error(f"Error in summarize: {str(e)}")
+            raise
@@ -1,16 +1,110 @@
 from app.services.llm import LLMService
+from app.core.config import settings
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import List, Dict
+import hashlib
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Words that usually point back at earlier turns ("what about it?",
+# "do the same for those"); their presence means the input needs rewriting.
+REFERENTIAL_TERMS = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|their|he|she|him|her|"
+    r"above|previous|earlier|same|again|also|another|ones|former|latter|"
+    r"else|instead)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class RewriteResult:
+    query: str
+    path: str  # "no_history", "self_contained", "cache_hit", "llm" or "deadline"
+    duration_ms: float
+
 
 class QueryGenerator:
+    """Decides per turn whether the LLM query rewrite is worth its round trip.
+
+    The rewrite is skipped when there is no history or the input does not
+    refer back to it, and LLM rewrites are cached by (recent history, input)
+    in a bounded LRU.
+    """
+
     def __init__(self, llm_service: LLMService):
         self.llm_service = llm_service
+        self.history_window = settings.QUERY_REWRITE_HISTORY_WINDOW
+        self.cache_size = settings.QUERY_REWRITE_CACHE_SIZE
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self.path_counts: Dict[str, int] = {}
 
     async def generate_optimized_query(
         self, current_input: str, chat_history: List[Dict]
     ) -> str:
-        prompt = self._create_query_generation_prompt(current_input, chat_history)
-        query = await self.llm_service.generate_query(prompt)
-        return query
+        return (await self.rewrite(current_input, chat_history)).query
+
+    async def rewrite(
+        self, current_input: str, chat_history: List[Dict]
+    ) -> RewriteResult:
+        started = time.perf_counter()
+        recent = chat_history[-self.history_window :] if self.history_window else []
+
+        if not recent:
+            path, query = "no_history", current_input
+        elif self._is_self_contained(current_input):
+            path, query = "self_contained", current_input
+        else:
+            key = self._cache_key(current_input, recent)
+            query = self._cache.get(key)
+            if query is not None:
+                self._cache.move_to_end(key)
+                path = "cache_hit"
+            else:
+                prompt = self._create_query_generation_prompt(current_input, recent)
+                query = await self.llm_service.generate_query(prompt)
+                path = "llm"
+                self._remember(key, query)
+
+        result = RewriteResult(
+            query=query,
+            path=path,
+            duration_ms=(time.perf_counter() - started) * 1000,
+        )
+        self.path_counts[path] = self.path_counts.get(path, 0) + 1
+        logger.info(
+            "Query rewrite",
+            extra={
+                "props": {
+                    "rewrite_path": result.path,
+                    "rewrite_ms": round(result.duration_ms, 2),
+                }
+            },
+        )
+        return result
+
+    def _is_self_contained(self, current_input: str) -> bool:
+        words = current_input.split()
+        return (
+            len(words) >= settings.QUERY_REWRITE_MIN_WORDS
+            and not REFERENTIAL_TERMS.search(current_input)
+        )
+
+    def _cache_key(self, current_input: str, recent: List[Dict]) -> str:
+        payload = json.dumps(
+            [[msg["role"], msg["content"]] for msg in recent] + [current_input]
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, query: str):
+        self._cache[key] = query
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
 
     def _create_query_generation_prompt(
         self, current_input: str, chat_history: List[Dict]
@@ -28,6 +122,6 @@ Generate a concise search query that captures the essential information needs.""
         return "\n".join(
             [
                 f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
-                for msg in history[-3:]
+                for msg in history
             ]
         )
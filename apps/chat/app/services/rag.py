@@ -1,29 +1,115 @@
-from typing import List
+from dataclasses import dataclass, field
+from typing import List, Optional
 import logging
 import httpx
+from observability import instrumentation
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class RetrievalResult:
+    chunks: List[dict] = field(default_factory=list)
+    query_embedding: Optional[List[float]] = None
+
+    @property
+    def context(self) -> str:
+        return "\n\n".join(chunk["text"] for chunk in self.chunks)
+
+
+@dataclass
+class BatchRetrievalResult:
+    per_query: List[RetrievalResult] = field(default_factory=list)
+    merged: RetrievalResult = field(default_factory=RetrievalResult)
+
+
 class RAGService:
-    def __init__(self):
+    """Client of the embeddings service's retrieval endpoints.
+
+    ``client`` is a long-lived pool owned (and closed) by the caller.
+    """
+
+    def __init__(self, client: httpx.AsyncClient):
         self.embedding_service_url = settings.EMBEDDING_SERVICE_URL
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.client = client
 
-    async def get_relevant_context(self, user_id: str, query: str, k: int = 3) -> str:
+    async def retrieve(
+        self, user_id: str, query: str, k: int = 3, include_embedding: bool = False
+    ) -> RetrievalResult:
         try:
             response = await self.client.post(
                 f"{self.embedding_service_url}/api/retrieve/",
-                json={"user_id": user_id, "text": query, "k": k},
+                params={"limit": k},
+                json={
+                    "user_id": user_id,
+                    "text": query,
+                    "include_embedding": include_embedding,
+                },
+                headers=instrumentation.outgoing_headers(),
             )
+            _record_remote_timing(response)
             response.raise_for_status()
             result = response.json()
-            contexts = [item["text"] for item in result.get("results", [])]
-            return "\n\n".join(contexts) 
+            return RetrievalResult(
+                chunks=result.get("results", []),
+                query_embedding=result.get("query_embedding"),
+            )
         except Exception as e:
             logger.error("Error retrieving context", extra={"props": {"error": str(e)}})
-            return "" 
+            return RetrievalResult()
+
+    async def retrieve_batch(
+        self,
+        user_id: str,
+        queries: List[str],
+        k: int = 3,
+        merge: bool = True,
+        include_embedding: bool = False,
+    ) -> BatchRetrievalResult:
+        """Retrieve for several query variants in one round trip.
+
+        The embeddings service embeds all queries together and runs a single
+        multi-vector search; ``merged`` holds its deduplicated fused view.
+        """
+        try:
+            response = await self.client.post(
+                f"{self.embedding_service_url}/api/retrieve/batch",
+                params={"limit": k},
+                json={
+                    "user_id": user_id,
+                    "texts": queries,
+                    "merge": merge,
+                    "include_embedding": include_embedding,
+                },
+                headers=instrumentation.outgoing_headers(),
+            )
+            _record_remote_timing(response)
+            response.raise_for_status()
+            result = response.json()
+            embeddings = result.get("query_embeddings") or [None] * len(queries)
+            return BatchRetrievalResult(
+                per_query=[
+                    RetrievalResult(chunks=chunks, query_embedding=embedding)
+                    for chunks, embedding in zip(result.get("results", []), embeddings)
+                ],
+                merged=RetrievalResult(chunks=result.get("merged") or []),
+            )
+        except Exception as e:
+            logger.error(
+                "Error retrieving context batch", extra={"props": {"error": str(e)}}
+            )
+            return BatchRetrievalResult(
+                per_query=[RetrievalResult() for _ in queries]
+            )
+
+    async def get_relevant_context(self, user_id: str, query: str, k: int = 3) -> str:
+        return (await self.retrieve(user_id, query, k)).context
+
 
-    async def __del__(self):
-        await self.client.aclose()
+def _record_remote_timing(response: httpx.Response):
+    """Record the embeddings service's own stages (embed, ann, ...) locally."""
+    header = response.headers.get("server-timing")
+    if header:
+        for name, seconds in instrumentation.parse_server_timing(header):
+            instrumentation.record(f"embeddings_{name}", seconds)
@@ -1,24 +1,155 @@
-from redis import Redis
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+from dataclasses import dataclass
 import json
-from typing import List, Dict, Optional
+import logging
+from typing import List, Dict, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ChatSummary:
+    text: str = ""
+    # Number of messages (counted from the start of the conversation) the
+    # summary covers; stays valid when LTRIM drops messages from the head.
+    covered: int = 0
 
 
 class RedisService:
+    """Chat history store backed by one Redis list per conversation.
+
+    Each message is its own list entry, so appending a turn is a single
+    pipelined RPUSH and reads only fetch the requested tail window instead of
+    decoding the whole conversation. A hash next to the list holds the
+    rolling summary of older turns and a count of all messages ever appended.
+    """
+
     def __init__(self):
-        self.redis_client = Redis(host="127.0.0.1", port=6379, decode_responses=True)
+        self.redis_client = Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            decode_responses=True,
+        )
+        self.window = settings.CHAT_HISTORY_WINDOW
+        self.max_length = settings.CHAT_HISTORY_MAX_LENGTH
+        self.ttl = settings.CHAT_HISTORY_TTL_SECONDS
+
+    @staticmethod
+    def _key(chat_id: str) -> str:
+        return f"chat:{chat_id}"
+
+    @staticmethod
+    def _summary_key(chat_id: str) -> str:
+        return f"chat:{chat_id}:summary"
+
+    async def get_chat_history(
+        self, chat_id: str, limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Return the last ``limit`` messages (defaults to the configured window)."""
+        window = limit or self.window
+        key = self._key(chat_id)
+        try:
+            entries = await self.redis_client.lrange(key, -window, -1)
+        except ResponseError as e:
+            if "WRONGTYPE" not in str(e):
+                raise
+            await self._migrate_legacy_history(key)
+            entries = await self.redis_client.lrange(key, -window, -1)
+        return [json.loads(entry) for entry in entries]
 
-    async def get_chat_history(self, chat_id: str) -> List[Dict]:
-        history = self.redis_client.get(f"chat:{chat_id}")
-        if not history:
-            return []
-        return json.loads(history)
+    async def append_turn(self, chat_id: str, *messages: Dict):
+        """Atomically append the messages of one turn in a single round trip."""
+        if not messages:
+            return
+        try:
+            await self._push(chat_id, messages)
+        except ResponseError as e:
+            if "WRONGTYPE" not in str(e):
+                raise
+            await self._migrate_legacy_history(self._key(chat_id))
+            await self._push(chat_id, messages)
 
     async def append_to_history(self, chat_id: str, message: Dict):
-        key = f"chat:{chat_id}"
-        history = self.redis_client.get(key)
-        if history:
-            messages = json.loads(history)
-        else:
-            messages = []
-        messages.append(message)
-        self.redis_client.set(key, json.dumps(messages))
+        await self.append_turn(chat_id, message)
+
+    async def get_summary(self, chat_id: str) -> ChatSummary:
+        fields = await self.redis_client.hmget(
+            self._summary_key(chat_id), "text", "covered"
+        )
+        return ChatSummary(text=fields[0] or "", covered=int(fields[1] or 0))
+
+    async def get_summary_backlog(
+        self, chat_id: str, keep_recent: int
+    ) -> Tuple[ChatSummary, List[Dict], int]:
+        """Return the summary, the messages it doesn't cover yet and the new
+        ``covered`` count, leaving the last ``keep_recent`` messages out."""
+        key, summary_key = self._key(chat_id), self._summary_key(chat_id)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.llen(key)
+            pipe.hmget(summary_key, "text", "covered", "appended")
+            length, (text, covered, appended) = await pipe.execute()
+        covered, appended = int(covered or 0), int(appended or 0)
+        if appended < length:
+            # History written before the counter existed.
+            appended = length
+            await self.redis_client.hset(summary_key, "appended", appended)
+
+        trimmed = appended - length
+        start = max(covered - trimmed, 0)
+        end = length - keep_recent
+        if end <= start:
+            return ChatSummary(text or "", covered), [], covered
+        entries = await self.redis_client.lrange(key, start, end - 1)
+        return (
+            ChatSummary(text or "", covered),
+            [json.loads(entry) for entry in entries],
+            trimmed + end,
+        )
+
+    async def save_summary(self, chat_id: str, text: str, covered: int):
+        summary_key = self._summary_key(chat_id)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(summary_key, mapping={"text": text, "covered": covered})
+            if self.ttl:
+                pipe.expire(summary_key, self.ttl)
+            await pipe.execute()
+
+    async def close(self):
+        await self.redis_client.aclose()
+
+    async def _push(self, chat_id: str, messages: tuple):
+        key, summary_key = self._key(chat_id), self._summary_key(chat_id)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, *[json.dumps(message) for message in messages])
+            pipe.hincrby(summary_key, "appended", len(messages))
+            if self.max_length:
+                pipe.ltrim(key, -self.max_length, -1)
+            if self.ttl:
+                pipe.expire(key, self.ttl)
+                pipe.expire(summary_key, self.ttl)
+            await pipe.execute()
+
+    async def _migrate_legacy_history(self, key: str):
+        """Convert a history stored as one JSON string into a list in place."""
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            await pipe.watch(key)
+            if await pipe.type(key) != "string":
+                await pipe.unwatch()
+                return
+            raw = await pipe.get(key)
+            messages = json.loads(raw) if raw else []
+            if self.max_length:
+                messages = messages[-self.max_length :]
+            pipe.multi()
+            pipe.delete(key)
+            if messages:
+                pipe.rpush(key, *[json.dumps(message) for message in messages])
+                if self.ttl:
+                    pipe.expire(key, self.ttl)
+            await pipe.execute()
+        logger.info(
+            "Migrated legacy chat history",
+            extra={"props": {"key": key, "messages": len(messages)}},
+        )
@@ -0,0 +1,106 @@
+from app.core.config import settings
+from app.services.admission import AdmissionController
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.context_packer import ContextPacker
+from app.services.history_summarizer import HistorySummarizer
+from app.services.llm import LLMService
+from app.services.query_generator import QueryGenerator
+from app.services.rag import RAGService
+from app.services.redis_service import RedisService
+from app.services.retrieval_orchestrator import RetrievalOrchestrator
+from typing import List, Optional
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def embeddings_http_client() -> httpx.AsyncClient:
+    """Keep-alive pool for the embeddings service.
+
+    With HTTP/2 (over TLS, or through an h2-capable proxy) concurrent
+    retrievals are multiplexed over a few connections; otherwise httpx falls
+    back to HTTP/1.1 and keeps up to the keep-alive limit open.
+    """
+    return httpx.AsyncClient(
+        http2=settings.EMBEDDING_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.EMBEDDING_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.EMBEDDING_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            settings.EMBEDDING_TIMEOUT_SECONDS,
+            connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+def llm_http_client() -> httpx.AsyncClient:
+    """Keep-alive pool for the LLM API; each streaming turn holds a connection."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            settings.LLM_TIMEOUT_SECONDS,
+            connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+class Resources:
+    """The chat service's clients and the services built on them.
+
+    Created once in the app's lifespan and closed on shutdown, so requests
+    reuse open connections instead of paying for connection and TLS setup.
+    Tests can pass their own HTTP clients or services; anything passed in
+    stays the caller's to close, and everything else is created and closed
+    here.
+    """
+
+    def __init__(
+        self,
+        embeddings_client: Optional[httpx.AsyncClient] = None,
+        llm_client: Optional[httpx.AsyncClient] = None,
+        llm_service: Optional[LLMService] = None,
+        redis_service: Optional[RedisService] = None,
+    ):
+        self._owned_clients: List[httpx.AsyncClient] = []
+        self._owns_redis = redis_service is None
+
+        if embeddings_client is None:
+            embeddings_client = embeddings_http_client()
+            self._owned_clients.append(embeddings_client)
+        if llm_service is None:
+            if llm_client is None:
+                llm_client = llm_http_client()
+                self._owned_clients.append(llm_client)
+            llm_service = LLMService(llm_client)
+
+        self.llm_service = llm_service
+        self.rag_service = RAGService(embeddings_client)
+        self.redis_service = redis_service or RedisService()
+        self.query_generator = QueryGenerator(self.llm_service)
+        self.answer_cache = SemanticAnswerCache()
+        self.orchestrator = RetrievalOrchestrator(
+            self.redis_service, self.query_generator, self.rag_service
+        )
+        self.context_packer = ContextPacker()
+        self.history_summarizer = HistorySummarizer(
+            self.redis_service, self.llm_service
+        )
+        self.admission_controller = AdmissionController()
+
+    async def aclose(self):
+        # Background summaries still use the clients, so they go first.
+        await self.history_summarizer.close()
+        if self._owns_redis:
+            await self.redis_service.close()
+        for client in self._owned_clients:
+            await client.aclose()
+        logger.info(
+            "Closed client pools", extra={"props": {"clients": len(self._owned_clients)}}
+        )
@@ -0,0 +1,285 @@
+from observability import instrumentation
+from app.core.config import settings
+from app.services.query_generator import QueryGenerator, RewriteResult
+from app.services.rag import RAGService, RetrievalResult
+from app.services.redis_service import ChatSummary, RedisService
+from dataclasses import dataclass, field
+from typing import Awaitable, Coroutine, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OrchestratedRetrieval:
+    chat_history: List[Dict]
+    rewrite: RewriteResult
+    retrieval: RetrievalResult
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    timed_out: List[str] = field(default_factory=list)
+    summary: ChatSummary = field(default_factory=ChatSummary)
+
+
+class RetrievalOrchestrator:
+    """Fetches history, rewrites the query and retrieves context for one turn.
+
+    In ``concurrent`` mode retrieval on the raw input starts immediately,
+    alongside the history fetch and rewrite; the rewritten query (when it
+    differs) is looked up as a second retrieval and both result sets are
+    merged. Anything still running at ``RETRIEVAL_DEADLINE_MS`` is cancelled
+    and generation proceeds with the context that has arrived; if the turn
+    itself is cancelled (the client left), every call it started is
+    cancelled with it. ``sequential``
+    mode keeps the original history -> rewrite -> retrieve order. In both
+    modes a history fetch that misses the deadline is dropped, so a slow
+    Redis costs the turn its memory rather than its answer.
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisService,
+        query_generator: QueryGenerator,
+        rag_service: RAGService,
+        mode: str = settings.RETRIEVAL_MODE,
+        deadline_ms: float = settings.RETRIEVAL_DEADLINE_MS,
+    ):
+        if mode not in ("concurrent", "sequential"):
+            raise ValueError(f"Unknown RETRIEVAL_MODE: {mode}")
+        self.redis_service = redis_service
+        self.query_generator = query_generator
+        self.rag_service = rag_service
+        self.mode = mode
+        self.deadline_ms = deadline_ms
+
+    async def run(
+        self,
+        chat_id: str,
+        user_id: str,
+        user_input: str,
+        include_embedding: bool = False,
+    ) -> OrchestratedRetrieval:
+        started = time.perf_counter()
+        if self.mode == "sequential":
+            result = await self._run_sequential(
+                chat_id, user_id, user_input, include_embedding
+            )
+        else:
+            result = await self._run_concurrent(
+                chat_id, user_id, user_input, include_embedding, started
+            )
+        result.timings_ms["total"] = _elapsed_ms(started)
+
+        logger.info(
+            "Retrieval orchestrated",
+            extra={
+                "props": {
+                    "chat_id": chat_id,
+                    "mode": self.mode,
+                    "rewrite_path": result.rewrite.path,
+                    "timings_ms": {
+                        stage: round(ms, 2) for stage, ms in result.timings_ms.items()
+                    },
+                    "timed_out": result.timed_out,
+                    "chunks": len(result.retrieval.chunks),
+                }
+            },
+        )
+        return result
+
+    async def _run_sequential(
+        self, chat_id: str, user_id: str, user_input: str, include_embedding: bool
+    ) -> OrchestratedRetrieval:
+        timings: Dict[str, float] = {}
+        timed_out: List[str] = []
+        tasks: List[asyncio.Task] = []
+        deadline = time.perf_counter() + self.deadline_ms / 1000
+        try:
+            chat_history, summary = await self._fetch_history(
+                chat_id, timings, timed_out, deadline, tasks
+            )
+        finally:
+            await _cancel_all(tasks)
+        rewrite = await _timed(
+            timings, "rewrite", self.query_generator.rewrite(user_input, chat_history)
+        )
+        retrieval = await _timed(
+            timings,
+            "retrieval_rewritten",
+            self.rag_service.retrieve(
+                user_id, rewrite.query, include_embedding=include_embedding
+            ),
+        )
+        return OrchestratedRetrieval(
+            chat_history, rewrite, retrieval, timings, timed_out, summary
+        )
+
+    async def _run_concurrent(
+        self,
+        chat_id: str,
+        user_id: str,
+        user_input: str,
+        include_embedding: bool,
+        started: float,
+    ) -> OrchestratedRetrieval:
+        timings: Dict[str, float] = {}
+        timed_out: List[str] = []
+        deadline = started + self.deadline_ms / 1000
+        # Every task started for this turn, so that a deadline miss or a
+        # cancelled turn (client disconnect) stops all of them.
+        tasks: List[asyncio.Task] = []
+
+        try:
+            raw_task = _spawn(
+                tasks,
+                _timed(
+                    timings,
+                    "retrieval_raw",
+                    self.rag_service.retrieve(
+                        user_id, user_input, include_embedding=include_embedding
+                    ),
+                ),
+            )
+            rewritten_task: Optional[asyncio.Task] = None
+            chat_history, summary = await self._fetch_history(
+                chat_id, timings, timed_out, deadline, tasks
+            )
+            rewrite_task = _spawn(
+                tasks,
+                _timed(
+                    timings,
+                    "rewrite",
+                    self.query_generator.rewrite(user_input, chat_history),
+                ),
+            )
+            if await _wait_until(rewrite_task, deadline):
+                rewrite = rewrite_task.result()
+            else:
+                timed_out.append("rewrite")
+                rewrite = RewriteResult(
+                    query=user_input, path="deadline", duration_ms=_elapsed_ms(started)
+                )
+
+            if rewrite.query.strip() != user_input.strip():
+                rewritten_task = _spawn(
+                    tasks,
+                    _timed(
+                        timings,
+                        "retrieval_rewritten",
+                        self.rag_service.retrieve(
+                            user_id, rewrite.query, include_embedding=include_embedding
+                        ),
+                    ),
+                )
+
+            results = []
+            for name, task in (
+                ("retrieval_rewritten", rewritten_task),
+                ("retrieval_raw", raw_task),
+            ):
+                if task is None:
+                    continue
+                if await _wait_until(task, deadline):
+                    results.append(task.result())
+                else:
+                    timed_out.append(name)
+        finally:
+            await _cancel_all(tasks)
+
+        return OrchestratedRetrieval(
+            chat_history,
+            rewrite,
+            merge_results(results),
+            timings,
+            timed_out,
+            summary,
+        )
+
+    async def _fetch_history(
+        self,
+        chat_id: str,
+        timings: Dict[str, float],
+        timed_out: List[str],
+        deadline: float,
+        tasks: List[asyncio.Task],
+    ) -> Tuple[List[Dict], ChatSummary]:
+        """History and summary, or none of either if Redis misses the deadline."""
+        task = _spawn(tasks, _timed(timings, "history", self._load_history(chat_id)))
+        if await _wait_until(task, deadline):
+            return task.result()
+        timed_out.append("history")
+        return [], ChatSummary()
+
+    async def _load_history(self, chat_id: str) -> Tuple[List[Dict], ChatSummary]:
+        chat_history, summary = await asyncio.gather(
+            self.redis_service.get_chat_history(chat_id),
+            self.redis_service.get_summary(chat_id),
+        )
+        return chat_history, summary
+
+
+def merge_results(results: List[RetrievalResult]) -> RetrievalResult:
+    """Merge retrievals, keeping each chunk once at its best similarity.
+
+    Chunks are matched by text (search results carry no id) and ranked by
+    ``similarity``, so the packer trims the least relevant ones first. The
+    query embedding of the first result that has one is kept, so callers
+    should pass the preferred (rewritten) retrieval first.
+    """
+    best: Dict[str, dict] = {}
+    for result in results:
+        for chunk in result.chunks:
+            key = chunk["text"]
+            if key not in best or _similarity(chunk) > _similarity(best[key]):
+                best[key] = chunk
+    chunks = sorted(best.values(), key=_similarity, reverse=True)
+    embedding = next(
+        (r.query_embedding for r in results if r.query_embedding is not None), None
+    )
+    return RetrievalResult(chunks=chunks, query_embedding=embedding)
+
+
+def _similarity(chunk: dict) -> float:
+    return chunk.get("similarity", 0.0)
+
+
+async def _timed(timings: Dict[str, float], stage: str, awaitable: Awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = _elapsed_ms(started)
+        instrumentation.record(stage, timings[stage] / 1000)
+
+
+def _spawn(tasks: List[asyncio.Task], coro: Coroutine) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    tasks.append(task)
+    return task
+
+
+async def _cancel_all(tasks: List[asyncio.Task]):
+    """Cancel whatever is still running in ``tasks`` and wait for it to stop."""
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _wait_until(task: asyncio.Task, deadline: float) -> bool:
+    """Wait for ``task`` until ``deadline``; cancel it and return False on expiry.
+
+    If the wait itself is cancelled the task keeps running, so callers also
+    cancel their tasks with ``_cancel_all`` when the turn ends.
+    """
+    timeout = max(0.0, deadline - time.perf_counter())
+    done, _ = await asyncio.wait({task}, timeout=timeout)
+    if not done:
+        task.cancel()
+        return False
+    return True
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
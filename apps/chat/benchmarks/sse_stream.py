@@ -0,0 +1,103 @@
+"""Cost of streaming one answer through the chat SSE pipeline.
+
+Run from ``apps/chat``::
+
+    python -m benchmarks.sse_stream
+
+Compares the previous pipeline (``json.dumps`` per token, the route
+re-parsing every frame and concatenating the answer) with typed events
+serialized once by orjson, with and without coalescing. Tokens arrive at
+``--token-interval-ms`` so the coalescing window has something to merge.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from app.services.events import StreamEvent, answer_text, coalesce, encode_stream
+
+
+def make_tokens(count: int) -> list[str]:
+    words = "the quick brown fox jumps over the lazy dog, résumé naïve 😀".split()
+    return [f" {words[i % len(words)]}" for i in range(count)]
+
+
+async def arrive(tokens: list[str], interval: float):
+    for token in tokens:
+        if interval:
+            await asyncio.sleep(interval)
+        yield token
+
+
+async def legacy(tokens, interval):
+    async def generate_stream():
+        async for token in arrive(tokens, interval):
+            yield f"data: {json.dumps({'text': token, 'type': 'assistant'})}\n\n"
+
+    async def process_request():
+        response_text = ""
+        async for chunk in generate_stream():
+            response_text += json.loads(chunk.split("data: ")[1])["text"]
+            yield chunk
+
+    frames = [chunk.encode() async for chunk in process_request()]
+    return frames
+
+
+async def typed(tokens, interval, window_ms, max_bytes):
+    async def generate_stream():
+        async for token in arrive(tokens, interval):
+            yield StreamEvent.assistant(token)
+
+    async def process_request():
+        events = []
+        async for event in generate_stream():
+            events.append(event)
+            yield event
+        answer_text(events)
+
+    stream = coalesce(process_request(), window_ms=window_ms, max_bytes=max_bytes)
+    return [frame async for frame in encode_stream(stream)]
+
+
+async def measure(name, factory, repeat):
+    wall = cpu = 0.0
+    for _ in range(repeat):
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        frames = await factory()
+        wall += time.perf_counter() - wall_started
+        cpu += time.process_time() - cpu_started
+    size = sum(len(frame) for frame in frames)
+    print(
+        f"{name:<28} frames={len(frames):>6} bytes={size:>8} "
+        f"frames/s={len(frames) * repeat / wall:>11,.0f} "
+        f"cpu/answer={cpu / repeat * 1000:>8.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--token-interval-ms", type=float, default=1.0)
+    parser.add_argument("--window-ms", type=float, default=20)
+    parser.add_argument("--max-bytes", type=int, default=1024)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.tokens)
+    for interval in (0.0, args.token_interval_ms / 1000):
+        print(f"\n{len(tokens)} tokens, {interval * 1000:g}ms between tokens")
+        await measure("legacy json", lambda: legacy(tokens, interval), args.repeat)
+        await measure(
+            "typed orjson", lambda: typed(tokens, interval, 0, 0), args.repeat
+        )
+        await measure(
+            f"typed orjson + {args.window_ms:g}ms window",
+            lambda: typed(tokens, interval, args.window_ms, args.max_bytes),
+            args.repeat,
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
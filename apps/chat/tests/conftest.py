@@ -0,0 +1,22 @@
+import os
+
+import pytest
+import tiktoken
+
+# Settings require a key at import time; tests never call the real API.
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+
+@pytest.fixture
+def byte_encoding(monkeypatch):
+    """A byte-level tokenizer, so tests don't download tiktoken's BPE files."""
+    from app.services import context_packer
+
+    encoding = tiktoken.Encoding(
+        name="test-bytes",
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
+    monkeypatch.setattr(context_packer, "get_encoding", lambda model_name: encoding)
+    return encoding
@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.models.chat import ChatInput
+from app.api.routes import chat
+from app.services.admission import AdmissionController
+
+
+def rejected(reason: str) -> float:
+    return chat.TURNS_REJECTED._values.get((reason,), 0)
+
+
+def reject_while_held(held_chat: str, chat_id: str, **limits) -> HTTPException:
+    """Hold a slot for ``held_chat`` and send a turn for ``chat_id``."""
+
+    async def run():
+        controller = AdmissionController(retry_after_seconds=7, **limits)
+        resources = SimpleNamespace(admission_controller=controller)
+        admission = await controller.admit(held_chat)
+        try:
+            with pytest.raises(HTTPException) as rejection:
+                await chat.chat_endpoint(
+                    ChatInput(chat_id=chat_id, input="hello"), resources
+                )
+            assert controller.stats() == {"running": 1, "queued": 0}
+        finally:
+            admission.release()
+        assert controller.stats() == {"running": 0, "queued": 0}
+        return rejection.value
+
+    return asyncio.run(run())
+
+
+def test_turn_for_a_busy_chat_is_rejected_with_retry_after():
+    before = rejected("chat_busy")
+
+    error = reject_while_held("chat", "chat", max_concurrent=4)
+
+    assert error.status_code == 429
+    assert error.headers == {"Retry-After": "7"}
+    assert rejected("chat_busy") == before + 1
+
+
+def test_queued_turn_is_rejected_when_its_wait_times_out():
+    before = rejected("queue_timeout")
+
+    error = reject_while_held(
+        "first", "second", max_concurrent=1, max_queued=1, queue_timeout_ms=50
+    )
+
+    assert error.status_code == 429
+    assert error.headers == {"Retry-After": "7"}
+    assert rejected("queue_timeout") == before + 1
+
+
+def test_turn_is_rejected_when_the_queue_is_full():
+    before = rejected("queue_full")
+
+    error = reject_while_held("first", "second", max_concurrent=1, max_queued=0)
+
+    assert error.status_code == 429
+    assert error.headers == {"Retry-After": "7"}
+    assert rejected("queue_full") == before + 1
+
+
+def test_queued_turn_is_admitted_when_a_slot_is_released():
+    async def run():
+        controller = AdmissionController(
+            max_concurrent=1, max_queued=1, queue_timeout_ms=5000
+        )
+        first = await controller.admit("first")
+        waiting = asyncio.create_task(controller.admit("second"))
+        while controller.queued == 0:
+            await asyncio.sleep(0)
+        assert controller.stats() == {"running": 1, "queued": 1}
+
+        first.release()
+        second = await asyncio.wait_for(waiting, 2)
+        stats = controller.stats()
+        second.release()
+        return second.chat_id, stats, controller.stats()
+
+    chat_id, while_running, after = asyncio.run(run())
+
+    assert chat_id == "second"
+    assert while_running == {"running": 1, "queued": 0}
+    assert after == {"running": 0, "queued": 0}
@@ -0,0 +1,28 @@
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.events import StreamEvent
+
+
+def test_answer_is_reused_for_the_same_context_and_history():
+    cache = SemanticAnswerCache(max_entries=8, ttl_seconds=60, similarity_threshold=0.9)
+    fingerprint = SemanticAnswerCache.fingerprint("docs", "user: hi")
+    cache.store([1.0, 0.0], fingerprint, [StreamEvent.system("answer")], 10.0)
+
+    assert cache.lookup([1.0, 0.0], fingerprint) is not None
+
+
+def test_different_history_or_summary_misses():
+    cache = SemanticAnswerCache(max_entries=8, ttl_seconds=60, similarity_threshold=0.9)
+    cache.store(
+        [1.0, 0.0],
+        SemanticAnswerCache.fingerprint("docs", "user: tell me about Paris"),
+        [StreamEvent.system("answer")],
+        10.0,
+    )
+
+    for history in (
+        "",
+        "user: tell me about Rome",
+        "Summary of earlier conversation: Rome\nuser: tell me about Paris",
+    ):
+        fingerprint = SemanticAnswerCache.fingerprint("docs", history)
+        assert cache.lookup([1.0, 0.0], fingerprint) is None
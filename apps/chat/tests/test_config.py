@@ -0,0 +1,22 @@
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import RETRIEVALS_PER_TURN, Settings
+
+
+def test_embedding_pool_is_sized_for_the_admitted_load():
+    settings = Settings(ADMISSION_MAX_CONCURRENT=10)
+
+    assert settings.EMBEDDING_MAX_CONNECTIONS == 10 * RETRIEVALS_PER_TURN
+    assert settings.EMBEDDING_MAX_KEEPALIVE_CONNECTIONS == 10
+
+
+def test_embedding_pool_below_the_admitted_load_is_rejected():
+    with pytest.raises(ValidationError, match="EMBEDDING_MAX_CONNECTIONS"):
+        Settings(ADMISSION_MAX_CONCURRENT=64, EMBEDDING_MAX_CONNECTIONS=32)
+
+
+def test_larger_explicit_pool_is_kept():
+    settings = Settings(ADMISSION_MAX_CONCURRENT=10, EMBEDDING_MAX_CONNECTIONS=50)
+
+    assert settings.EMBEDDING_MAX_CONNECTIONS == 50
@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import pytest
+
+from app.api.models.chat import ChatInput
+from app.api.routes import chat
+from app.services.events import StreamEvent
+from app.services.query_generator import RewriteResult
+from app.services.rag import RetrievalResult
+from app.services.redis_service import ChatSummary
+from app.services.resources import Resources
+from app.services.retrieval_orchestrator import OrchestratedRetrieval
+
+
+class FakeSlowLLM:
+    def __init__(self, tokens: int, interval: float):
+        self.tokens = tokens
+        self.interval = interval
+        self.generated_at: list[float] = []
+        self.stopped_at = None
+
+    async def generate_stream(self, query: str, full_context: dict):
+        try:
+            yield StreamEvent.system("Processing query...")
+            for i in range(self.tokens):
+                await asyncio.sleep(self.interval)
+                self.generated_at.append(time.perf_counter())
+                yield StreamEvent.assistant(f" token{i}")
+        finally:
+            self.stopped_at = time.perf_counter()
+
+
+class FakeHistory:
+    def __init__(self):
+        self.turns = []
+
+    async def append_turn(self, chat_id: str, *messages):
+        self.turns.append(messages)
+
+    async def close(self):
+        pass
+
+
+async def fake_retrieval(chat_id, user_id, user_input, include_embedding=False):
+    return OrchestratedRetrieval(
+        chat_history=[],
+        rewrite=RewriteResult(query=user_input, path="no_history", duration_ms=0),
+        # With a query embedding a completed answer would be cached.
+        retrieval=RetrievalResult(
+            chunks=[{"text": "Some context.", "similarity": 0.9}],
+            query_embedding=[1.0, 0.0],
+        ),
+        summary=ChatSummary(),
+    )
+
+
+@pytest.fixture
+def resources(byte_encoding):
+    resources = Resources(
+        llm_service=FakeSlowLLM(tokens=100, interval=0.01),
+        redis_service=FakeHistory(),
+    )
+    resources.orchestrator.run = fake_retrieval
+    resources.history_summarizer.schedule = lambda chat_id: None
+    resources.stored = []
+    resources.answer_cache.store = lambda *args, **kwargs: resources.stored.append(args)
+    yield resources
+    asyncio.run(resources.aclose())
+
+
+async def stream_turn(resources, disconnect_after: float = None):
+    """Run one turn through the ASGI interface; returns when the response ends."""
+    response = await chat.chat_endpoint(
+        ChatInput(chat_id="chat", input="hello"), resources
+    )
+    disconnected_at = None
+
+    async def receive():
+        nonlocal disconnected_at
+        if disconnect_after is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(disconnect_after)
+        disconnected_at = time.perf_counter()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "asgi": {"spec_version": "2.3"}}
+    await asyncio.wait_for(response(scope, receive, send), timeout=10)
+    return disconnected_at
+
+
+def abandoned(phase: str) -> float:
+    return chat.STREAMS_ABANDONED._values.get((phase,), 0)
+
+
+def test_disconnect_stops_generation_and_skips_persistence(resources):
+    llm = resources.llm_service
+    before = abandoned("generation")
+
+    async def run():
+        disconnected_at = await stream_turn(resources, disconnect_after=0.2)
+        # Give anything still running the time the whole answer would take.
+        await asyncio.sleep(llm.tokens * llm.interval)
+        return disconnected_at
+
+    disconnected_at = asyncio.run(run())
+
+    assert llm.stopped_at is not None
+    assert llm.stopped_at - disconnected_at < 0.1
+    assert len(llm.generated_at) < llm.tokens
+    assert not [t for t in llm.generated_at if t > llm.stopped_at]
+    assert resources.redis_service.turns == []
+    assert resources.stored == []
+    assert abandoned("generation") == before + 1
+    assert resources.admission_controller.stats() == {"running": 0, "queued": 0}
+
+
+def test_completed_turn_is_persisted(resources):
+    resources.llm_service.tokens = 5
+    before = abandoned("generation")
+
+    asyncio.run(stream_turn(resources))
+
+    assert len(resources.redis_service.turns) == 1
+    assert len(resources.stored) == 1
+    assert abandoned("generation") == before
+    assert resources.admission_controller.stats() == {"running": 0, "queued": 0}
+
+
+def test_admission_is_released_if_the_response_cannot_be_built(
+    resources, monkeypatch
+):
+    def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(chat, "encode_stream", fail)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            chat.chat_endpoint(ChatInput(chat_id="chat", input="hello"), resources)
+        )
+
+    assert resources.admission_controller.stats() == {"running": 0, "queued": 0}
+
+
+def test_stream_releases_its_admission_when_closed(resources):
+    resources.llm_service.tokens = 5
+    controller = resources.admission_controller
+
+    async def run():
+        admission = await controller.admit("chat")
+        stream = chat.process_request(resources, "chat", "hello", admission)
+        await stream.__anext__()
+        assert controller.running == 1
+        await stream.aclose()
+
+    asyncio.run(run())
+
+    assert controller.stats() == {"running": 0, "queued": 0}
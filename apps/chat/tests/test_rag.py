@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import httpx
+
+from app.services.rag import RAGService
+
+# Body fields of the embeddings service's TextRequest / BatchTextRequest;
+# anything else in the body is silently ignored by the service.
+RETRIEVE_FIELDS = {"text", "user_id", "include_embedding"}
+BATCH_FIELDS = {"texts", "user_id", "merge", "include_embedding"}
+
+
+def retrieval_endpoint(request: httpx.Request) -> httpx.Response:
+    """Answers like /api/retrieve, reading ``limit`` from the query string."""
+    body = json.loads(request.content)
+    limit = int(request.url.params.get("limit", 5))
+    if request.url.path == "/api/retrieve/batch":
+        assert set(body) <= BATCH_FIELDS
+        results = [
+            [{"text": f"{text} {i}", "similarity": 1.0} for i in range(limit)]
+            for text in body["texts"]
+        ]
+        return httpx.Response(
+            200,
+            json={
+                "results": results,
+                "merged": results[0] if body["merge"] else None,
+                "query_embeddings": None,
+            },
+        )
+    assert set(body) <= RETRIEVE_FIELDS
+    return httpx.Response(
+        200,
+        json={
+            "results": [
+                {"text": f"{body['text']} {i}", "similarity": 1.0}
+                for i in range(limit)
+            ]
+        },
+    )
+
+
+def run_with_service(call):
+    async def run():
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(retrieval_endpoint)
+        ) as client:
+            return await call(RAGService(client))
+
+    return asyncio.run(run())
+
+
+def test_retrieve_batch_sends_k_as_the_limit():
+    result = run_with_service(
+        lambda rag: rag.retrieve_batch("user", ["a", "b"], k=2, merge=True)
+    )
+
+    assert [len(r.chunks) for r in result.per_query] == [2, 2]
+    assert [c["text"] for c in result.per_query[1].chunks] == ["b 0", "b 1"]
+    assert len(result.merged.chunks) == 2
+
+
+def test_retrieve_sends_k_as_the_limit():
+    result = run_with_service(lambda rag: rag.retrieve("user", "q", k=7))
+
+    assert len(result.chunks) == 7
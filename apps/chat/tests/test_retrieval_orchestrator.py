@@ -0,0 +1,131 @@
+import asyncio
+
+from app.services.query_generator import RewriteResult
+from app.services.rag import RetrievalResult
+from app.services.redis_service import ChatSummary
+from app.services.retrieval_orchestrator import RetrievalOrchestrator, merge_results
+
+
+def test_merge_keeps_best_similarity_and_ranks_overlapping_results():
+    rewritten = RetrievalResult(
+        chunks=[
+            {"text": "pricing", "similarity": 0.62},
+            {"text": "plans", "similarity": 0.91},
+        ],
+        query_embedding=[1.0, 0.0],
+    )
+    raw = RetrievalResult(
+        chunks=[
+            {"text": "pricing", "similarity": 0.95},
+            {"text": "faq", "similarity": 0.70},
+            {"text": "plans", "similarity": 0.40},
+        ],
+        query_embedding=[0.0, 1.0],
+    )
+
+    merged = merge_results([rewritten, raw])
+
+    assert [(c["text"], c["similarity"]) for c in merged.chunks] == [
+        ("pricing", 0.95),
+        ("plans", 0.91),
+        ("faq", 0.70),
+    ]
+    assert merged.query_embedding == [1.0, 0.0]
+
+
+class SlowRedis:
+    async def get_chat_history(self, chat_id):
+        await asyncio.sleep(10)
+        return [{"role": "user", "content": "never arrives"}]
+
+    async def get_summary(self, chat_id):
+        return ChatSummary(text="summary", covered=2)
+
+
+class EchoRewriter:
+    async def rewrite(self, user_input, chat_history):
+        return RewriteResult(query=user_input, path="no_history", duration_ms=0)
+
+
+class StaticRag:
+    async def retrieve(self, user_id, query, k=3, include_embedding=False):
+        return RetrievalResult(chunks=[{"text": "context", "similarity": 0.8}])
+
+
+def test_history_fetch_is_bounded_by_the_deadline():
+    async def run(mode):
+        orchestrator = RetrievalOrchestrator(
+            SlowRedis(), EchoRewriter(), StaticRag(), mode=mode, deadline_ms=50
+        )
+        return await asyncio.wait_for(orchestrator.run("chat", "user", "hi"), 2)
+
+    for mode in ("concurrent", "sequential"):
+        result = asyncio.run(run(mode))
+        assert result.chat_history == []
+        assert result.summary.text == ""
+        assert "history" in result.timed_out
+
+
+class BlockingRewriter:
+    """Blocks in ``rewrite`` until cancelled, recording the cancellation."""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def rewrite(self, user_input, chat_history):
+        self.started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+class FastRedis:
+    async def get_chat_history(self, chat_id):
+        return []
+
+    async def get_summary(self, chat_id):
+        return ChatSummary()
+
+
+def test_cancelled_turn_cancels_the_in_flight_rewrite():
+    async def run(mode):
+        rewriter = BlockingRewriter()
+        orchestrator = RetrievalOrchestrator(
+            FastRedis(), rewriter, StaticRag(), mode=mode, deadline_ms=5000
+        )
+        turn = asyncio.create_task(orchestrator.run("chat", "user", "hi"))
+        await asyncio.wait_for(rewriter.started.wait(), 2)
+        turn.cancel()
+        await asyncio.gather(turn, return_exceptions=True)
+        # Checked before asyncio.run tears down the loop and cancels leftovers.
+        return turn.cancelled(), rewriter.cancelled
+
+    for mode in ("concurrent", "sequential"):
+        assert asyncio.run(run(mode)) == (True, True)
+
+
+def test_cancelled_turn_cancels_the_history_fetch():
+    cancelled = []
+
+    class HangingRedis(FastRedis):
+        async def get_chat_history(self, chat_id):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(chat_id)
+                raise
+
+    async def run():
+        orchestrator = RetrievalOrchestrator(
+            HangingRedis(), EchoRewriter(), StaticRag(), deadline_ms=5000
+        )
+        turn = asyncio.create_task(orchestrator.run("chat", "user", "hi"))
+        await asyncio.sleep(0.05)
+        turn.cancel()
+        await asyncio.gather(turn, return_exceptions=True)
+        return list(cancelled)
+
+    assert asyncio.run(run()) == ["chat"]
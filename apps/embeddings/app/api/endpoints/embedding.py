@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from app.models.schemas import TextRequest, EmbeddingResponse
-from app.services.embedding_service import EmbeddingService
+from fastapi import APIRouter, Depends, HTTPException
+from app.models.schemas import EmbeddingResponse
+from app.core.executors import get_ingest_pool
+from app.services.embedding_service import EmbeddingService, get_embedding_service
+from app.services.ingest_manifest import IngestManifest
+from app.services.ingest_pipeline import IngestPipeline
+from app.services.lexical_index import LexicalStore, get_lexical_store
 from app.services.text_service import TextService
-from app.db.milvus import MilvusDB
-from unstructured.partition.md import partition_md
-from langchain.document_loaders import UnstructuredFileLoader
+from app.db.vector_store import VectorStore, get_vector_store
 import logging
-import os
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -15,59 +18,59 @@ router = APIRouter()
     "/process-files/",
     response_model=EmbeddingResponse,
     summary="Process Documentation Files",
-    description="Processes various document types (Markdown, PDF, etc.), chunks their content, creates embeddings, and stores them in Milvus",
+    description="Processes various document types (Markdown, PDF, etc.), chunks their content, creates embeddings, and stores them in the vector store. Unchanged files and chunks are skipped on re-ingestion.",
 )
 async def process_files(
     user_id: str,
     text_service: TextService = Depends(),
-    embedding_service: EmbeddingService = Depends(),
-    db: MilvusDB = Depends(),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    db: VectorStore = Depends(get_vector_store),
+    lexical_store: LexicalStore = Depends(get_lexical_store),
 ):
     try:
         file_paths = [
             "./data/data.md",
         ]
-        combined_elements = []
-
-        for file_path in file_paths:
-            try:
-                print(f"Processing file: {file_path}")
-                file_ext = os.path.splitext(file_path)[1].lower()
-
-                if file_ext == ".md":
-                    elements = partition_md(filename=file_path)
-                    combined_elements.extend([str(element) for element in elements])
-                else:
-                    loader = UnstructuredFileLoader(file_path)
-                    elements = loader.load()
-                    combined_elements.extend(
-                        [str(doc.page_content) for doc in elements]
-                    )
+        manifest = IngestManifest.load(user_id)
+        lexical_index = lexical_store.index(user_id)
+        if not manifest.exists:
+            # Rows written before manifests existed can't be diffed; start clean.
+            await get_ingest_pool().run(db.delete_embeddings, user_id)
+            lexical_index.clear()
 
-                print(f"Successfully processed file: {file_path}")
-            except Exception as file_error:
-                logging.error(f"Error processing file {file_path}: {str(file_error)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error processing file {file_path}: {str(file_error)}",
-                )
-
-        combined_text = "\n\n".join(combined_elements)
-        print(f"Combined text length: {len(combined_text)}")
-
-        print("Starting hybrid text processing")
-        processed_chunks = text_service.process_text(combined_text)
-        print(f"Created {len(processed_chunks)} chunks")
-        embedded_chunks = embedding_service.create_embeddings(processed_chunks)
-        db.insert_embeddings(
-            user_id=user_id, texts=processed_chunks, embeddings=embedded_chunks
+        pipeline = IngestPipeline(
+            user_id,
+            text_service,
+            embedding_service,
+            db,
+            manifest,
+            lexical_index=lexical_index,
+        )
+        report = await pipeline.run(file_paths)
+        logger.info(
+            "Stored embeddings",
+            extra={
+                "props": {
+                    "user_id": user_id,
+                    "upserted": report.upserted_count,
+                    "deleted": report.deleted_count,
+                    "unchanged_files": len(report.skipped_files),
+                    "elapsed_seconds": round(report.elapsed_seconds, 3),
+                }
+            },
         )
-        print("Successfully stored embeddings")
 
         return EmbeddingResponse(
             message="Successfully processed and stored files",
-            chunk_count=len(processed_chunks),
+            chunk_count=report.chunk_count,
+            upserted_count=report.upserted_count,
+            deleted_count=report.deleted_count,
+            skipped_files=report.skipped_files,
+            elapsed_seconds=report.elapsed_seconds,
+            stage_stats={
+                name: stats.as_dict() for name, stats in report.stages.items()
+            },
         )
     except Exception as e:
-        logging.error(f"Error in process_files: {str(e)}")
+        logger.error("Error in process_files", extra={"props": {"error": str(e)}})
         raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
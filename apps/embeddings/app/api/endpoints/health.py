@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.core.executors import BlockingPool, get_search_pool
+from app.db.vector_store import VectorStore, get_vector_store
+
+router = APIRouter()
+
+
+@router.get(
+    "/health/live",
+    summary="Liveness Probe",
+    description="Reports that the process is up and serving requests",
+)
+async def liveness():
+    return {"status": "alive"}
+
+
+@router.get(
+    "/health/ready",
+    summary="Readiness Probe",
+    description="Reports whether the vector store is connected and its collection loaded",
+)
+async def readiness(
+    db: VectorStore = Depends(get_vector_store),
+    pool: BlockingPool = Depends(get_search_pool),
+):
+    if not await pool.run(db.is_ready):
+        raise HTTPException(status_code=503, detail="Vector store not ready")
+    return {"status": "ready", "collection": db.collection_name}
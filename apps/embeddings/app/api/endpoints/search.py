@@ -1,8 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.schemas import TextRequest, SearchResponse, SearchResult
-from app.services.embedding_service import EmbeddingService
-from app.db.milvus import MilvusDB
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.models.schemas import (
+    BatchSearchResponse,
+    BatchTextRequest,
+    SearchResponse,
+    SearchResult,
+    TextRequest,
+)
+from app.services.query_batcher import QueryEmbeddingBatcher, get_query_batcher
+from app.db.vector_store import VectorStore, get_vector_store
+from app.services.lexical_index import LexicalStore, get_lexical_store
+from app.services.rerank import (
+    candidate_matrix,
+    mmr_select,
+    reciprocal_rank_fusion,
+)
+from app.core.config import get_settings
+from app.core.executors import BlockingPool, get_search_pool
+from observability.instrumentation import span
+from typing import Literal, Optional
+import asyncio
+import logging
+import numpy as np
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -11,37 +32,221 @@ router = APIRouter()
     "/retrieve/",
     response_model=SearchResponse,
     summary="Retrieve Similar Text",
-    description="Retrieves similar text chunks using vector similarity in Milvus for a specific user",
+    description="Retrieves similar text chunks using vector similarity for a specific user. Vector store and BM25 calls run on the dedicated search pool. Over-fetches `limit * fetch_factor` candidates and re-ranks them with maximal marginal relevance (`mmr_lambda`, 1 = relevance only), collapsing near-duplicates. `mode=hybrid` also runs a BM25 search over the user's chunks concurrently and fuses both rankings with reciprocal rank fusion; similarities are then fused scores. `score_threshold` is applied inside the vector search (range search); with `all_above_threshold` every hit above it is returned, up to `RETRIEVE_MAX_HITS`, instead of the top `limit`. `nprobe` / `ef` override the index search parameters for this request (recall vs latency; see benchmarks/index_tuning.py).",
 )
 async def retrieve_embeddings(
     data: TextRequest,
     limit: Optional[int] = 5,
     score_threshold: Optional[float] = 0.3,
-    embedding_service: EmbeddingService = Depends(),
-    db: MilvusDB = Depends(),
+    mmr_lambda: float = Query(settings.RERANK_MMR_LAMBDA, ge=0.0, le=1.0),
+    fetch_factor: int = Query(settings.RERANK_FETCH_FACTOR, ge=1, le=50),
+    mode: Literal["vector", "hybrid"] = "vector",
+    nprobe: Optional[int] = Query(None, ge=1, le=65536),
+    ef: Optional[int] = Query(None, ge=1, le=32768),
+    all_above_threshold: bool = False,
+    query_batcher: QueryEmbeddingBatcher = Depends(get_query_batcher),
+    db: VectorStore = Depends(get_vector_store),
+    lexical_store: LexicalStore = Depends(get_lexical_store),
+    pool: BlockingPool = Depends(get_search_pool),
 ):
+    limit, fetch_limit = _limits(limit, fetch_factor, all_above_threshold)
+    lexical_search = None
     try:
-        print(f"🔍 Creating query embedding for text: {data.text[:100]}...")
-        query_embedding = embedding_service.create_query_embedding(data.text)
-
-        print(f"🔎 Searching for similar texts for user {data.user_id}...")
-        similar_docs = db.search_similar(
-            user_id=data.user_id,
-            query_embedding=query_embedding,
-            limit=limit,
-            score_threshold=score_threshold,
+        if mode == "hybrid":
+            # Lexical search needs no embedding; run it alongside the vector path.
+            lexical_search = asyncio.create_task(
+                _lexical_search(pool, lexical_store, data.user_id, data.text, limit)
+            )
+
+        with span("embed"):
+            query_embedding = await query_batcher.embed(data.text)
+
+        with span("ann"):
+            similar_docs = await pool.run(
+                db.search_similar,
+                user_id=data.user_id,
+                query_embedding=query_embedding,
+                limit=fetch_limit,
+                score_threshold=score_threshold,
+                include_vectors=_needs_rerank(mmr_lambda, fetch_factor),
+                search_params=_search_params(nprobe, ef),
+            )
+        with span("rerank"):
+            similar_docs = _rerank(
+                query_embedding, similar_docs, limit, mmr_lambda, fetch_factor
+            )
+
+        if lexical_search is not None:
+            lexical_docs = await lexical_search
+            similar_docs = reciprocal_rank_fusion(
+                [similar_docs, lexical_docs], k=settings.HYBRID_RRF_K
+            )[:limit]
+
+        results = _to_results(similar_docs)
+
+        logger.debug(
+            "Retrieved documents",
+            extra={
+                "props": {"user_id": data.user_id, "mode": mode, "hits": len(results)}
+            },
+        )
+        return SearchResponse(
+            results=results,
+            query_embedding=query_embedding if data.include_embedding else None,
+        )
+
+    except Exception as e:
+        if lexical_search is not None:
+            lexical_search.cancel()
+        logger.error("Error during search", extra={"props": {"error": str(e)}})
+        raise HTTPException(
+            status_code=500, detail=f"Error searching embeddings: {str(e)}"
+        )
+
+
+@router.post(
+    "/retrieve/batch",
+    response_model=BatchSearchResponse,
+    summary="Retrieve Similar Text for Several Queries",
+    description="Batch form of `/retrieve/` for query variants of one user: all texts are embedded in a single upstream call and searched with one multi-vector search. Results come back per query, in request order; with `merge` a deduplicated view fused across queries (reciprocal rank fusion) is returned as well. `score_threshold`, `all_above_threshold`, `nprobe` / `ef` override the index search parameters.",
+)
+async def retrieve_embeddings_batch(
+    data: BatchTextRequest,
+    limit: Optional[int] = 5,
+    score_threshold: Optional[float] = 0.3,
+    mmr_lambda: float = Query(settings.RERANK_MMR_LAMBDA, ge=0.0, le=1.0),
+    fetch_factor: int = Query(settings.RERANK_FETCH_FACTOR, ge=1, le=50),
+    mode: Literal["vector", "hybrid"] = "vector",
+    nprobe: Optional[int] = Query(None, ge=1, le=65536),
+    ef: Optional[int] = Query(None, ge=1, le=32768),
+    all_above_threshold: bool = False,
+    query_batcher: QueryEmbeddingBatcher = Depends(get_query_batcher),
+    db: VectorStore = Depends(get_vector_store),
+    lexical_store: LexicalStore = Depends(get_lexical_store),
+    pool: BlockingPool = Depends(get_search_pool),
+):
+    if len(data.texts) > settings.RETRIEVE_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.RETRIEVE_BATCH_MAX_QUERIES} texts per batch",
         )
 
-        results = [
-            SearchResult(text=doc["text"], similarity=doc["score"])
-            for doc in similar_docs
-        ]
+    limit, fetch_limit = _limits(limit, fetch_factor, all_above_threshold)
+    lexical_searches = []
+    try:
+        if mode == "hybrid":
+            lexical_searches = [
+                asyncio.create_task(
+                    _lexical_search(pool, lexical_store, data.user_id, text, limit)
+                )
+                for text in data.texts
+            ]
+
+        with span("embed"):
+            query_embeddings = await query_batcher.embedder.acreate_embeddings(
+                data.texts, pool
+            )
+
+        with span("ann"):
+            rankings = await pool.run(
+                db.search_similar_batch,
+                user_id=data.user_id,
+                query_embeddings=query_embeddings,
+                limit=fetch_limit,
+                score_threshold=score_threshold,
+                include_vectors=_needs_rerank(mmr_lambda, fetch_factor),
+                search_params=_search_params(nprobe, ef),
+            )
+        with span("rerank"):
+            rankings = [
+                _rerank(query_embedding, docs, limit, mmr_lambda, fetch_factor)
+                for query_embedding, docs in zip(query_embeddings, rankings)
+            ]
+
+        if lexical_searches:
+            lexical_rankings = await asyncio.gather(*lexical_searches)
+            rankings = [
+                reciprocal_rank_fusion([docs, lexical], k=settings.HYBRID_RRF_K)[:limit]
+                for docs, lexical in zip(rankings, lexical_rankings)
+            ]
 
-        print(f"✅ Found {len(results)} similar documents")
-        return SearchResponse(results=results)
+        merged = None
+        if data.merge:
+            merged = _to_results(
+                reciprocal_rank_fusion(rankings, k=settings.HYBRID_RRF_K)[:limit]
+            )
+
+        logger.debug(
+            "Retrieved documents",
+            extra={
+                "props": {
+                    "user_id": data.user_id,
+                    "mode": mode,
+                    "queries": len(data.texts),
+                    "hits": sum(len(docs) for docs in rankings),
+                }
+            },
+        )
+        return BatchSearchResponse(
+            results=[_to_results(docs) for docs in rankings],
+            merged=merged,
+            query_embeddings=query_embeddings if data.include_embedding else None,
+        )
 
     except Exception as e:
-        print(f"❌ Error during search: {str(e)}")
+        for search in lexical_searches:
+            search.cancel()
+        logger.error("Error during batch search", extra={"props": {"error": str(e)}})
         raise HTTPException(
             status_code=500, detail=f"Error searching embeddings: {str(e)}"
         )
+
+
+async def _lexical_search(
+    pool: BlockingPool, lexical_store: LexicalStore, user_id: str, text: str, limit: int
+) -> list[dict]:
+    with span("lexical"):
+        return await pool.run(lexical_store.search, user_id, text, limit)
+
+
+def _limits(
+    limit: int, fetch_factor: int, all_above_threshold: bool
+) -> tuple[int, int]:
+    """Hits to return and candidates to fetch from the vector store."""
+    if all_above_threshold:
+        return settings.RETRIEVE_MAX_HITS, settings.RETRIEVE_MAX_HITS
+    return limit, limit * fetch_factor
+
+
+def _search_params(nprobe: Optional[int], ef: Optional[int]) -> Optional[dict]:
+    params = {
+        key: value for key, value in (("nprobe", nprobe), ("ef", ef)) if value
+    }
+    return params or None
+
+
+def _needs_rerank(mmr_lambda: float, fetch_factor: int) -> bool:
+    return fetch_factor > 1 or mmr_lambda < 1.0
+
+
+def _rerank(
+    query_embedding: list[float],
+    docs: list[dict],
+    limit: int,
+    mmr_lambda: float,
+    fetch_factor: int,
+) -> list[dict]:
+    if not docs or not _needs_rerank(mmr_lambda, fetch_factor):
+        return docs
+    selected = mmr_select(
+        np.asarray(query_embedding, dtype=np.float32),
+        candidate_matrix(docs),
+        k=limit,
+        lambda_mult=mmr_lambda,
+        duplicate_threshold=settings.RERANK_DUPLICATE_THRESHOLD,
+    )
+    return [docs[i] for i in selected]
+
+
+def _to_results(docs: list[dict]) -> list[SearchResult]:
+    return [SearchResult(text=doc["text"], similarity=doc["score"]) for doc in docs]
@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings
+import os
 from functools import lru_cache
+from typing import Dict, Optional
 
 
 class Settings(BaseSettings):
@@ -9,16 +11,85 @@ class Settings(BaseSettings):
         "An API for chunking text, creating embeddings, and performing semantic search using Milvus"
     )
 
+    # Logging: records are queued and written by a background thread.
+    # DEBUG adds per-call and per-hit detail on the search path.
+    LOG_LEVEL: str = "INFO"
+
+    # Vector store settings
+    VECTOR_STORE_BACKEND: str = "milvus"  # "milvus" or "local"
+    EMBEDDING_DIM: int = 1536
+    # If the store is unreachable at boot, startup is retried in the
+    # background, backing off from the initial delay up to the maximum.
+    VECTOR_STORE_RETRY_INITIAL_SECONDS: float = 1.0
+    VECTOR_STORE_RETRY_MAX_SECONDS: float = 30.0
+
+    # Local (in-process) vector store settings
+    LOCAL_STORE_PATH: str = "./vector_store"
+    LOCAL_INDEX_TYPE: str = "flat"  # "flat", "ivf" or "hnsw"
+    LOCAL_IVF_NLIST: int = 256
+    LOCAL_IVF_NPROBE: int = 16
+    LOCAL_HNSW_M: int = 32
+    LOCAL_HNSW_EF_SEARCH: int = 64
+
     # Milvus settings
     MILVUS_HOST: str = "127.0.0.1"
     MILVUS_PORT: str = "19530"
     COLLECTION_NAME: str = "embeddings"
+    MILVUS_NUM_PARTITIONS: int = 64
+    # Vector index; see app/db/index_config.py and benchmarks/index_tuning.py.
+    # Params are JSON objects in the environment, e.g. MILVUS_SEARCH_PARAMS='{"ef": 64}'.
+    MILVUS_INDEX_TYPE: str = "IVF_FLAT"  # FLAT, IVF_FLAT, IVF_SQ8, IVF_PQ or HNSW
+    # COSINE (or IP over normalized vectors) scores hits in [-1, 1], which is
+    # what score_threshold is compared against; L2 scores are 1 / (1 + d).
+    MILVUS_METRIC_TYPE: str = "COSINE"  # L2, IP or COSINE
+    MILVUS_INDEX_PARAMS: Dict[str, int] = {"nlist": 1024}
+    MILVUS_SEARCH_PARAMS: Dict[str, int] = {"nprobe": 16}
 
     # OpenAI API settings
     OPENAI_API_KEY: str
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-ada-002"
     OPENAI_CHAT_MODEL: str = "gpt-3.5-turbo"
 
+    # Embedding cache settings
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: Optional[str] = "./cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 10_000
+    EMBEDDING_CACHE_DISK_ITEMS: int = 500_000
+
+    # Ingestion settings
+    INGEST_MANIFEST_PATH: str = "./ingest_manifests"
+    CHUNK_SIZE: int = 200  # tokens
+    CHUNK_OVERLAP: int = 20  # tokens
+    CHUNK_ENCODING: str = "cl100k_base"
+    CHUNK_PARALLEL_MIN_CHARS: int = 2_000_000
+    CHUNK_PROCESS_WORKERS: int = os.cpu_count() or 1
+    INGEST_QUEUE_SIZE: int = 4
+    INGEST_EMBED_BATCH_SIZE: int = 64
+    INGEST_EMBED_CONCURRENCY: int = 4
+    INGEST_INSERT_CONCURRENCY: int = 2
+
+    # Executor pools for blocking work (vector store, parsing, disk cache)
+    INGEST_POOL_WORKERS: int = 4
+    SEARCH_POOL_WORKERS: int = 8
+
+    # Query embedding micro-batching settings
+    QUERY_BATCH_WINDOW_MS: float = 5.0
+    QUERY_BATCH_MAX_SIZE: int = 64
+    RETRIEVE_BATCH_MAX_QUERIES: int = 16
+    # Hard cap on hits for all_above_threshold retrievals.
+    RETRIEVE_MAX_HITS: int = 100
+
+    # Lexical (BM25) index and hybrid retrieval
+    LEXICAL_INDEX_PATH: str = "./lexical_index"
+    LEXICAL_BM25_K1: float = 1.2
+    LEXICAL_BM25_B: float = 0.75
+    HYBRID_RRF_K: int = 60
+
+    # Re-ranking (MMR_LAMBDA=1 with FETCH_FACTOR=1 returns the raw top-k)
+    RERANK_MMR_LAMBDA: float = 0.7
+    RERANK_FETCH_FACTOR: int = 4
+    RERANK_DUPLICATE_THRESHOLD: float = 0.95
+
     class Config:
         env_file = ".env"
         extra = "ignore"
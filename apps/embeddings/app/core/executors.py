@@ -0,0 +1,52 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, TypeVar
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+class BlockingPool:
+    """A dedicated, fixed-size thread pool for one class of blocking work.
+
+    Ingestion and search each get their own pool, so a large ingest can
+    occupy every ingest worker without delaying a single search call, and
+    neither competes with the event loop's default executor.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"{name}-pool"
+        )
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        return await loop.run_in_executor(self.executor, call)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache()
+def get_ingest_pool() -> BlockingPool:
+    return BlockingPool("ingest", settings.INGEST_POOL_WORKERS)
+
+
+@lru_cache()
+def get_search_pool() -> BlockingPool:
+    return BlockingPool("search", settings.SEARCH_POOL_WORKERS)
+
+
+def shutdown_pools():
+    for getter in (get_ingest_pool, get_search_pool):
+        if getter.cache_info().currsize:
+            getter().shutdown()
@@ -0,0 +1,163 @@
+import json
+import math
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Search-time parameters each Milvus index type accepts.
+SEARCH_PARAM_KEYS = {
+    "FLAT": (),
+    "IVF_FLAT": ("nprobe",),
+    "IVF_SQ8": ("nprobe",),
+    "IVF_PQ": ("nprobe",),
+    "HNSW": ("ef",),
+}
+METRIC_TYPES = ("L2", "IP", "COSINE")
+
+
+@dataclass(frozen=True)
+class IndexConfig:
+    """Vector index type, metric and build/search parameters for Milvus."""
+
+    index_type: str
+    metric_type: str = "L2"
+    build_params: dict = field(default_factory=dict)
+    search_params: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.index_type not in SEARCH_PARAM_KEYS:
+            raise ValueError(f"Unsupported index type: {self.index_type}")
+        if self.metric_type not in METRIC_TYPES:
+            raise ValueError(f"Unsupported metric type: {self.metric_type}")
+
+    @classmethod
+    def from_settings(cls) -> "IndexConfig":
+        return cls(
+            index_type=settings.MILVUS_INDEX_TYPE,
+            metric_type=settings.MILVUS_METRIC_TYPE,
+            build_params=dict(settings.MILVUS_INDEX_PARAMS),
+            search_params=dict(settings.MILVUS_SEARCH_PARAMS),
+        )
+
+    def index_params(self) -> dict:
+        return {
+            "index_type": self.index_type,
+            "metric_type": self.metric_type,
+            "params": dict(self.build_params),
+        }
+
+    def search_param(
+        self,
+        limit: int,
+        overrides: Optional[dict] = None,
+        score_threshold: Optional[float] = None,
+    ) -> dict:
+        """Search parameters with per-request ``overrides`` applied.
+
+        Overrides that don't apply to this index type are ignored, and HNSW's
+        ``ef`` is raised to ``limit`` since Milvus rejects ``ef < limit``.
+        A ``score_threshold`` turns the search into a range search, so Milvus
+        only returns hits at least that similar.
+        """
+        keys = SEARCH_PARAM_KEYS[self.index_type]
+        params = {k: v for k, v in self.search_params.items() if k in keys}
+        params.update(
+            {k: v for k, v in (overrides or {}).items() if k in keys and v is not None}
+        )
+        if "ef" in params:
+            params["ef"] = max(params["ef"], limit)
+        radius = None if score_threshold is None else self.radius(score_threshold)
+        if radius is not None:
+            params["radius"] = radius
+        return {"metric_type": self.metric_type, "params": params}
+
+    def similarity(self, distance: float) -> float:
+        """Map a Milvus distance to a score where higher is more similar."""
+        if self.metric_type == "L2":
+            return 1 / (1 + distance)
+        return distance
+
+    def radius(self, score_threshold: float) -> Optional[float]:
+        """The distance bound matching ``score_threshold``; None if unbounded.
+
+        For L2 hits must lie within the radius, for IP and COSINE their
+        distance (a similarity) must exceed it.
+        """
+        if self.metric_type == "L2":
+            return 1 / score_threshold - 1 if score_threshold > 0 else None
+        if self.metric_type == "COSINE" and score_threshold <= -1:
+            return None
+        return score_threshold
+
+    def prepare(self, vectors: list[list[float]]) -> list[list[float]]:
+        """Normalize vectors for IP so inner products are cosine similarities.
+
+        COSINE normalizes server-side and L2 uses raw vectors, so both pass
+        through unchanged.
+        """
+        if self.metric_type != "IP":
+            return vectors
+        return normalize(np.asarray(vectors, dtype=np.float32)).tolist()
+
+    def env(self) -> dict[str, str]:
+        """The settings that select this configuration, as environment values."""
+        return {
+            "MILVUS_INDEX_TYPE": self.index_type,
+            "MILVUS_METRIC_TYPE": self.metric_type,
+            "MILVUS_INDEX_PARAMS": json.dumps(self.build_params),
+            "MILVUS_SEARCH_PARAMS": json.dumps(self.search_params),
+        }
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length, leaving all-zero rows as they are."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def ivf_nlist(num_vectors: int) -> int:
+    """Roughly 4 * sqrt(n) lists, rounded to a power of two."""
+    target = 4 * math.sqrt(max(num_vectors, 1))
+    return int(min(65536, max(16, 2 ** round(math.log2(target)))))
+
+
+def pq_subquantizers(dim: int) -> int:
+    """The largest divisor of ``dim`` giving sub-vectors of at least 8 dims."""
+    for m in range(dim // 8, 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def recommend(
+    num_vectors: int, dim: int = settings.EMBEDDING_DIM, metric_type: str = "L2"
+) -> IndexConfig:
+    """Starting-point index configuration for a collection of ``num_vectors``.
+
+    Small collections are searched exactly, mid-sized ones with HNSW, large
+    ones with IVF_SQ8 (a quarter of the memory of raw floats) and very
+    large ones with IVF_PQ. Run ``benchmarks/index_tuning.py`` on the
+    actual data to confirm recall before switching.
+    """
+    if num_vectors < 20_000:
+        return IndexConfig("FLAT", metric_type)
+    if num_vectors < 2_000_000:
+        m = 16 if num_vectors < 200_000 else 32
+        return IndexConfig(
+            "HNSW", metric_type, {"M": m, "efConstruction": 200}, {"ef": 64}
+        )
+    nlist = ivf_nlist(num_vectors)
+    nprobe = max(8, nlist // 64)
+    if num_vectors < 20_000_000:
+        return IndexConfig("IVF_SQ8", metric_type, {"nlist": nlist}, {"nprobe": nprobe})
+    return IndexConfig(
+        "IVF_PQ",
+        metric_type,
+        {"nlist": nlist, "m": pq_subquantizers(dim), "nbits": 8},
+        {"nprobe": nprobe},
+    )
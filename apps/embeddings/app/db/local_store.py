@@ -0,0 +1,467 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.db.index_config import normalize
+from app.db.vector_store import VectorStore
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class _Shard:
+    """Append-only vectors and chunk records for one user.
+
+    Vectors live in ``vectors.f32`` as raw float32 rows and are read through a
+    read-only memmap, so only the pages a search touches are resident. Upserts
+    append a new row and tombstone the row previously holding the id; the
+    shard is compacted once tombstones outnumber live rows. IVF and HNSW
+    indexes are built by faiss on first search and persisted next to the
+    vectors; rows added later are written back by ``flush`` rather than per
+    batch, and a stale file is rebuilt when the row count no longer matches.
+    ``meta.json`` records whether rows are stored unit length (cosine).
+    """
+
+    def __init__(self, path: str, dim: int, index_type: str, normalized: bool):
+        self.path = path
+        self.dim = dim
+        self.index_type = index_type
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.records_path = os.path.join(path, "records.jsonl")
+        self.tombstones_path = os.path.join(path, "tombstones.json")
+        self.meta_path = os.path.join(path, "meta.json")
+        self.index_path = os.path.join(path, f"{index_type}.faiss")
+        self.lock = threading.RLock()
+        self.index = None
+        self.index_dirty = False
+
+        os.makedirs(path, exist_ok=True)
+        self.ids: list[int] = []
+        self.texts: list[str] = []
+        if os.path.exists(self.records_path):
+            with open(self.records_path, encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    self.ids.append(record["id"])
+                    self.texts.append(record["text"])
+        self.dead: set[int] = set()
+        if os.path.exists(self.tombstones_path):
+            with open(self.tombstones_path, encoding="utf-8") as f:
+                self.dead = set(json.load(f))
+        self.row_of = {
+            id_: row for row, id_ in enumerate(self.ids) if row not in self.dead
+        }
+        self._map_vectors()
+        self.normalized = self._load_normalized(normalized)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def upsert(
+        self,
+        ids: list[int],
+        texts: list[str],
+        embeddings: list[list[float]],
+        source: str,
+    ):
+        rows = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        with self.lock:
+            replaced = [self.row_of[id_] for id_ in ids if id_ in self.row_of]
+            first_row = len(self.ids)
+            with open(self.vectors_path, "ab") as f:
+                f.write(rows.tobytes())
+            with open(self.records_path, "a", encoding="utf-8") as f:
+                f.writelines(
+                    json.dumps({"id": id_, "text": text, "source": source}) + "\n"
+                    for id_, text in zip(ids, texts)
+                )
+            for offset, id_ in enumerate(ids):
+                self.row_of[id_] = first_row + offset
+            self.ids.extend(ids)
+            self.texts.extend(texts)
+            self.dead.update(replaced)
+            self._map_vectors(rows)
+            if self.index is not None and self.index.is_trained:
+                self.index.add(rows)
+                self.index_dirty = True
+            else:
+                self.index = None
+            self._save_tombstones()
+            self._maybe_compact()
+
+    def delete(self, ids: Optional[list[int]] = None):
+        with self.lock:
+            if ids is None:
+                ids = list(self.row_of)
+            rows = [self.row_of.pop(id_) for id_ in ids if id_ in self.row_of]
+            self.dead.update(rows)
+            self.live[rows] = False
+            self._save_tombstones()
+            self._maybe_compact()
+
+    def flush(self):
+        """Write the index to disk if rows were added since it was saved."""
+        with self.lock:
+            if self.index is not None and self.index_dirty:
+                self._save_index()
+
+    def search(
+        self,
+        query: np.ndarray,
+        limit: int,
+        search_params: Optional[dict] = None,
+        max_distance: Optional[float] = None,
+        include_vectors: bool = False,
+    ) -> list[tuple[int, str, Optional[np.ndarray], float]]:
+        """Return ``(id, text, vector, squared L2 distance)`` of the nearest live rows.
+
+        ``search_params`` (``nprobe`` / ``ef``) apply to this call only. With
+        ``max_distance`` only rows within it are returned, at most ``limit``.
+        Hits are read under the shard lock, so an upsert or compaction can't
+        move rows between picking them and reading them. ``vector`` is a
+        copy of the row with ``include_vectors`` and None otherwise.
+        """
+        with self.lock:
+            distances, rows = self._nearest(query, limit, search_params, max_distance)
+            return [
+                (
+                    self.ids[row],
+                    self.texts[row],
+                    np.array(self.vectors[row]) if include_vectors else None,
+                    distance,
+                )
+                for distance, row in zip(distances.tolist(), rows.tolist())
+            ]
+
+    def _nearest(
+        self,
+        query: np.ndarray,
+        limit: int,
+        search_params: Optional[dict] = None,
+        max_distance: Optional[float] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # Squared L2 distances and row numbers; the caller holds the lock.
+        limit = min(limit, len(self.row_of))
+        if limit <= 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        index = self._get_index()
+        if index is None:
+            return self._search_flat(query, limit, max_distance)
+        if search_params:
+            self._tune(index, search_params)
+        try:
+            if max_distance is not None and self.index_type == "ivf":
+                # IVF supports range search natively; HNSW doesn't.
+                _, distances, rows = index.range_search(
+                    query.reshape(1, -1), max_distance
+                )
+                order = np.argsort(distances)
+                distances, rows = distances[order], rows[order]
+            else:
+                # Over-fetch by the tombstone count so dead rows can't
+                # crowd out hits.
+                fetch = min(limit + len(self.dead), len(self))
+                distances, rows = index.search(query.reshape(1, -1), fetch)
+                distances, rows = distances[0], rows[0]
+        finally:
+            if search_params:
+                self._tune(index)
+        keep = (rows >= 0) & self.live[np.maximum(rows, 0)]
+        if max_distance is not None:
+            keep &= distances <= max_distance
+        return distances[keep][:limit], rows[keep][:limit]
+
+    def _search_flat(
+        self, query: np.ndarray, limit: int, max_distance: Optional[float] = None
+    ):
+        distances = self.sq_norms - 2.0 * (self.vectors @ query) + float(query @ query)
+        distances[~self.live] = np.inf
+        if max_distance is not None:
+            distances[distances > max_distance] = np.inf
+            limit = min(limit, int(np.isfinite(distances).sum()))
+            if limit == 0:
+                return distances[:0], np.empty(0, dtype=np.int64)
+        if limit < len(distances):
+            rows = np.argpartition(distances, limit - 1)[:limit]
+        else:
+            rows = np.arange(len(distances))
+        rows = rows[np.argsort(distances[rows])]
+        return distances[rows], rows
+
+    def _maybe_compact(self):
+        if len(self.dead) <= max(1024, len(self.row_of)):
+            return
+        keep = np.flatnonzero(self.live)
+        vectors = np.array(self.vectors[keep])
+        with open(self.records_path, encoding="utf-8") as f:
+            records = [line for row, line in enumerate(f) if self.live[row]]
+
+        self.vectors = None
+        with open(f"{self.vectors_path}.tmp", "wb") as f:
+            f.write(vectors.tobytes())
+        with open(f"{self.records_path}.tmp", "w", encoding="utf-8") as f:
+            f.writelines(records)
+        os.replace(f"{self.vectors_path}.tmp", self.vectors_path)
+        os.replace(f"{self.records_path}.tmp", self.records_path)
+
+        self.ids = [self.ids[row] for row in keep]
+        self.texts = [self.texts[row] for row in keep]
+        self.dead = set()
+        self.row_of = {id_: row for row, id_ in enumerate(self.ids)}
+        self.index = None
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        self._save_tombstones()
+        self._map_vectors()
+
+    def _map_vectors(self, appended: Optional[np.ndarray] = None):
+        if self.ids:
+            self.vectors = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self.ids), self.dim),
+            )
+            if appended is None:
+                self.sq_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+            else:
+                self.sq_norms = np.concatenate(
+                    [self.sq_norms, np.einsum("ij,ij->i", appended, appended)]
+                )
+        else:
+            self.vectors = np.empty((0, self.dim), dtype=np.float32)
+            self.sq_norms = np.empty(0, dtype=np.float32)
+        self.live = np.ones(len(self.ids), dtype=bool)
+        if self.dead:
+            self.live[list(self.dead)] = False
+
+    def _load_normalized(self, wanted: bool) -> bool:
+        """Whether rows are unit length, migrating raw rows if cosine is wanted.
+
+        Shards written before cosine scoring have no meta file and raw rows;
+        they are normalized once, which preserves every cosine similarity.
+        Normalized rows can't be restored, so such a shard keeps cosine
+        scoring when the store is switched back to L2.
+        """
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                stored = json.load(f)["normalized"]
+        else:
+            stored = wanted if not self.ids else False
+
+        if wanted and not stored:
+            self._normalize_rows()
+            stored = True
+        elif stored and not wanted:
+            logger.warning(
+                "Local shard holds normalized vectors; keeping cosine scoring",
+                extra={"props": {"path": self.path}},
+            )
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump({"normalized": stored}, f)
+        return stored
+
+    def _normalize_rows(self):
+        vectors = normalize(np.array(self.vectors))
+        self.vectors = None
+        with open(f"{self.vectors_path}.tmp", "wb") as f:
+            f.write(vectors.tobytes())
+        os.replace(f"{self.vectors_path}.tmp", self.vectors_path)
+        self.index = None
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        self._map_vectors()
+        logger.info(
+            "Normalized local shard for cosine scoring",
+            extra={"props": {"path": self.path, "rows": len(self.ids)}},
+        )
+
+    def _save_tombstones(self):
+        with open(self.tombstones_path, "w", encoding="utf-8") as f:
+            json.dump(sorted(self.dead), f)
+
+    def _get_index(self):
+        if self.index_type == "flat":
+            return None
+        if self.index is not None:
+            return self.index
+
+        import faiss
+
+        if os.path.exists(self.index_path):
+            index = faiss.read_index(self.index_path)
+            if index.ntotal == len(self):
+                self.index = index
+                self._tune(index)
+                return index
+
+        if self.index_type == "ivf":
+            nlist = min(settings.LOCAL_IVF_NLIST, len(self) // 39)
+            if nlist < 1:
+                # Too few rows to train an IVF quantizer; exact search is cheaper.
+                return None
+            quantizer = faiss.IndexFlatL2(self.dim)
+            index = faiss.IndexIVFFlat(quantizer, self.dim, nlist)
+            index.train(np.ascontiguousarray(self.vectors))
+        elif self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dim, settings.LOCAL_HNSW_M)
+        else:
+            raise ValueError(f"Unknown LOCAL_INDEX_TYPE: {self.index_type}")
+
+        index.add(np.ascontiguousarray(self.vectors))
+        self._tune(index)
+        self.index = index
+        self._save_index()
+        return index
+
+    def _tune(self, index, search_params: Optional[dict] = None):
+        search_params = search_params or {}
+        if self.index_type == "ivf":
+            index.nprobe = search_params.get("nprobe", settings.LOCAL_IVF_NPROBE)
+        elif self.index_type == "hnsw":
+            index.hnsw.efSearch = search_params.get("ef", settings.LOCAL_HNSW_EF_SEARCH)
+
+    def _save_index(self):
+        import faiss
+
+        faiss.write_index(self.index, self.index_path)
+        self.index_dirty = False
+
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store keeping one memory-mapped shard per user.
+
+    Shards are searched by L2 distance. With a COSINE or IP
+    ``MILVUS_METRIC_TYPE`` vectors are normalized on the way in, which makes
+    squared L2 distance ``2 - 2 * cosine``, and hits are scored by cosine
+    so thresholds mean the same on both backends. Scoring follows what each
+    shard actually stores, and shards written with raw vectors are
+    normalized when first opened.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.collection_name = settings.COLLECTION_NAME
+        self.root = os.path.join(
+            path or settings.LOCAL_STORE_PATH, self.collection_name
+        )
+        self.dim = settings.EMBEDDING_DIM
+        self.index_type = settings.LOCAL_INDEX_TYPE
+        self.cosine = settings.MILVUS_METRIC_TYPE != "L2"
+        self._shards: dict[str, _Shard] = {}
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def startup(self):
+        self.create_collection()
+        self._ready = True
+        logger.info(
+            "Local vector store ready",
+            extra={"props": {"path": self.root, "index_type": self.index_type}},
+        )
+
+    def shutdown(self):
+        self._ready = False
+        self.flush()
+        self._shards.clear()
+
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def create_collection(self):
+        os.makedirs(self.root, exist_ok=True)
+
+    def upsert_embeddings(
+        self,
+        user_id: str,
+        ids: list[int],
+        texts: list[str],
+        embeddings: list[list[float]],
+        source: str,
+    ):
+        logger.debug(
+            "Upserting embeddings",
+            extra={"props": {"user_id": user_id, "count": len(texts)}},
+        )
+        shard = self._shard(user_id)
+        if shard.normalized:
+            embeddings = normalize(np.asarray(embeddings, dtype=np.float32))
+        shard.upsert(ids, texts, embeddings, source)
+
+    def delete_embeddings(self, user_id: str, ids: Optional[list[int]] = None):
+        count = "all" if ids is None else len(ids)
+        logger.info(
+            "Deleting embeddings", extra={"props": {"user_id": user_id, "count": count}}
+        )
+        self._shard(user_id).delete(ids)
+
+    def flush(self):
+        for shard in list(self._shards.values()):
+            shard.flush()
+
+    def search_similar(
+        self,
+        user_id: str,
+        query_embedding: list[float],
+        limit: int = 5,
+        score_threshold: float = 0.5,
+        include_vectors: bool = False,
+        search_params: Optional[dict] = None,
+    ) -> list[dict]:
+        shard = self._shard(user_id)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        cosine = shard.normalized
+        if cosine:
+            query = normalize(query)
+        hits = shard.search(
+            query,
+            limit,
+            search_params,
+            _max_distance(cosine, score_threshold),
+            include_vectors,
+        )
+
+        similar_docs = []
+        for id_, text, vector, distance in hits:
+            doc = {
+                "id": id_,
+                "text": text,
+                "score": _similarity(cosine, distance),
+                "user_id": user_id,
+                "distance": distance,
+            }
+            if include_vectors:
+                doc["embedding"] = vector
+            similar_docs.append(doc)
+        return similar_docs
+
+    def _shard(self, user_id: str) -> _Shard:
+        shard = self._shards.get(user_id)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.get(user_id)
+                if shard is None:
+                    digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+                    shard = _Shard(
+                        os.path.join(self.root, digest),
+                        self.dim,
+                        self.index_type,
+                        self.cosine,
+                    )
+                    self._shards[user_id] = shard
+        return shard
+
+
+def _similarity(cosine: bool, distance: float) -> float:
+    return 1 - distance / 2 if cosine else 1 / (1 + distance)
+
+
+def _max_distance(cosine: bool, score_threshold: float) -> Optional[float]:
+    if cosine:
+        return 2 * (1 - score_threshold) if score_threshold > -1 else None
+    return 1 / score_threshold - 1 if score_threshold > 0 else None
@@ -0,0 +1,158 @@
+"""One-off Milvus schema migrations.
+
+Run from ``apps/embeddings`` while the API is stopped::
+
+    python -m app.db.migrations
+
+The existing collection is copied into a new collection built from the
+current schema (user_id partition key, deterministic chunk ids), the old
+collection is dropped and the copy is renamed into its place. Rows from an
+auto-id collection get ids derived from their text, so duplicates left by
+earlier re-ingestion runs collapse into one row.
+
+With ``--reindex`` the vector index of the existing collection is instead
+dropped and rebuilt from the configured ``MILVUS_INDEX_TYPE``,
+``MILVUS_METRIC_TYPE`` and ``MILVUS_INDEX_PARAMS``.
+"""
+
+import argparse
+import logging
+
+from pymilvus import Collection, utility
+
+from observability.logging import setup_logging
+from app.core.config import get_settings
+from app.db.milvus import (
+    MilvusDB,
+    has_auto_id,
+    index_is_current,
+    schema_is_current,
+    vector_index,
+)
+from app.services.ingest_manifest import chunk_id, content_hash
+
+logger = logging.getLogger(__name__)
+
+
+def count_entities(collection: Collection) -> int:
+    return collection.query(expr="", output_fields=["count(*)"])[0]["count(*)"]
+
+
+def copy_collection(source: Collection, target: Collection, batch_size: int) -> int:
+    """Upsert every row of ``source`` into ``target``; returns the distinct ids."""
+    assign_ids = has_auto_id(source)
+    iterator = source.query_iterator(
+        batch_size=batch_size, expr="", output_fields=["*"]
+    )
+    ids = set()
+    copied = 0
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+            for row in rows:
+                if assign_ids:
+                    text_hash = content_hash(row["text"])
+                    row["id"] = chunk_id(row["user_id"], row.get("source", ""), text_hash)
+                ids.add(row["id"])
+            target.upsert(rows)
+            copied += len(rows)
+            logger.info("Copied entities", extra={"props": {"copied": copied}})
+    finally:
+        iterator.close()
+    return len(ids)
+
+
+def migrate_collection(db: MilvusDB, batch_size: int = 1000):
+    name = db.collection_name
+    if name not in utility.list_collections():
+        logger.info(
+            "Collection does not exist; nothing to migrate",
+            extra={"props": {"collection": name}},
+        )
+        return
+
+    source = Collection(name)
+    if schema_is_current(source):
+        logger.info(
+            "Collection already uses the current schema",
+            extra={"props": {"collection": name}},
+        )
+        return
+
+    staging_name = f"{name}__migrated"
+    if staging_name in utility.list_collections():
+        utility.drop_collection(staging_name)
+
+    source.load()
+    target = db.create_collection(staging_name)
+    expected = copy_collection(source, target, batch_size)
+    target.flush()
+    target.load()
+    copied = count_entities(target)
+    target.release()
+    if copied != expected:
+        raise RuntimeError(
+            f"Copied {copied} of {expected} entities; leaving {name} untouched"
+        )
+
+    source.release()
+    utility.drop_collection(name)
+    utility.rename_collection(staging_name, name)
+    logger.info(
+        "Migrated collection", extra={"props": {"collection": name, "copied": copied}}
+    )
+
+
+def reindex_collection(db: MilvusDB):
+    name = db.collection_name
+    if name not in utility.list_collections():
+        logger.info(
+            "Collection does not exist; nothing to reindex",
+            extra={"props": {"collection": name}},
+        )
+        return
+
+    collection = Collection(name)
+    current = vector_index(collection)
+    if current is not None and index_is_current(collection, db.index_config):
+        if current.params.get("params") == db.index_config.build_params:
+            logger.info(
+                "Collection already uses the configured index",
+                extra={"props": {"collection": name}},
+            )
+            return
+
+    collection.release()
+    if current is not None:
+        collection.drop_index(index_name=current.index_name)
+    db.create_vector_index(collection)
+    utility.wait_for_index_building_complete(
+        name, index_name=vector_index(collection).index_name
+    )
+    collection.load()
+    logger.info("Rebuilt the vector index", extra={"props": {"collection": name}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="rebuild the vector index from the configured index settings",
+    )
+    args = parser.parse_args()
+
+    setup_logging(get_settings().LOG_LEVEL)
+    db = MilvusDB()
+    db.init_connection()
+    if args.reindex:
+        reindex_collection(db)
+    else:
+        migrate_collection(db, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
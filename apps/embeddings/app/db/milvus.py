@@ -1,3 +1,7 @@
+import dataclasses
+import json
+import logging
+from typing import Optional
 from pymilvus import (
     Collection,
     connections,
@@ -6,112 +10,297 @@ from pymilvus import (
     FieldSchema,
     DataType,
 )
+from pymilvus.client.types import LoadState
 from app.core.config import get_settings
 from app.core.exceptions import MilvusConnectionError
+from app.db.index_config import IndexConfig
+from app.db.vector_store import VectorStore
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 
-class MilvusDB:
-    def __init__(self):
-        self.collection_name = settings.COLLECTION_NAME
-        self.init_connection()
+def tenant_filter(user_id: str) -> str:
+    escaped = user_id.replace("\\", "\\\\").replace('"', '\\"')
+    return f'user_id == "{escaped}"'
+
+
+def has_partition_key(collection: Collection) -> bool:
+    return any(
+        getattr(field, "is_partition_key", False)
+        for field in collection.schema.fields
+    )
+
+
+def has_auto_id(collection: Collection) -> bool:
+    return any(
+        field.is_primary and field.auto_id for field in collection.schema.fields
+    )
+
+
+def schema_is_current(collection: Collection) -> bool:
+    return has_partition_key(collection) and not has_auto_id(collection)
+
+
+def vector_index(collection: Collection):
+    return next(
+        (index for index in collection.indexes if index.field_name == "embedding"),
+        None,
+    )
+
+
+def index_is_current(collection: Collection, config: IndexConfig) -> bool:
+    index = vector_index(collection)
+    if index is None:
+        return False
+    params = index.params
+    return (
+        params.get("index_type") == config.index_type
+        and params.get("metric_type") == config.metric_type
+    )
+
+
+def live_index_config(collection: Collection, configured: IndexConfig) -> IndexConfig:
+    """The configuration of the collection's existing vector index.
+
+    Searches must use the metric the index was built with, so until a
+    reindex the live index type, metric and build params win over the
+    configured ones; configured search params still apply where they fit.
+    """
+    index = vector_index(collection)
+    if index is None:
+        return configured
+    params = index.params
+    build_params = params.get("params") or {}
+    if isinstance(build_params, str):
+        build_params = json.loads(build_params)
+    metric_type = params.get("metric_type", configured.metric_type)
+    try:
+        return IndexConfig(
+            params.get("index_type", configured.index_type),
+            metric_type,
+            build_params,
+            configured.search_params,
+        )
+    except ValueError:
+        # An index type we don't tune (e.g. AUTOINDEX); only the metric matters.
+        return dataclasses.replace(configured, metric_type=metric_type)
+
+
+class MilvusDB(VectorStore):
+    """Process-lifetime Milvus handle.
+
+    ``startup`` connects once, ensures the collection exists and loads it into
+    the query nodes; the collection then stays resident and the cached handle
+    is reused by every request until ``shutdown``. ``index_config`` is what
+    new indexes are built with; ``search_config`` matches the index the
+    collection actually has, which differs until a ``--reindex`` (picked up
+    at the next startup).
+    """
+
+    def __init__(
+        self,
+        collection_name: Optional[str] = None,
+        index_config: Optional[IndexConfig] = None,
+    ):
+        self.collection_name = collection_name or settings.COLLECTION_NAME
+        self.index_config = index_config or IndexConfig.from_settings()
+        self.search_config = self.index_config
+        self.collection: Optional[Collection] = None
 
     def init_connection(self):
         try:
-            print(
-                f"🔌 Connecting to Milvus at {settings.MILVUS_HOST}:{settings.MILVUS_PORT}..."
-            )
             connections.connect(
                 "default", host=settings.MILVUS_HOST, port=settings.MILVUS_PORT
             )
-            print("✅ Successfully connected to Milvus")
+            logger.info(
+                "Connected to Milvus",
+                extra={
+                    "props": {"host": settings.MILVUS_HOST, "port": settings.MILVUS_PORT}
+                },
+            )
         except Exception as e:
-            print(f"❌ Failed to connect to Milvus: {str(e)}")
+            logger.error(
+                "Failed to connect to Milvus", extra={"props": {"error": str(e)}}
+            )
             raise MilvusConnectionError()
 
-    def create_collection(self):
+    def startup(self):
+        self.init_connection()
+        collection = self.create_collection()
+        collection.load()
+        self.collection = collection
+        logger.info(
+            "Collection loaded", extra={"props": {"collection": self.collection_name}}
+        )
+
+    def shutdown(self):
+        self.collection = None
+        connections.disconnect("default")
+        logger.info("Disconnected from Milvus")
+
+    def is_ready(self) -> bool:
+        if self.collection is None:
+            return False
         try:
-            if self.collection_name not in utility.list_collections():
-                print(f"📦 Creating new collection: {self.collection_name}")
-
-                fields = [
-                    FieldSchema(
-                        name="id", dtype=DataType.INT64, is_primary=True, auto_id=True
-                    ),
-                    FieldSchema(name="user_id", dtype=DataType.VARCHAR, max_length=64),
-                    FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535),
-                    FieldSchema(
-                        name="embedding",
-                        dtype=DataType.FLOAT_VECTOR,
-                        dim=1536,
-                    ),
-                ]
-
-                schema = CollectionSchema(
-                    fields=fields,
-                    description="User-specific text embeddings collection",
-                    enable_dynamic_field=True,  
-                )
+            state = utility.load_state(self.collection_name)
+        except Exception as e:
+            logger.error("Readiness check failed", extra={"props": {"error": str(e)}})
+            return False
+        return state == LoadState.Loaded
 
-                collection = Collection(
-                    name=self.collection_name, schema=schema, using="default"
-                )
+    def build_schema(self) -> CollectionSchema:
+        fields = [
+            # Chunk ids are derived from (user, source, chunk hash) so
+            # re-ingesting the same chunk upserts instead of duplicating it.
+            FieldSchema(
+                name="id", dtype=DataType.INT64, is_primary=True, auto_id=False
+            ),
+            # Partition key: Milvus hashes user_id into a fixed set of
+            # partitions and prunes the search to the tenant's partition.
+            FieldSchema(
+                name="user_id",
+                dtype=DataType.VARCHAR,
+                max_length=64,
+                is_partition_key=True,
+            ),
+            FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535),
+            FieldSchema(
+                name="embedding",
+                dtype=DataType.FLOAT_VECTOR,
+                dim=settings.EMBEDDING_DIM,
+            ),
+        ]
 
-                print("📊 Creating indexes...")
-                index_params = {
-                    "metric_type": "L2",
-                    "index_type": "IVF_FLAT",
-                    "params": {"nlist": 1024},
-                }
-                collection.create_index(
-                    field_name="embedding", index_params=index_params
-                )
+        return CollectionSchema(
+            fields=fields,
+            description="User-specific text embeddings collection",
+            enable_dynamic_field=True,
+        )
 
-                collection.create_index(
-                    field_name="user_id",
-                    index_name="user_id_index",
-                    index_params={"index_type": "Trie"},
-                )
+    def create_indexes(self, collection: Collection):
+        self.create_vector_index(collection)
+
+        collection.create_index(
+            field_name="user_id",
+            index_name="user_id_index",
+            index_params={"index_type": "Trie"},
+        )
 
-                print("✅ Successfully created collection and indexes")
+    def create_vector_index(self, collection: Collection):
+        index_params = self.index_config.index_params()
+        logger.info("Creating vector index", extra={"props": index_params})
+        collection.create_index(field_name="embedding", index_params=index_params)
+
+    def create_collection(self, name: Optional[str] = None) -> Collection:
+        name = name or self.collection_name
+        try:
+            if name not in utility.list_collections():
+                logger.info("Creating collection", extra={"props": {"collection": name}})
+                collection = Collection(
+                    name=name,
+                    schema=self.build_schema(),
+                    num_partitions=settings.MILVUS_NUM_PARTITIONS,
+                    using="default",
+                )
+                self.create_indexes(collection)
                 return collection
             else:
-                print(f"📂 Using existing collection: {self.collection_name}")
-                return Collection(self.collection_name)
+                collection = Collection(name)
+                if not schema_is_current(collection):
+                    logger.warning(
+                        "Collection uses an outdated schema; run "
+                        "`python -m app.db.migrations` to migrate it",
+                        extra={"props": {"collection": name}},
+                    )
+                if not index_is_current(collection, self.index_config):
+                    self.search_config = live_index_config(
+                        collection, self.index_config
+                    )
+                    logger.warning(
+                        "Collection has a different vector index than configured; "
+                        "searching with the existing index until "
+                        "`python -m app.db.migrations --reindex` rebuilds it",
+                        extra={
+                            "props": {
+                                "collection": name,
+                                "index_type": self.index_config.index_type,
+                                "metric_type": self.index_config.metric_type,
+                                "live_index_type": self.search_config.index_type,
+                                "live_metric_type": self.search_config.metric_type,
+                            }
+                        },
+                    )
+                return collection
         except Exception as e:
-            print(f"❌ Error creating/accessing collection: {str(e)}")
+            logger.error(
+                "Error creating/accessing collection", extra={"props": {"error": str(e)}}
+            )
             raise
 
-    def get_collection(self):
-        try:
-            print(f"🔍 Getting collection: {self.collection_name}")
-            return Collection(self.collection_name)
-        except Exception as e:
-            print(f"❌ Error getting collection: {str(e)}")
-            raise
+    def get_collection(self) -> Collection:
+        if self.collection is None:
+            raise MilvusConnectionError()
+        return self.collection
 
-    def insert_embeddings(
-        self, user_id: str, texts: list[str], embeddings: list[list[float]]
+    def upsert_embeddings(
+        self,
+        user_id: str,
+        ids: list[int],
+        texts: list[str],
+        embeddings: list[list[float]],
+        source: str,
     ):
         try:
             collection = self.get_collection()
-            collection.load()
 
             entities = [
-                {"user_id": user_id, "text": text, "embedding": embedding}
-                for text, embedding in zip(texts, embeddings)
+                {
+                    "id": id_,
+                    "user_id": user_id,
+                    "text": text,
+                    "embedding": embedding,
+                    "source": source,
+                }
+                for id_, text, embedding in zip(
+                    ids, texts, self.search_config.prepare(embeddings)
+                )
             ]
 
-            print(f"📥 Inserting {len(texts)} embeddings for user {user_id}")
-            collection.insert(entities)
-            collection.flush()
-            print("✅ Successfully inserted embeddings")
+            logger.debug(
+                "Upserting embeddings",
+                extra={"props": {"user_id": user_id, "count": len(texts)}},
+            )
+            collection.upsert(entities)
+        except Exception as e:
+            logger.error("Error upserting embeddings", extra={"props": {"error": str(e)}})
+            raise
+
+    def delete_embeddings(self, user_id: str, ids: Optional[list[int]] = None):
+        try:
+            collection = self.get_collection()
+            if ids is None:
+                logger.info(
+                    "Deleting embeddings",
+                    extra={"props": {"user_id": user_id, "count": "all"}},
+                )
+                collection.delete(expr=tenant_filter(user_id))
+            else:
+                logger.info(
+                    "Deleting embeddings",
+                    extra={"props": {"user_id": user_id, "count": len(ids)}},
+                )
+                for start in range(0, len(ids), 1000):
+                    batch = ids[start : start + 1000]
+                    collection.delete(
+                        expr=f"{tenant_filter(user_id)} and id in {batch}"
+                    )
         except Exception as e:
-            print(f"❌ Error inserting embeddings: {str(e)}")
+            logger.error("Error deleting embeddings", extra={"props": {"error": str(e)}})
             raise
-        finally:
-            collection.release()
+
+    def flush(self):
+        self.get_collection().flush()
 
     def search_similar(
         self,
@@ -119,61 +308,82 @@ class MilvusDB:
         query_embedding: list[float],
         limit: int = 5,
         score_threshold: float = 0.5,
+        include_vectors: bool = False,
+        search_params: Optional[dict] = None,
     ) -> list[dict]:
+        return self.search_similar_batch(
+            user_id,
+            [query_embedding],
+            limit,
+            score_threshold,
+            include_vectors,
+            search_params,
+        )[0]
+
+    def search_similar_batch(
+        self,
+        user_id: str,
+        query_embeddings: list[list[float]],
+        limit: int = 5,
+        score_threshold: float = 0.5,
+        include_vectors: bool = False,
+        search_params: Optional[dict] = None,
+    ) -> list[list[dict]]:
         try:
             collection = self.get_collection()
-            collection.load()
-
-
-            search_params = {
-                "metric_type": "L2",
-                "params": {"nprobe": 16},
-            }
 
+            # One request for all queries: Milvus searches the vectors together.
+            # The threshold is pushed down as a range search radius, so hits
+            # below it are never returned and ``limit`` only caps the rest.
             results = collection.search(
-                data=[query_embedding],
+                data=self.search_config.prepare(query_embeddings),
                 anns_field="embedding",
-                param=search_params,
+                param=self.search_config.search_param(
+                    limit, search_params, score_threshold
+                ),
                 limit=limit,
-                # expr=f'user_id == "{user_id}"',
-                output_fields=["text", "user_id"],
+                expr=tenant_filter(user_id),
+                output_fields=["text", "user_id"]
+                + (["embedding"] if include_vectors else []),
             )
 
-            similar_docs = []
+            # Per-hit detail is formatted only when DEBUG is enabled.
+            debug = logger.isEnabledFor(logging.DEBUG)
+            batch_docs = []
             for hits in results:
-                print(f"\n📝 Raw search results: {len(hits)} hits")
+                similar_docs = []
                 for hit in hits:
-                    similarity = 1 / (1 + hit.distance)
-                    print(f"🎯 Hit details:")
-                    print(f"  - Distance: {hit.distance}")
-                    print(f"  - Similarity score: {similarity}")
-                    print(f"  - User ID: {hit.entity.get('user_id')}")
-                    print(f"  - Text preview: {hit.entity.get('text')[:50]}...")
-                    similar_docs.append(
-                        {
-                            "text": hit.entity.get("text"),
-                            "score": similarity,
-                            "user_id": hit.entity.get("user_id"),
-                            "distance": hit.distance,
-                        }
-                    )
-            similar_docs.sort(key=lambda x: x["score"], reverse=True)
-
-            filtered_docs = [
-                doc for doc in similar_docs if doc["score"] >= score_threshold
-            ]
+                    similarity = self.search_config.similarity(hit.distance)
+                    if debug:
+                        logger.debug(
+                            "Search hit",
+                            extra={
+                                "props": {
+                                    "user_id": user_id,
+                                    "distance": hit.distance,
+                                    "score": similarity,
+                                    "text_preview": hit.entity.get("text")[:50],
+                                }
+                            },
+                        )
+                    doc = {
+                        "id": hit.id,
+                        "text": hit.entity.get("text"),
+                        "score": similarity,
+                        "user_id": hit.entity.get("user_id"),
+                        "distance": hit.distance,
+                    }
+                    if include_vectors:
+                        doc["embedding"] = hit.entity.get("embedding")
+                    similar_docs.append(doc)
 
-            print(f"\n📊 Search results summary:")
-            print(f"  - Total hits: {len(similar_docs)}")
-            print(f"  - Hits above threshold: {len(filtered_docs)}")
+                batch_docs.append(similar_docs)
 
-            return filtered_docs
+            return batch_docs
 
         except Exception as e:
-            print(f"❌ Error searching embeddings: {str(e)}")
+            logger.error("Error searching embeddings", extra={"props": {"error": str(e)}})
             raise
-        finally:
-            collection.release()
 
     # def list_data(self):
     #     """
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Optional
+
+from app.core.config import get_settings
+from app.core.executors import BlockingPool
+from app.services.ingest_manifest import chunk_id, content_hash
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class VectorStore(ABC):
+    """Storage and similarity search for per-user text embeddings.
+
+    Backends are process singletons: ``startup`` and ``shutdown`` are driven
+    by the app lifespan and ``is_ready`` backs the readiness probe.
+    """
+
+    collection_name: str
+
+    @abstractmethod
+    def startup(self): ...
+
+    @abstractmethod
+    def shutdown(self): ...
+
+    @abstractmethod
+    def is_ready(self) -> bool: ...
+
+    @abstractmethod
+    def create_collection(self): ...
+
+    def insert_embeddings(
+        self, user_id: str, texts: list[str], embeddings: list[list[float]]
+    ):
+        ids = [chunk_id(user_id, "", content_hash(text)) for text in texts]
+        self.upsert_embeddings(user_id, ids, texts, embeddings, source="")
+        self.flush()
+
+    def flush(self):
+        """Persist buffered writes; write-through backends need not override."""
+
+    @abstractmethod
+    def upsert_embeddings(
+        self,
+        user_id: str,
+        ids: list[int],
+        texts: list[str],
+        embeddings: list[list[float]],
+        source: str,
+    ):
+        """Insert chunks, replacing any existing rows with the same ids."""
+
+    @abstractmethod
+    def delete_embeddings(self, user_id: str, ids: Optional[list[int]] = None):
+        """Delete the given chunk ids, or all of the user's chunks if ``ids`` is None."""
+
+    @abstractmethod
+    def search_similar(
+        self,
+        user_id: str,
+        query_embedding: list[float],
+        limit: int = 5,
+        score_threshold: float = 0.5,
+        include_vectors: bool = False,
+        search_params: Optional[dict] = None,
+    ) -> list[dict]:
+        """Return hits as dicts with id, text, score, user_id and distance.
+
+        Hits are ordered best first and are every match scoring at least
+        ``score_threshold``, up to ``limit``; backends apply the threshold
+        inside the search rather than filtering a top-``limit`` list.
+        With ``include_vectors`` each hit also carries its ``embedding``.
+        ``search_params`` overrides index search parameters (``nprobe``,
+        ``ef``) for this call; keys the index doesn't use are ignored.
+        """
+
+    def search_similar_batch(
+        self,
+        user_id: str,
+        query_embeddings: list[list[float]],
+        limit: int = 5,
+        score_threshold: float = 0.5,
+        include_vectors: bool = False,
+        search_params: Optional[dict] = None,
+    ) -> list[list[dict]]:
+        """Run ``search_similar`` for several queries, one hit list per query.
+
+        Backends that support multi-vector search override this to issue a
+        single request.
+        """
+        return [
+            self.search_similar(
+                user_id,
+                query_embedding,
+                limit,
+                score_threshold,
+                include_vectors,
+                search_params,
+            )
+            for query_embedding in query_embeddings
+        ]
+
+
+@lru_cache()
+def get_vector_store() -> VectorStore:
+    # Import backends lazily so the local backend runs without pymilvus.
+    if settings.VECTOR_STORE_BACKEND == "local":
+        from app.db.local_store import LocalVectorStore
+
+        return LocalVectorStore()
+    if settings.VECTOR_STORE_BACKEND == "milvus":
+        from app.db.milvus import MilvusDB
+
+        return MilvusDB()
+    raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {settings.VECTOR_STORE_BACKEND}")
+
+
+async def connect_with_retry(
+    db: VectorStore,
+    pool: BlockingPool,
+    initial_delay: float = settings.VECTOR_STORE_RETRY_INITIAL_SECONDS,
+    max_delay: float = settings.VECTOR_STORE_RETRY_MAX_SECONDS,
+):
+    """Retry ``db.startup`` with exponential backoff until it succeeds.
+
+    Run in the background when the store is unreachable at boot: the
+    service keeps serving (readiness answers 503) and becomes ready as soon
+    as a retry gets through, without a restart.
+    """
+    delay = initial_delay
+    attempt = 1
+    while True:
+        await asyncio.sleep(delay)
+        attempt += 1
+        try:
+            await pool.run(db.startup)
+        except Exception as e:
+            delay = min(delay * 2, max_delay)
+            logger.warning(
+                "Vector store startup retry failed",
+                extra={
+                    "props": {"attempt": attempt, "retry_in_s": delay, "error": str(e)}
+                },
+            )
+        else:
+            logger.info(
+                "Vector store connected after retry",
+                extra={"props": {"attempt": attempt}},
+            )
+            return
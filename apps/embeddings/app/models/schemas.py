@@ -1,10 +1,18 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 
 
 class TextRequest(BaseModel):
     text: str
     user_id: str
+    include_embedding: bool = False
+
+
+class BatchTextRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1)
+    user_id: str
+    merge: bool = False
+    include_embedding: bool = False
 
 
 class SearchResult(BaseModel):
@@ -14,8 +22,20 @@ class SearchResult(BaseModel):
 
 class SearchResponse(BaseModel):
     results: List[SearchResult]
+    query_embedding: Optional[List[float]] = None
+
+
+class BatchSearchResponse(BaseModel):
+    results: List[List[SearchResult]]
+    merged: Optional[List[SearchResult]] = None
+    query_embeddings: Optional[List[List[float]]] = None
 
 
 class EmbeddingResponse(BaseModel):
     message: str
     chunk_count: int
+    upserted_count: int = 0
+    deleted_count: int = 0
+    skipped_files: List[str] = []
+    elapsed_seconds: float = 0.0
+    stage_stats: Dict[str, Dict[str, float]] = {}
@@ -0,0 +1,234 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Pending access times are written in one batch once this many accumulate,
+# even if no ``put_many`` comes along.
+ACCESS_FLUSH_ITEMS = 1024
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+def _unpack(blob: bytes) -> array:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache keyed by (model, normalized text hash).
+
+    A bounded in-memory LRU sits in front of a SQLite file storing vectors as
+    packed float32 blobs. Both tiers hold vectors as float32 ``array``s
+    (6KB per 1536-dim vector rather than ~50KB as a list of floats); lists
+    are only built for the caller. The disk tier keeps a running row count
+    and evicts the least recently used rows once it grows past
+    ``max_disk_items``. Disk hits only note their access time in memory;
+    the times are written with the next ``put_many`` (or ``flush``), so
+    lookups never write to SQLite.
+
+    Reads and writes are split so that a large ingest ``put_many`` does not
+    stall query lookups: the database is in WAL mode, each thread reads
+    through its own connection without taking the writer lock, and only
+    writes share one connection under ``_write_lock``. ``_lock`` guards the
+    memory tier and is never held across SQLite calls.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        max_memory_items: int = 10_000,
+        max_disk_items: int = 500_000,
+    ):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self._memory: OrderedDict[str, array] = OrderedDict()
+        self._accessed: dict[str, float] = {}
+        self._disk_items = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._readers = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_accessed_at "
+                "ON embeddings (accessed_at)"
+            )
+            self._db.commit()
+            (self._disk_items,) = self._db.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()
+
+    def get_many(self, model: str, texts: list[str]) -> list[Optional[list[float]]]:
+        """Look up ``texts``; returns a vector or ``None`` per position."""
+        keys = [cache_key(model, text) for text in texts]
+        results: list[Optional[list[float]]] = [None] * len(texts)
+        disk_lookup: dict[str, list[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector.tolist()
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+        flush = False
+        if disk_lookup and self._db is not None:
+            found = self._read_disk(list(disk_lookup))
+            now = time.time()
+            with self._lock:
+                for key, vector in found.items():
+                    self._remember(key, vector)
+                    self._accessed[key] = now
+                    self.disk_hits += len(disk_lookup[key])
+                flush = len(self._accessed) >= ACCESS_FLUSH_ITEMS
+            for key, vector in found.items():
+                as_list = vector.tolist()
+                for i in disk_lookup[key]:
+                    results[i] = as_list
+
+        found_count = sum(vector is not None for vector in results)
+        with self._lock:
+            self.hits += found_count
+            self.misses += len(texts) - found_count
+        if flush:
+            self.flush()
+        return results
+
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]):
+        rows = []
+        now = time.time()
+        packed_vectors = []
+        for text, vector in zip(texts, vectors):
+            key = cache_key(model, text)
+            packed = array("f", vector)
+            packed_vectors.append((key, packed))
+            rows.append((key, packed.tobytes(), now))
+        with self._lock:
+            for key, packed in packed_vectors:
+                self._remember(key, packed)
+            if self._db is not None:
+                self._accessed.update((key, now) for key, _, _ in rows)
+        if self._db is None or not rows:
+            return
+        with self._write_lock:
+            # A key always maps to the same vector, so existing rows are kept
+            # and only their access time is refreshed.
+            inserted = self._db.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, accessed_at) "
+                "VALUES (?, ?, ?)",
+                rows,
+            ).rowcount
+            self._disk_items += inserted
+            self._write_access_times()
+            self._evict_disk()
+            self._db.commit()
+
+    def flush(self):
+        """Write pending access times to disk."""
+        if self._db is None:
+            return
+        with self._write_lock:
+            self._write_access_times()
+            self._db.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_items": len(self._memory),
+        }
+
+    def _remember(self, key: str, vector: array):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _reader(self) -> sqlite3.Connection:
+        # One read connection per thread; in WAL mode it sees the last
+        # committed state and never waits for the writer.
+        db = getattr(self._readers, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path)
+            db.execute("PRAGMA query_only=ON")
+            self._readers.db = db
+        return db
+
+    def _read_disk(self, keys: list[str]) -> dict[str, array]:
+        db = self._reader()
+        found = {}
+        # Stay well below SQLite's bound-parameter limit.
+        for start in range(0, len(keys), 500):
+            batch = keys[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                batch,
+            ).fetchall()
+            found.update({key: _unpack(blob) for key, blob in rows})
+        return found
+
+    def _write_access_times(self):
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+        if accessed:
+            self._db.executemany(
+                "UPDATE embeddings SET accessed_at = ? WHERE key = ?",
+                [(at, key) for key, at in accessed.items()],
+            )
+
+    def _evict_disk(self):
+        overflow = self._disk_items - self.max_disk_items
+        if overflow > 0:
+            self._disk_items -= self._db.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            ).rowcount
+
+
+@lru_cache()
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    return EmbeddingCache(
+        path=settings.EMBEDDING_CACHE_PATH,
+        max_memory_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+        max_disk_items=settings.EMBEDDING_CACHE_DISK_ITEMS,
+    )
@@ -1,34 +1,72 @@
+import logging
+from functools import lru_cache
 from langchain_openai import OpenAIEmbeddings
 from app.core.config import get_settings
 from app.core.exceptions import EmbeddingError
+from app.core.executors import BlockingPool
+from app.services.embedding_cache import get_embedding_cache
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 
 class EmbeddingService:
     def __init__(self):
-        print("🚀 Initializing Embedding Service with OpenAI model...")
+        self.model_name = settings.OPENAI_EMBEDDING_MODEL
         self.embeddings_model = OpenAIEmbeddings(
-            model=settings.OPENAI_EMBEDDING_MODEL,
+            model=self.model_name,
             api_key=settings.OPENAI_API_KEY,
         )
+        self.cache = get_embedding_cache()
+        logger.info(
+            "Embedding service initialized", extra={"props": {"model": self.model_name}}
+        )
 
-    def create_embeddings(self, texts: list[str]) -> list:
+    async def acreate_embeddings(self, texts: list[str], pool: BlockingPool) -> list:
+        """Embed ``texts`` through the cache: the OpenAI call goes through the
+        async client and cache I/O runs on ``pool``."""
         try:
-            print(f"📊 Creating embeddings for {len(texts)} texts...")
-            embeddings = self.embeddings_model.embed_documents(texts)
-            print("✅ Successfully created embeddings")
+            if self.cache is None:
+                embeddings = await self.embeddings_model.aembed_documents(texts)
+            else:
+                embeddings = await pool.run(
+                    self.cache.get_many, self.model_name, texts
+                )
+                missing = list(
+                    dict.fromkeys(
+                        text
+                        for text, vector in zip(texts, embeddings)
+                        if vector is None
+                    )
+                )
+                logger.debug(
+                    "Embedding cache lookup",
+                    extra={"props": {"missing": len(missing), "texts": len(texts)}},
+                )
+                if missing:
+                    fresh = dict(
+                        zip(
+                            missing,
+                            await self.embeddings_model.aembed_documents(missing),
+                        )
+                    )
+                    await pool.run(
+                        self.cache.put_many,
+                        self.model_name,
+                        missing,
+                        list(fresh.values()),
+                    )
+                    embeddings = [
+                        vector if vector is not None else fresh[text]
+                        for text, vector in zip(texts, embeddings)
+                    ]
+            logger.debug("Created embeddings", extra={"props": {"texts": len(texts)}})
             return embeddings
         except Exception as e:
-            print(f"❌ Error creating embeddings: {str(e)}")
+            logger.error("Error creating embeddings", extra={"props": {"error": str(e)}})
             raise EmbeddingError()
 
-    def create_query_embedding(self, text: str) -> list:
-        try:
-            print("🔍 Creating embedding for search query...")
-            embedding = self.embeddings_model.embed_query(text)
-            print("✅ Successfully created query embedding")
-            return embedding
-        except Exception as e:
-            print(f"❌ Error creating query embedding: {str(e)}")
-            raise EmbeddingError()
+
+@lru_cache()
+def get_embedding_service() -> EmbeddingService:
+    return EmbeddingService()
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+from typing import Optional, Union
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+def content_hash(data: Union[str, bytes]) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk_id(user_id: str, source: str, chunk_hash: str) -> int:
+    """Deterministic, positive int64 primary key for a chunk."""
+    digest = hashlib.sha256(f"{user_id}\0{source}\0{chunk_hash}".encode("utf-8"))
+    return int.from_bytes(digest.digest()[:8], "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+class IngestManifest:
+    """Per-user record of what has been ingested from each source file.
+
+    For every source it stores the hash of the file contents, the
+    fingerprint of the chunker configuration that split it and the
+    ``chunk_hash -> chunk_id`` map of the chunks currently in the vector
+    store, which is what lets re-ingestion skip unchanged files, upsert new
+    chunks and delete chunks that disappeared. A file is only unchanged if
+    both its hash and the chunker fingerprint match.
+    """
+
+    def __init__(self, user_id: str, path: str, sources: Optional[dict] = None):
+        self.user_id = user_id
+        self.path = path
+        self.sources: dict[str, dict] = sources or {}
+        self.exists = sources is not None
+
+    @classmethod
+    def load(cls, user_id: str, root: Optional[str] = None) -> "IngestManifest":
+        digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+        path = os.path.join(root or settings.INGEST_MANIFEST_PATH, f"{digest}.json")
+        if not os.path.exists(path):
+            return cls(user_id, path)
+        with open(path, encoding="utf-8") as f:
+            return cls(user_id, path, json.load(f)["sources"])
+
+    def file_hash(self, source: str) -> Optional[str]:
+        entry = self.sources.get(source)
+        return entry["file_hash"] if entry else None
+
+    def chunker(self, source: str) -> Optional[str]:
+        entry = self.sources.get(source)
+        # Entries written before fingerprints were recorded have none.
+        return entry.get("chunker") if entry else None
+
+    def is_unchanged(self, source: str, file_hash: str, chunker: str) -> bool:
+        return self.file_hash(source) == file_hash and self.chunker(source) == chunker
+
+    def chunks(self, source: str) -> dict[str, int]:
+        entry = self.sources.get(source)
+        return dict(entry["chunks"]) if entry else {}
+
+    def update(
+        self, source: str, file_hash: str, chunker: str, chunks: dict[str, int]
+    ):
+        self.sources[source] = {
+            "file_hash": file_hash,
+            "chunker": chunker,
+            "chunks": chunks,
+        }
+
+    def remove(self, source: str) -> dict[str, int]:
+        entry = self.sources.pop(source, None)
+        return entry["chunks"] if entry else {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"user_id": self.user_id, "sources": self.sources}, f)
+        os.replace(tmp_path, self.path)
+        self.exists = True
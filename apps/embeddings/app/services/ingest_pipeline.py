@@ -0,0 +1,324 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import IO, Callable, Optional
+
+from langchain.document_loaders import UnstructuredFileLoader
+
+from app.core.config import get_settings
+from app.core.executors import BlockingPool, get_ingest_pool
+from app.db.vector_store import VectorStore
+from app.services.embedding_service import EmbeddingService
+from app.services.ingest_manifest import IngestManifest, chunk_id, content_hash
+from app.services.lexical_index import LexicalIndex
+from app.services.text_service import TextService
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StageStats:
+    items: int = 0
+    batches: int = 0
+    busy_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy_seconds, 4),
+            "items_per_second": (
+                round(self.items / self.busy_seconds, 2) if self.busy_seconds else 0.0
+            ),
+        }
+
+
+@dataclass
+class IngestReport:
+    chunk_count: int = 0
+    upserted_count: int = 0
+    deleted_count: int = 0
+    skipped_files: list[str] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+    stages: dict[str, StageStats] = field(
+        default_factory=lambda: {
+            name: StageStats()
+            for name in ("parse", "chunk", "embed", "insert", "lexical")
+        }
+    )
+
+
+@dataclass
+class _ParsedFile:
+    source: str
+    file_hash: str
+    text: str
+
+
+@dataclass
+class _ChunkBatch:
+    source: str
+    ids: list[int]
+    texts: list[str]
+    embeddings: Optional[list] = None
+
+
+class IngestPipeline:
+    """Staged parse -> chunk -> embed -> insert ingestion with backpressure.
+
+    Stages are connected by bounded queues, so at most ``queue_size`` batches
+    sit between two stages and a slow stage throttles the ones feeding it.
+    Embedding and insertion run with their own worker counts, which keeps
+    embedding batches in flight while earlier ones are being written.
+    Blocking work (parsing, chunking, vector store writes) runs on the
+    dedicated ingest pool and embeddings go through the async OpenAI client,
+    so an ingest never blocks the event loop or takes search threads.
+
+    The manifest is only updated and saved once every stage has finished,
+    so a failed run is simply redone (idempotently) by the next one. The
+    user's lexical index, if given, is rebuilt from the changed chunks at the
+    same point. Those are spooled to a temporary file as they are chunked
+    rather than kept in memory until then. When the index doesn't exist yet, unchanged files are re-chunked
+    (but not re-embedded) to populate it. Files split by a different
+    chunker configuration (``TextService.fingerprint``) count as changed, so
+    tuning the chunker re-chunks them; chunks that come out identical keep
+    their ids and are not re-embedded.
+    """
+
+    def __init__(
+        self,
+        user_id: str,
+        text_service: TextService,
+        embedding_service: EmbeddingService,
+        db: VectorStore,
+        manifest: IngestManifest,
+        queue_size: int = settings.INGEST_QUEUE_SIZE,
+        embed_batch_size: int = settings.INGEST_EMBED_BATCH_SIZE,
+        embed_concurrency: int = settings.INGEST_EMBED_CONCURRENCY,
+        insert_concurrency: int = settings.INGEST_INSERT_CONCURRENCY,
+        lexical_index: Optional[LexicalIndex] = None,
+        pool: Optional[BlockingPool] = None,
+    ):
+        self.user_id = user_id
+        self.text_service = text_service
+        self.embedding_service = embedding_service
+        self.db = db
+        self.manifest = manifest
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.insert_concurrency = insert_concurrency
+        self.lexical_index = lexical_index
+        self.pool = pool or get_ingest_pool()
+        self.report = IngestReport()
+        self._lexical_spool: Optional[IO[str]] = None
+        self._manifest_updates: dict[str, tuple[str, dict[str, int]]] = {}
+        self._removed_ids: list[int] = []
+        self._embed_workers_left = embed_concurrency
+
+    async def run(self, file_paths: list[str]) -> IngestReport:
+        started = time.perf_counter()
+        if self.lexical_index is not None:
+            self._lexical_spool = tempfile.TemporaryFile("w+", encoding="utf-8")
+        try:
+            await self._run_stages(file_paths)
+            await self._commit(file_paths)
+        finally:
+            if self._lexical_spool is not None:
+                self._lexical_spool.close()
+        self.report.elapsed_seconds = time.perf_counter() - started
+        return self.report
+
+    async def _run_stages(self, file_paths: list[str]):
+        parsed: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        to_embed: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        to_insert: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        tasks = [
+            asyncio.create_task(self._parse(file_paths, parsed)),
+            asyncio.create_task(self._chunk(parsed, to_embed)),
+            *[
+                asyncio.create_task(self._embed(to_embed, to_insert))
+                for _ in range(self.embed_concurrency)
+            ],
+            *[
+                asyncio.create_task(self._insert(to_insert))
+                for _ in range(self.insert_concurrency)
+            ],
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _timed(self, stage: str, fn: Callable, *args):
+        started = time.perf_counter()
+        result = await self.pool.run(fn, *args)
+        self.report.stages[stage].busy_seconds += time.perf_counter() - started
+        return result
+
+    async def _parse(self, file_paths: list[str], parsed: asyncio.Queue):
+        for file_path in file_paths:
+            file_hash = await self._timed("parse", _hash_file, file_path)
+            lexical_missing = (
+                self.lexical_index is not None and not self.lexical_index.exists
+            )
+            unchanged = self.manifest.is_unchanged(
+                file_path, file_hash, self.text_service.fingerprint
+            )
+            if unchanged and not lexical_missing:
+                logger.info(
+                    "Skipping unchanged file", extra={"props": {"file": file_path}}
+                )
+                self.report.chunk_count += len(self.manifest.chunks(file_path))
+                self.report.skipped_files.append(file_path)
+                continue
+
+            logger.info("Processing file", extra={"props": {"file": file_path}})
+            text = await self._timed("parse", load_file_text, file_path)
+            self.report.stages["parse"].items += 1
+            await parsed.put(_ParsedFile(file_path, file_hash, text))
+        await parsed.put(None)
+
+    async def _chunk(self, parsed: asyncio.Queue, to_embed: asyncio.Queue):
+        stats = self.report.stages["chunk"]
+        while (item := await parsed.get()) is not None:
+            processed_chunks = await self._timed(
+                "chunk", self.text_service.process_text, item.text
+            )
+            chunks = {content_hash(chunk): chunk for chunk in processed_chunks}
+            previous = self.manifest.chunks(item.source)
+            new_hashes = [h for h in chunks if h not in previous]
+            self._removed_ids.extend(
+                id_ for h, id_ in previous.items() if h not in chunks
+            )
+            self._manifest_updates[item.source] = (
+                item.file_hash,
+                {h: chunk_id(self.user_id, item.source, h) for h in chunks},
+            )
+            if self._lexical_spool is not None:
+                await self._timed(
+                    "lexical",
+                    self._lexical_spool.writelines,
+                    [
+                        json.dumps([chunk_id(self.user_id, item.source, h), text])
+                        + "\n"
+                        for h, text in chunks.items()
+                    ],
+                )
+            stats.items += len(chunks)
+            self.report.chunk_count += len(chunks)
+            logger.info(
+                "Chunked file",
+                extra={
+                    "props": {
+                        "file": item.source,
+                        "chunks": len(chunks),
+                        "new_chunks": len(new_hashes),
+                    }
+                },
+            )
+
+            for start in range(0, len(new_hashes), self.embed_batch_size):
+                batch = new_hashes[start : start + self.embed_batch_size]
+                stats.batches += 1
+                await to_embed.put(
+                    _ChunkBatch(
+                        source=item.source,
+                        ids=[chunk_id(self.user_id, item.source, h) for h in batch],
+                        texts=[chunks[h] for h in batch],
+                    )
+                )
+        for _ in range(self.embed_concurrency):
+            await to_embed.put(None)
+
+    async def _embed(self, to_embed: asyncio.Queue, to_insert: asyncio.Queue):
+        stats = self.report.stages["embed"]
+        while (batch := await to_embed.get()) is not None:
+            started = time.perf_counter()
+            batch.embeddings = await self.embedding_service.acreate_embeddings(
+                batch.texts, self.pool
+            )
+            stats.busy_seconds += time.perf_counter() - started
+            stats.items += len(batch.texts)
+            stats.batches += 1
+            await to_insert.put(batch)
+
+        self._embed_workers_left -= 1
+        if self._embed_workers_left == 0:
+            for _ in range(self.insert_concurrency):
+                await to_insert.put(None)
+
+    async def _insert(self, to_insert: asyncio.Queue):
+        stats = self.report.stages["insert"]
+        while (batch := await to_insert.get()) is not None:
+            await self._timed(
+                "insert",
+                self.db.upsert_embeddings,
+                self.user_id,
+                batch.ids,
+                batch.texts,
+                batch.embeddings,
+                batch.source,
+            )
+            stats.items += len(batch.texts)
+            stats.batches += 1
+            self.report.upserted_count += len(batch.texts)
+
+    async def _commit(self, file_paths: list[str]):
+        for source in [s for s in self.manifest.sources if s not in file_paths]:
+            self._removed_ids.extend(self.manifest.remove(source).values())
+        if self._removed_ids:
+            await self._timed(
+                "insert", self.db.delete_embeddings, self.user_id, self._removed_ids
+            )
+            self.report.deleted_count = len(self._removed_ids)
+        await self._timed("insert", self.db.flush)
+
+        if self.lexical_index is not None:
+            await self._timed(
+                "lexical",
+                self.lexical_index.save,
+                _spooled_docs(self._lexical_spool),
+                self._removed_ids,
+            )
+            stats = self.report.stages["lexical"]
+            stats.items, stats.batches = len(self.lexical_index), 1
+
+        for source, (file_hash, chunks) in self._manifest_updates.items():
+            self.manifest.update(
+                source, file_hash, self.text_service.fingerprint, chunks
+            )
+        self.manifest.save()
+
+
+def _spooled_docs(spool: IO[str]):
+    spool.seek(0)
+    for line in spool:
+        id_, text = json.loads(line)
+        yield id_, text
+
+
+def load_file_text(file_path: str) -> str:
+    file_ext = os.path.splitext(file_path)[1].lower()
+
+    if file_ext == ".md":
+        # Keep the raw markdown: TextService splits on its headings.
+        with open(file_path, encoding="utf-8") as f:
+            return f.read()
+
+    loader = UnstructuredFileLoader(file_path)
+    return "\n\n".join(str(doc.page_content) for doc in loader.load())
+
+
+def _hash_file(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return content_hash(f.read())
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import threading
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+import numpy as np
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Compound tokens keep API paths, header names and dotted identifiers intact
+# ("api/retrieve", "x-request-id"); their parts are indexed as well.
+TOKEN_RE = re.compile(r"[a-z0-9_]+(?:[-./:][a-z0-9_]+)*")
+PART_RE = re.compile(r"[-./:]")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = PART_RE.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+class LexicalIndex:
+    """BM25 inverted index over one user's chunks.
+
+    Postings are stored in CSR form: ``offsets.npy`` holds, per term id, the
+    start of its slice in ``postings.npy`` (document rows) and ``tfs.npy``
+    (term frequencies). The arrays are memory-mapped on load, so only the
+    postings of the queried terms are paged in. Chunk texts stay in
+    ``docs.jsonl``; ``doc_offsets.npy`` holds each row's byte offset in it,
+    so a search reads just the texts of its hits. The index is rebuilt by
+    streaming ``docs.jsonl`` whenever ingestion changes it and swapped in
+    atomically.
+    """
+
+    FILES = (
+        "docs.jsonl",
+        "doc_offsets.npy",
+        "ids.npy",
+        "terms.json",
+        "offsets.npy",
+        "postings.npy",
+        "tfs.npy",
+        "doc_lens.npy",
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.k1 = settings.LEXICAL_BM25_K1
+        self.b = settings.LEXICAL_BM25_B
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def exists(self) -> bool:
+        return all(os.path.exists(os.path.join(self.path, f)) for f in self.FILES)
+
+    def clear(self):
+        """Drop the index; the next ``save`` starts from no documents."""
+        with self.lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._load()
+
+    def save(
+        self, upserts: Iterable[tuple[int, str]] = (), deletes: Iterable[int] = ()
+    ):
+        """Rebuild the index with ``upserts`` added and ``deletes`` removed.
+
+        Texts are streamed: ``upserts`` are written to the new ``docs.jsonl``
+        first, then the stored documents they don't replace are copied over
+        from the current one. Only the postings columns are held in memory.
+        """
+        with self.lock:
+            tmp_path = f"{self.path}.tmp"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+
+            replaced = set(deletes)
+
+            def records():
+                for id_, text in upserts:
+                    replaced.add(id_)
+                    yield id_, text
+                for id_, text in self._stored_docs():
+                    if id_ not in replaced:
+                        yield id_, text
+
+            term_ids: dict[str, int] = {}
+            ids, doc_offsets, doc_lens = array("q"), array("q", [0]), array("f")
+            term_col, row_col, tf_col = array("q"), array("i"), array("f")
+            with open(os.path.join(tmp_path, "docs.jsonl"), "wb") as f:
+                for row, (id_, text) in enumerate(records()):
+                    line = (json.dumps({"id": id_, "text": text}) + "\n").encode()
+                    f.write(line)
+                    ids.append(id_)
+                    doc_offsets.append(doc_offsets[-1] + len(line))
+                    count = Counter(tokenize(text))
+                    term_col.extend(
+                        term_ids.setdefault(term, len(term_ids)) for term in count
+                    )
+                    row_col.extend([row] * len(count))
+                    tf_col.extend(count.values())
+                    doc_lens.append(sum(count.values()))
+
+            term_col = np.asarray(term_col, dtype=np.int64)
+            order = np.argsort(term_col, kind="stable")
+            offsets = np.zeros(len(term_ids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(term_col, minlength=len(term_ids)), out=offsets[1:])
+
+            with open(os.path.join(tmp_path, "terms.json"), "w", encoding="utf-8") as f:
+                json.dump(list(term_ids), f)
+            np.save(os.path.join(tmp_path, "ids.npy"), np.asarray(ids, dtype=np.int64))
+            np.save(
+                os.path.join(tmp_path, "doc_offsets.npy"),
+                np.asarray(doc_offsets, dtype=np.int64),
+            )
+            np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+            np.save(
+                os.path.join(tmp_path, "postings.npy"),
+                np.asarray(row_col, dtype=np.int32)[order],
+            )
+            np.save(
+                os.path.join(tmp_path, "tfs.npy"),
+                np.asarray(tf_col, dtype=np.float32)[order],
+            )
+            np.save(
+                os.path.join(tmp_path, "doc_lens.npy"),
+                np.asarray(doc_lens, dtype=np.float32),
+            )
+            old_path = f"{self.path}.old"
+            shutil.rmtree(old_path, ignore_errors=True)
+            if os.path.exists(self.path):
+                os.replace(self.path, old_path)
+            os.replace(tmp_path, self.path)
+            shutil.rmtree(old_path, ignore_errors=True)
+            self._load()
+
+    def search(self, query: str, limit: int = 5) -> list[dict]:
+        with self.lock:
+            ids, term_ids = self.ids, self.term_ids
+            docs_file, doc_offsets = self._docs_file, self.doc_offsets
+            offsets, postings, tfs = self.offsets, self.postings, self.tfs
+            doc_lens, avg_len = self.doc_lens, self.avg_len
+        if not len(ids) or limit <= 0:
+            return []
+
+        rows, weights = [], []
+        for term in set(tokenize(query)):
+            term_id = term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = offsets[term_id], offsets[term_id + 1]
+            docs, tf = postings[start:end], tfs[start:end]
+            df = end - start
+            idf = math.log(1 + (len(ids) - df + 0.5) / (df + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * doc_lens[docs] / avg_len)
+            rows.append(docs)
+            weights.append(idf * tf * (self.k1 + 1) / norm)
+        if not rows:
+            return []
+
+        scores = np.bincount(
+            np.concatenate(rows), weights=np.concatenate(weights), minlength=len(ids)
+        )
+        hits = np.flatnonzero(scores)
+        if limit < len(hits):
+            hits = hits[np.argpartition(scores[hits], -limit)[-limit:]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [
+            {
+                "id": int(ids[row]),
+                "text": _read_text(docs_file, doc_offsets, row),
+                "score": float(scores[row]),
+            }
+            for row in hits.tolist()
+        ]
+
+    def _stored_docs(self) -> Iterator[tuple[int, str]]:
+        if not self.exists:
+            return
+        with open(os.path.join(self.path, "docs.jsonl"), "rb") as f:
+            for line in f:
+                record = json.loads(line)
+                yield record["id"], record["text"]
+
+    def _load(self):
+        # A file still being read by a search keeps working after a rebuild
+        # replaces it; the old handle is closed once nothing references it.
+        self._docs_file: Optional[BinaryIO] = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.doc_offsets = np.zeros(1, dtype=np.int64)
+        self.term_ids: dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings = np.empty(0, dtype=np.int32)
+        self.tfs = np.empty(0, dtype=np.float32)
+        self.doc_lens = np.empty(0, dtype=np.float32)
+        self.avg_len = 1.0
+        if not self.exists:
+            return
+
+        self._docs_file = open(os.path.join(self.path, "docs.jsonl"), "rb")
+        with open(os.path.join(self.path, "terms.json"), encoding="utf-8") as f:
+            self.term_ids = {term: i for i, term in enumerate(json.load(f))}
+        self.ids = np.load(os.path.join(self.path, "ids.npy"), mmap_mode="r")
+        self.doc_offsets = np.load(
+            os.path.join(self.path, "doc_offsets.npy"), mmap_mode="r"
+        )
+        self.offsets = np.load(os.path.join(self.path, "offsets.npy"), mmap_mode="r")
+        self.postings = np.load(os.path.join(self.path, "postings.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(self.path, "tfs.npy"), mmap_mode="r")
+        self.doc_lens = np.load(os.path.join(self.path, "doc_lens.npy"), mmap_mode="r")
+        self.avg_len = float(self.doc_lens.mean() or 1.0) if len(self.ids) else 1.0
+
+
+def _read_text(docs_file: BinaryIO, doc_offsets: np.ndarray, row: int) -> str:
+    start, end = int(doc_offsets[row]), int(doc_offsets[row + 1])
+    # pread doesn't move the shared file position, so concurrent searches
+    # can read from the same handle.
+    return json.loads(os.pread(docs_file.fileno(), end - start, start))["text"]
+
+
+class LexicalStore:
+    """Process-wide registry of per-user lexical indexes."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.root = path or settings.LEXICAL_INDEX_PATH
+        self._indexes: dict[str, LexicalIndex] = {}
+        self._lock = threading.Lock()
+
+    def index(self, user_id: str) -> LexicalIndex:
+        index = self._indexes.get(user_id)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(user_id)
+                if index is None:
+                    digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+                    index = LexicalIndex(os.path.join(self.root, digest))
+                    self._indexes[user_id] = index
+        return index
+
+    def search(self, user_id: str, query: str, limit: int = 5) -> list[dict]:
+        return self.index(user_id).search(query, limit)
+
+
+@lru_cache()
+def get_lexical_store() -> LexicalStore:
+    return LexicalStore()
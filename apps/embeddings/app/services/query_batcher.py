@@ -0,0 +1,125 @@
+import asyncio
+from functools import lru_cache
+from typing import Optional, Protocol
+
+from app.core.config import get_settings
+from app.core.executors import BlockingPool, get_search_pool
+from app.services.embedding_service import get_embedding_service
+
+settings = get_settings()
+
+
+class DocumentEmbedder(Protocol):
+    async def acreate_embeddings(
+        self, texts: list[str], pool: BlockingPool
+    ) -> list: ...
+
+
+class QueryEmbeddingBatcher:
+    """Coalesces concurrent query-embedding requests into batched upstream calls.
+
+    Requests arriving within ``window_ms`` of each other (or until
+    ``max_batch_size`` distinct texts are pending) are embedded together with
+    one ``acreate_embeddings`` call. Identical texts that are already pending
+    or in flight share a single future instead of being embedded twice.
+    Running batches are kept in ``_tasks`` (the event loop only holds weak
+    references to tasks) and ``aclose`` cancels them on shutdown.
+    """
+
+    def __init__(
+        self,
+        embedder: DocumentEmbedder,
+        pool: BlockingPool,
+        window_ms: float = 5.0,
+        max_batch_size: int = 64,
+    ):
+        self.embedder = embedder
+        self.pool = pool
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: dict[str, asyncio.Future] = {}
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.requests = 0
+        self.deduplicated = 0
+
+    async def embed(self, text: str) -> list[float]:
+        self.requests += 1
+        future = self._pending.get(text) or self._in_flight.get(text)
+        if future is not None:
+            self.deduplicated += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[text] = future
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.window, self._flush)
+        # Shield so one cancelled caller doesn't cancel the result for others.
+        return await asyncio.shield(future)
+
+    async def aclose(self):
+        """Cancel pending and running batches; their callers get CancelledError."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for future in self._pending.values():
+            future.cancel()
+        self._pending = {}
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "deduplicated": self.deduplicated,
+        }
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self._in_flight.update(batch)
+        self.batches += 1
+        task = asyncio.create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: dict[str, asyncio.Future]):
+        texts = list(batch)
+        try:
+            embeddings = await self.embedder.acreate_embeddings(texts, self.pool)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for text, embedding in zip(texts, embeddings):
+                if not batch[text].done():
+                    batch[text].set_result(embedding)
+        finally:
+            for text in texts:
+                self._in_flight.pop(text, None)
+            # Cancelled, or the embedder returned too few vectors: no caller
+            # may be left waiting forever.
+            for future in batch.values():
+                if not future.done():
+                    future.cancel()
+
+
+@lru_cache()
+def get_query_batcher() -> QueryEmbeddingBatcher:
+    return QueryEmbeddingBatcher(
+        get_embedding_service(),
+        get_search_pool(),
+        window_ms=settings.QUERY_BATCH_WINDOW_MS,
+        max_batch_size=settings.QUERY_BATCH_MAX_SIZE,
+    )
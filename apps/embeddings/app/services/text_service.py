@@ -1,20 +1,195 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter, MarkdownTextSplitter
+import logging
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+
 from app.core.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Bump whenever the splitting logic changes what chunks a text produces, so
+# files recorded in ingest manifests are re-chunked.
+CHUNKER_VERSION = 2
+
+HEADING_RE = re.compile(r"^#{1,6}\s")
+FENCE_RE = re.compile(r"^\s*(```|~~~)")
+
+
+@dataclass(frozen=True)
+class TextChunk:
+    text: str
+    start: int
+    end: int
+
+
+@lru_cache()
+def get_encoding() -> tiktoken.Encoding:
+    return tiktoken.get_encoding(settings.CHUNK_ENCODING)
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # Workers come from a fork server rather than forking this process,
+        # which by then runs the gRPC channel, the logging thread and the
+        # executor pools; forking a threaded process can deadlock the child.
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.CHUNK_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=get_encoding,
+        )
+    return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def split_sections(text: str) -> list[tuple[int, int]]:
+    """Split markdown into ``(start, end)`` spans that each begin at a heading.
+
+    Lines that look like headings inside fenced code blocks are ignored.
+    """
+    boundaries = [0]
+    in_fence = False
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        if FENCE_RE.match(line):
+            in_fence = not in_fence
+        elif not in_fence and offset and HEADING_RE.match(line):
+            boundaries.append(offset)
+        offset += len(line)
+    boundaries.append(len(text))
+    return [
+        (start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start
+    ]
+
+
+def chunk_sections(
+    text: str,
+    sections: list[tuple[int, int]],
+    chunk_size: int,
+    chunk_overlap: int,
+    base_offset: int = 0,
+) -> list[TextChunk]:
+    """Pack consecutive sections into chunks of at most ``chunk_size`` tokens.
+
+    Chunk boundaries fall on headings wherever possible; a section larger
+    than the budget is split into token windows overlapping by
+    ``chunk_overlap`` tokens. Offsets are relative to ``text`` plus
+    ``base_offset``.
+    """
+    encoding = get_encoding()
+    chunks: list[TextChunk] = []
+    pending_start: Optional[int] = None
+    pending_end = 0
+    pending_tokens = 0
+
+    def emit(start: int, end: int):
+        raw = text[start:end]
+        stripped = raw.strip()
+        if stripped:
+            start += len(raw) - len(raw.lstrip())
+            start += base_offset
+            chunks.append(TextChunk(stripped, start, start + len(stripped)))
+
+    for start, end in sections:
+        tokens = encoding.encode(text[start:end], disallowed_special=())
+        if len(tokens) > chunk_size:
+            if pending_start is not None:
+                emit(pending_start, pending_end)
+                pending_start, pending_tokens = None, 0
+            _, token_offsets = encoding.decode_with_offsets(tokens)
+            step = max(1, chunk_size - chunk_overlap)
+            for first in range(0, len(tokens), step):
+                last = first + chunk_size
+                if last >= len(tokens):
+                    emit(start + token_offsets[first], end)
+                    break
+                emit(start + token_offsets[first], start + token_offsets[last])
+        elif pending_start is not None and pending_tokens + len(tokens) <= chunk_size:
+            pending_end = end
+            pending_tokens += len(tokens)
+        else:
+            if pending_start is not None:
+                emit(pending_start, pending_end)
+            pending_start, pending_end, pending_tokens = start, end, len(tokens)
+
+    if pending_start is not None:
+        emit(pending_start, pending_end)
+    return chunks
+
 
 class TextService:
-    def __init__(self):
-        self.markdown_splitter = MarkdownTextSplitter(chunk_size=200, chunk_overlap=0)
-        self.recursive_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            chunk_size=200,
-            chunk_overlap=0,
-            model_name="gpt-4o",
+    """Markdown-aware, token-budgeted chunker.
+
+    Text is first split at markdown headings, small neighbouring sections are
+    packed together up to ``CHUNK_SIZE`` tokens and oversized sections are
+    windowed with ``CHUNK_OVERLAP`` tokens of overlap. Inputs larger than
+    ``CHUNK_PARALLEL_MIN_CHARS`` are chunked across a shared process pool.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = settings.CHUNK_SIZE,
+        chunk_overlap: int = settings.CHUNK_OVERLAP,
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("CHUNK_OVERLAP must be smaller than CHUNK_SIZE")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the chunker configuration; equal iff chunks are equal."""
+        return (
+            f"v{CHUNKER_VERSION}:{settings.CHUNK_ENCODING}:"
+            f"{self.chunk_size}:{self.chunk_overlap}"
         )
 
     def process_text(self, text: str) -> list[str]:
-        print("📝 Starting text processing...")
-        # chunks = self.recursive_splitter.split_text(text)
-        chunks = self.markdown_splitter.create_documents(text)
-        print(f"📚 Text split into {len(chunks)} chunks")
-        return chunks
+        chunks = self.split_text(text)
+        logger.debug("Text split", extra={"props": {"chunks": len(chunks)}})
+        return [chunk.text for chunk in chunks]
+
+    def split_text(self, text: str) -> list[TextChunk]:
+        sections = split_sections(text)
+        workers = settings.CHUNK_PROCESS_WORKERS
+        if len(text) < settings.CHUNK_PARALLEL_MIN_CHARS or workers < 2:
+            return chunk_sections(text, sections, self.chunk_size, self.chunk_overlap)
+
+        # Hand each worker a contiguous run of whole sections of similar size.
+        target = len(text) // (workers * 4) + 1
+        groups: list[list[tuple[int, int]]] = [[]]
+        for start, end in sections:
+            if groups[-1] and end - groups[-1][0][0] > target:
+                groups.append([])
+            groups[-1].append((start, end))
+
+        futures = []
+        pool = _get_process_pool()
+        for group in groups:
+            base = group[0][0]
+            futures.append(
+                pool.submit(
+                    chunk_sections,
+                    text[base : group[-1][1]],
+                    [(start - base, end - base) for start, end in group],
+                    self.chunk_size,
+                    self.chunk_overlap,
+                    base,
+                )
+            )
+        return [chunk for future in futures for chunk in future.result()]
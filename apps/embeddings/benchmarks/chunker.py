@@ -0,0 +1,62 @@
+"""Chunking throughput on data/data.md and a 100x copy of it.
+
+Run from ``apps/embeddings``::
+
+    python -m benchmarks.chunker
+
+Reports wall time, throughput and chunk counts for the serial chunker and
+for TextService, which fans large inputs out to the process pool.
+"""
+
+import argparse
+import time
+
+from app.services.text_service import (
+    TextService,
+    chunk_sections,
+    get_encoding,
+    split_sections,
+)
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default="data/data.md")
+    parser.add_argument("--multipliers", type=int, nargs="+", default=[1, 100])
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8") as f:
+        document = f.read()
+    service = TextService()
+    get_encoding()
+    # Warm the process pool so worker start-up isn't billed to the first run.
+    service.split_text(document * max(args.multipliers))
+
+    print(f"{'input':>8} {'MB':>8} {'mode':>9} {'seconds':>9} {'MB/s':>8} {'chunks':>8}")
+    for multiplier in args.multipliers:
+        text = document * multiplier
+        megabytes = len(text.encode("utf-8")) / 1e6
+        serial, serial_seconds = timed(
+            lambda: chunk_sections(
+                text, split_sections(text), service.chunk_size, service.chunk_overlap
+            )
+        )
+        pooled, pooled_seconds = timed(service.split_text, text)
+        for mode, chunks, seconds in (
+            ("serial", serial, serial_seconds),
+            ("service", pooled, pooled_seconds),
+        ):
+            print(
+                f"{multiplier:>7}x {megabytes:>8.2f} {mode:>9} {seconds:>9.3f} "
+                f"{megabytes / seconds:>8.2f} {len(chunks):>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
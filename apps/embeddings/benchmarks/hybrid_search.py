@@ -0,0 +1,145 @@
+"""Recall and latency of vector, BM25 and hybrid (RRF) retrieval.
+
+Run from ``apps/embeddings``::
+
+    python -m benchmarks.hybrid_search
+
+Builds a synthetic API-doc corpus where every chunk documents one endpoint
+of a resource, with its own path, header and error code. Embeddings are
+simulated as "topic" vectors (resource centroid plus noise), which is how
+dense embeddings treat such chunks: they know what a chunk is about but not
+which exact error code it lists. Each query asks about one exact token and
+has a single relevant chunk.
+
+The ``hybrid`` latency is the ``/retrieve/?mode=hybrid`` path after the
+query embedding: BM25 on one search-pool thread while the vector search runs
+on another, then reciprocal rank fusion.
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.core.executors import BlockingPool
+from app.db.local_store import LocalVectorStore
+from app.services.lexical_index import LexicalIndex
+from app.services.rerank import reciprocal_rank_fusion
+
+RESOURCES = [
+    "users", "orders", "invoices", "payments", "webhooks", "sessions", "tokens",
+    "projects", "teams", "files", "reports", "events", "alerts", "plans",
+]
+ACTIONS = ["list", "get", "create", "update", "delete", "search", "export"]
+TEMPLATES = [
+    "What does error {code} mean?",
+    "Which endpoint is {method} {path}?",
+    "When do I need the {header} header?",
+]
+
+
+def make_corpus(rng: random.Random, size: int):
+    chunks, exact = [], []
+    for i in range(size):
+        resource = RESOURCES[i % len(RESOURCES)]
+        action = ACTIONS[(i // len(RESOURCES)) % len(ACTIONS)]
+        method = "GET" if action in ("list", "get", "search", "export") else "POST"
+        path = f"/api/v{1 + i % 3}/{resource}/{action}/{i}"
+        header = f"X-{resource.title()}-{action.title()}-{i}"
+        code = f"ERR_{resource.upper()}_{4000 + i}"
+        chunks.append(
+            f"## {method} {path}\n{action.title()} {resource} for the current "
+            f"account. Requests must send the {header} header. On failure the "
+            f"API responds with {code} and a JSON body describing the "
+            f"{resource} problem."
+        )
+        exact.append({"code": code, "method": method, "path": path, "header": header})
+    return chunks, exact
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    np_rng = np.random.default_rng(0)
+    chunks, exact = make_corpus(rng, args.chunks)
+    centroids = np_rng.standard_normal((len(RESOURCES), args.dim))
+    embeddings = centroids[np.arange(args.chunks) % len(RESOURCES)]
+    embeddings = embeddings + 0.3 * np_rng.standard_normal(embeddings.shape)
+
+    root = tempfile.mkdtemp()
+    store = LocalVectorStore(root)
+    store.dim = args.dim
+    store.startup()
+    ids = list(range(args.chunks))
+    store.upsert_embeddings("bench", ids, chunks, embeddings.tolist(), "bench")
+
+    index = LexicalIndex(f"{root}/lexical")
+    started = time.perf_counter()
+    index.save(zip(ids, chunks))
+    save_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    index = LexicalIndex(f"{root}/lexical")
+    load_seconds = time.perf_counter() - started
+
+    pool = BlockingPool("bench-search", 2)
+    loop = asyncio.new_event_loop()
+    hits = {"vector": 0, "bm25": 0, "hybrid": 0}
+    latency = {"vector": [], "bm25": [], "hybrid": []}
+
+    async def hybrid_search(query: str, query_embedding: list[float]):
+        lexical = asyncio.create_task(pool.run(index.search, query, args.k))
+        vector = await pool.run(
+            store.search_similar, "bench", query_embedding, args.k, 0.0
+        )
+        return reciprocal_rank_fusion([vector, await lexical])[: args.k]
+
+    for _ in range(args.queries):
+        target = rng.randrange(args.chunks)
+        query = rng.choice(TEMPLATES).format(**exact[target])
+        noise = 0.3 * np_rng.standard_normal(args.dim)
+        query_embedding = (centroids[target % len(RESOURCES)] + noise).tolist()
+
+        started = time.perf_counter()
+        vector = store.search_similar("bench", query_embedding, args.k, 0.0)
+        latency["vector"].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        lexical = index.search(query, args.k)
+        latency["bm25"].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        hybrid = loop.run_until_complete(hybrid_search(query, query_embedding))
+        latency["hybrid"].append(time.perf_counter() - started)
+
+        for name, ranking in zip(hits, (vector, lexical, hybrid)):
+            hits[name] += any(hit["id"] == target for hit in ranking)
+    loop.close()
+    pool.shutdown()
+
+    print(
+        f"{args.chunks} chunks, {len(index.term_ids)} terms: BM25 build and save "
+        f"{save_seconds * 1000:.0f}ms, load {load_seconds * 1000:.1f}ms"
+    )
+    for name, count in hits.items():
+        print(f"recall@{args.k} {name:<7} {count / args.queries:.3f}")
+    for name, values in latency.items():
+        print(
+            f"latency {name:<14} p50={percentile(values, 0.5):.3f}ms "
+            f"p99={percentile(values, 0.99):.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
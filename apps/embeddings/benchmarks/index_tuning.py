@@ -0,0 +1,212 @@
+"""Recall@k and latency of ANN index configurations against exact search.
+
+Run from ``apps/embeddings``::
+
+    python -m benchmarks.index_tuning --vectors 50000 --dim 256
+    python -m benchmarks.index_tuning --npy embeddings.npy --target-recall 0.95
+    python -m benchmarks.index_tuning --local-user alice
+
+Vectors come from an ``.npy`` file, a user's shard in the local vector store
+or (by default) a synthetic clustered set; queries are held-out vectors with
+a little noise. Ground truth is exact numpy search. Each index type Milvus
+supports (HNSW, IVF_FLAT, IVF_SQ8, IVF_PQ) is built with faiss, which Milvus
+uses underneath, from the parameters ``app.db.index_config.recommend`` would
+pick at this size, then searched across a sweep of ``nprobe`` / ``ef``.
+The fastest configuration meeting ``--target-recall`` is printed as the
+``MILVUS_*`` settings to deploy; ``nprobe`` / ``ef`` can also be passed per
+request to ``/api/retrieve/``.
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from app.db.index_config import IndexConfig, ivf_nlist, pq_subquantizers, recommend
+
+NPROBES = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+EFS = [16, 32, 64, 128, 256, 512]
+
+
+def synthetic(num_vectors: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """Vectors around a few hundred topic centroids, like embedded doc chunks."""
+    centroids = rng.standard_normal((max(16, num_vectors // 200), dim))
+    vectors = centroids[rng.integers(0, len(centroids), num_vectors)]
+    return (vectors + 0.5 * rng.standard_normal(vectors.shape)).astype(np.float32)
+
+
+def load_vectors(args, rng: np.random.Generator) -> np.ndarray:
+    if args.npy:
+        return np.load(args.npy, mmap_mode="r").astype(np.float32)
+    if args.local_user:
+        from app.db.local_store import LocalVectorStore
+
+        shard = LocalVectorStore()._shard(args.local_user)
+        return np.asarray(shard.vectors[shard.live], dtype=np.float32)
+    return synthetic(args.vectors, args.dim, rng)
+
+
+def exact_search(
+    base: np.ndarray, queries: np.ndarray, k: int, metric: str
+) -> np.ndarray:
+    if metric == "L2":
+        scores = (base**2).sum(axis=1) - 2.0 * (queries @ base.T)
+    else:
+        scores = -(queries @ base.T)
+    top = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def candidates(num_vectors: int, dim: int, metric: str) -> list[IndexConfig]:
+    """HNSW and the IVF family with the build params recommended at this size."""
+    nlist = ivf_nlist(num_vectors)
+    hnsw = recommend(max(num_vectors, 20_000), dim, metric)
+    if hnsw.index_type != "HNSW":
+        hnsw = recommend(20_000, dim, metric)
+    return [
+        hnsw,
+        IndexConfig("IVF_FLAT", metric, {"nlist": nlist}),
+        IndexConfig("IVF_SQ8", metric, {"nlist": nlist}),
+        IndexConfig(
+            "IVF_PQ", metric, {"nlist": nlist, "m": pq_subquantizers(dim), "nbits": 8}
+        ),
+    ]
+
+
+def build(config: IndexConfig, base: np.ndarray):
+    dim = base.shape[1]
+    metric = faiss.METRIC_L2 if config.metric_type == "L2" else faiss.METRIC_INNER_PRODUCT
+    params = config.build_params
+    if config.index_type == "HNSW":
+        index = faiss.IndexHNSWFlat(dim, params["M"], metric)
+        index.hnsw.efConstruction = params["efConstruction"]
+    else:
+        quantizer = (
+            faiss.IndexFlatL2(dim) if metric == faiss.METRIC_L2 else faiss.IndexFlatIP(dim)
+        )
+        nlist = params["nlist"]
+        if config.index_type == "IVF_FLAT":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+        elif config.index_type == "IVF_SQ8":
+            index = faiss.IndexIVFScalarQuantizer(
+                quantizer, dim, nlist, faiss.ScalarQuantizer.QT_8bit, metric
+            )
+        else:
+            index = faiss.IndexIVFPQ(
+                quantizer, dim, nlist, params["m"], params["nbits"], metric
+            )
+        index.train(base)
+    index.add(base)
+    return index
+
+
+def sweep(config: IndexConfig, k: int) -> list[dict]:
+    if config.index_type == "HNSW":
+        return [{"ef": ef} for ef in EFS if ef >= k]
+    return [
+        {"nprobe": nprobe}
+        for nprobe in NPROBES
+        if nprobe <= config.build_params["nlist"]
+    ]
+
+
+def measure(index, params: dict, queries: np.ndarray, truth: np.ndarray, k: int):
+    if "ef" in params:
+        index.hnsw.efSearch = params["ef"]
+    else:
+        index.nprobe = params["nprobe"]
+    latencies, found = [], 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        _, rows = index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - started)
+        found += len(np.intersect1d(rows[0], expected))
+    latencies = np.asarray(latencies) * 1000
+    return (
+        found / truth.size,
+        float(np.percentile(latencies, 50)),
+        float(np.percentile(latencies, 99)),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--npy", help="(n, dim) float array of embeddings")
+    parser.add_argument("--local-user", help="use this user's local store shard")
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", choices=["L2", "IP", "COSINE"], default="L2")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)
+    rng = np.random.default_rng(0)
+    vectors = load_vectors(args, rng)
+    picks = rng.choice(len(vectors), args.queries, replace=False)
+    queries = vectors[picks] + 0.1 * rng.standard_normal(
+        (args.queries, vectors.shape[1])
+    ).astype(np.float32)
+    base = np.ascontiguousarray(np.delete(vectors, picks, axis=0))
+    if args.metric == "COSINE":
+        # Milvus COSINE is inner product over normalized vectors.
+        base /= np.linalg.norm(base, axis=1, keepdims=True)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    num_vectors, dim = base.shape
+    faiss_metric = "L2" if args.metric == "L2" else "IP"
+
+    truth = exact_search(base, queries, args.k, faiss_metric)
+    started = time.perf_counter()
+    for query in queries:
+        exact_search(base, query.reshape(1, -1), args.k, faiss_metric)
+    exact_ms = (time.perf_counter() - started) / args.queries * 1000
+    print(f"{num_vectors} vectors x {dim} dims, {args.queries} queries, k={args.k}")
+    print(f"exact search (FLAT): mean {exact_ms:.3f}ms per query, recall 1.000")
+
+    results = []
+    print(f"{'index':<10} {'params':<30} {'search':<14} {'recall':>7} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    for config in candidates(num_vectors, dim, args.metric):
+        started = time.perf_counter()
+        index = build(
+            IndexConfig(config.index_type, faiss_metric, config.build_params), base
+        )
+        build_seconds = time.perf_counter() - started
+        for params in sweep(config, args.k):
+            recall, p50, p99 = measure(index, params, queries, truth, args.k)
+            results.append((config, params, recall, p50))
+            print(
+                f"{config.index_type:<10} {str(config.build_params):<30} "
+                f"{str(params):<14} {recall:>7.3f} {p50:>8.3f} {p99:>8.3f}"
+            )
+        print(f"{'':<10} built in {build_seconds:.1f}s")
+
+    suggested = recommend(num_vectors, dim, args.metric)
+    print(f"\nHeuristic for {num_vectors} vectors: {suggested.index_type} "
+          f"{suggested.build_params} {suggested.search_params}")
+
+    passing = [r for r in results if r[2] >= args.target_recall]
+    if exact_ms <= min((r[3] for r in passing), default=float("inf")):
+        best = IndexConfig("FLAT", args.metric)
+        print(f"Exact search is fastest at recall >= {args.target_recall}:")
+    elif passing:
+        config, params, recall, p50 = min(passing, key=lambda r: r[3])
+        best = IndexConfig(
+            config.index_type, args.metric, config.build_params, params
+        )
+        print(
+            f"Fastest at recall >= {args.target_recall}: {config.index_type} "
+            f"{params} (recall {recall:.3f}, p50 {p50:.3f}ms):"
+        )
+    else:
+        print(f"No configuration reached recall {args.target_recall}")
+        return
+    for key, value in best.env().items():
+        print(f"  {key}='{value}'")
+
+
+if __name__ == "__main__":
+    main()
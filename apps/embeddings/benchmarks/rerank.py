@@ -0,0 +1,66 @@
+"""Latency of MMR re-ranking over over-fetched candidate sets.
+
+Run from ``apps/embeddings``::
+
+    python -m benchmarks.rerank
+
+Candidates are synthetic clusters of near-duplicate vectors so the
+duplicate-collapsing path is exercised as well. Each timing covers what the
+search endpoint pays per query: building the candidate matrix from the hit
+dicts (float32 rows as the local store returns them, or Python lists as
+Milvus does with ``--lists``) and the MMR selection. p50 and p99 are
+reported.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.services.rerank import candidate_matrix, mmr_select
+
+
+def make_candidates(rng, count: int, dim: int, cluster_size: int = 4):
+    centers = rng.standard_normal((count // cluster_size + 1, dim))
+    noise = 0.05 * rng.standard_normal((count, dim))
+    return (np.repeat(centers, cluster_size, axis=0)[:count] + noise).astype(
+        np.float32
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 50, 100, 200, 400])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument(
+        "--lists", action="store_true", help="hits carry lists, as from Milvus"
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        vectors = make_candidates(rng, size, args.dim)
+        query = vectors[0] + 0.1 * rng.standard_normal(args.dim).astype(np.float32)
+        docs = [
+            {"embedding": row.tolist() if args.lists else row.copy()}
+            for row in vectors
+        ]
+        mmr_select(query, candidate_matrix(docs), args.k)
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            selected = mmr_select(query, candidate_matrix(docs), args.k)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(
+            f"candidates={size:>4} dim={args.dim} k={args.k} "
+            f"p50={timings[len(timings) // 2] * 1e6:>7.1f}us "
+            f"p99={timings[int(len(timings) * 0.99)] * 1e6:>7.1f}us "
+            f"clusters_hit={len({row // 4 for row in selected})}/{len(selected)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
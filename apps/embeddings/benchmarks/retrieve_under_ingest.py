@@ -0,0 +1,209 @@
+"""Retrieve latency with and without a concurrent ingest.
+
+Run from ``apps/embeddings``::
+
+    python -m benchmarks.retrieve_under_ingest
+
+``/api/retrieve/`` is driven in-process through the ASGI app while an
+``IngestPipeline`` runs over a synthetic markdown corpus. Upstream calls are
+simulated: the embedder waits ``--embed-ms`` per call and the vector store
+blocks for ``--search-ms`` per search and ``--write-ms`` per write, like
+Milvus over the network; by default the ingest issues enough concurrent
+writes to occupy every ingest worker. Modes:
+
+* ``inline``: blocking calls run on the event loop (the previous behaviour
+  of the retrieve path),
+* ``shared``: ingest and search share one pool of ``INGEST_POOL_WORKERS``,
+* ``pools``: dedicated ingest and search pools with async embedding calls.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+
+from app.api.endpoints import search
+from app.core.config import get_settings
+from app.core.executors import BlockingPool, get_search_pool
+from app.db.local_store import LocalVectorStore
+from app.db.vector_store import get_vector_store
+from app.services.ingest_manifest import IngestManifest
+from app.services.ingest_pipeline import IngestPipeline
+from app.services.query_batcher import QueryEmbeddingBatcher, get_query_batcher
+from app.services.text_service import TextService
+
+settings = get_settings()
+
+
+class InlinePool(BlockingPool):
+    """Runs "blocking" work directly on the event loop."""
+
+    async def run(self, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+class SimulatedEmbedder:
+    def __init__(self, dim: int, delay: float, blocking: bool):
+        self.dim = dim
+        self.delay = delay
+        self.blocking = blocking
+
+    def _vectors(self, texts):
+        return np.random.default_rng(len(texts)).random((len(texts), self.dim)).tolist()
+
+    def create_embeddings(self, texts):
+        time.sleep(self.delay)
+        return self._vectors(texts)
+
+    async def acreate_embeddings(self, texts, pool):
+        if self.blocking:
+            return self.create_embeddings(texts)
+        await asyncio.sleep(self.delay)
+        return self._vectors(texts)
+
+
+class SimulatedRemoteStore(LocalVectorStore):
+    def __init__(self, path, search_delay, write_delay):
+        super().__init__(path)
+        self.search_delay = search_delay
+        self.write_delay = write_delay
+
+    def search_similar(self, *args, **kwargs):
+        time.sleep(self.search_delay)
+        return super().search_similar(*args, **kwargs)
+
+    def upsert_embeddings(self, *args, **kwargs):
+        time.sleep(self.write_delay)
+        return super().upsert_embeddings(*args, **kwargs)
+
+    def flush(self):
+        time.sleep(self.write_delay)
+
+
+def make_corpus(path: str, sections: int):
+    words = "endpoint header token request response error retry limit page".split()
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(sections):
+            body = " ".join(words[(i + j) % len(words)] for j in range(400))
+            f.write(f"## Section {i}\n\n{body} {i}\n\n")
+
+
+async def drive(client, stop: asyncio.Event, latencies: list, concurrency: int):
+    async def worker(n):
+        i = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/retrieve/?fetch_factor=1&mmr_lambda=1",
+                json={"user_id": "reader", "text": f"query {n} {i}"},
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+            i += 1
+
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+
+
+def summarize(name, latencies):
+    values = np.asarray(latencies) * 1000
+    print(
+        f"  {name:<14} n={len(values):>5} p50={np.percentile(values, 50):7.1f}ms "
+        f"p99={np.percentile(values, 99):7.1f}ms max={values.max():7.1f}ms"
+    )
+
+
+async def run(args, mode: str, root: str):
+    blocking = mode == "inline"
+    store = SimulatedRemoteStore(
+        os.path.join(root, mode), args.search_ms / 1000, args.write_ms / 1000
+    )
+    store.dim = args.dim
+    store.startup()
+    store.upsert_embeddings(
+        "reader",
+        list(range(200)),
+        [f"chunk {i}" for i in range(200)],
+        np.random.default_rng(0).random((200, args.dim)).tolist(),
+        "seed",
+    )
+    embedder = SimulatedEmbedder(args.dim, args.embed_ms / 1000, blocking)
+    if mode == "inline":
+        search_pool = ingest_pool = InlinePool("inline", 1)
+    elif mode == "shared":
+        search_pool = ingest_pool = BlockingPool("shared", settings.INGEST_POOL_WORKERS)
+    else:
+        search_pool = BlockingPool("search", settings.SEARCH_POOL_WORKERS)
+        ingest_pool = BlockingPool("ingest", settings.INGEST_POOL_WORKERS)
+
+    app = FastAPI()
+    app.include_router(search.router, prefix="/api")
+    app.dependency_overrides[get_vector_store] = lambda: store
+    app.dependency_overrides[get_search_pool] = lambda: search_pool
+    batcher = QueryEmbeddingBatcher(embedder, search_pool, window_ms=1)
+    app.dependency_overrides[get_query_batcher] = lambda: batcher
+
+    print(f"mode={mode}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        idle, stop = [], asyncio.Event()
+        reader = asyncio.create_task(drive(client, stop, idle, args.concurrency))
+        await asyncio.sleep(args.seconds)
+        stop.set()
+        await reader
+        summarize("idle", idle)
+
+        busy, stop = [], asyncio.Event()
+        reader = asyncio.create_task(drive(client, stop, busy, args.concurrency))
+        pipeline = IngestPipeline(
+            f"writer-{mode}",
+            TextService(),
+            embedder,
+            store,
+            IngestManifest(f"writer-{mode}", os.path.join(root, f"{mode}.json")),
+            insert_concurrency=args.insert_concurrency,
+            pool=ingest_pool,
+        )
+        started = time.perf_counter()
+        report = await pipeline.run([args.corpus])
+        ingest_seconds = time.perf_counter() - started
+        stop.set()
+        await reader
+        summarize("during ingest", busy)
+        print(
+            f"  ingest: {report.upserted_count} chunks in {ingest_seconds:.2f}s"
+        )
+    if mode != "inline":
+        search_pool.shutdown()
+        ingest_pool.shutdown()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["inline", "shared", "pools"])
+    parser.add_argument("--sections", type=int, default=400)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--embed-ms", type=float, default=30)
+    parser.add_argument("--search-ms", type=float, default=5)
+    parser.add_argument("--write-ms", type=float, default=40)
+    # Enough concurrent writes to occupy every worker of the ingest pool.
+    parser.add_argument(
+        "--insert-concurrency", type=int, default=settings.INGEST_POOL_WORKERS
+    )
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    args.corpus = os.path.join(root, "corpus.md")
+    make_corpus(args.corpus, args.sections)
+    for mode in args.modes:
+        await run(args, mode, root)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
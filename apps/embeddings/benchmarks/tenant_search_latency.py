@@ -0,0 +1,86 @@
+"""Search latency for one tenant as the number of tenants grows.
+
+Needs a running Milvus (see docker-compose.yml). Run from ``apps/embeddings``::
+
+    python -m benchmarks.tenant_search_latency --tenants 1 10 100 1000
+
+Every tenant gets ``--vectors-per-tenant`` random vectors in a scratch
+collection using the production schema (user_id partition key), written and
+searched through ``MilvusDB`` as the service does, so ids and the index
+metric always match the current schema. The p50 and
+p99 latency of tenant-filtered searches should stay roughly flat as the
+tenant count grows, because each search only probes one partition.
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from pymilvus import utility
+
+from app.db.milvus import MilvusDB
+from app.services.ingest_manifest import chunk_id, content_hash
+
+DIM = 1536
+
+
+def random_vector() -> list[float]:
+    return [random.random() for _ in range(DIM)]
+
+
+def run(tenant_counts: list[int], vectors_per_tenant: int, queries: int):
+    db = MilvusDB(collection_name="tenant_latency_benchmark")
+    db.init_connection()
+    if db.collection_name in utility.list_collections():
+        utility.drop_collection(db.collection_name)
+    db.startup()
+
+    loaded_tenants = 0
+    print(f"{'tenants':>8} {'entities':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for tenant_count in sorted(tenant_counts):
+        for tenant in range(loaded_tenants, tenant_count):
+            user_id = f"tenant-{tenant}"
+            texts = [f"chunk {i} of tenant {tenant}" for i in range(vectors_per_tenant)]
+            db.upsert_embeddings(
+                user_id,
+                [chunk_id(user_id, "benchmark", content_hash(text)) for text in texts],
+                texts,
+                [random_vector() for _ in texts],
+                source="benchmark",
+            )
+        loaded_tenants = tenant_count
+        db.flush()
+
+        latencies = []
+        for _ in range(queries):
+            tenant = random.randrange(tenant_count)
+            started = time.perf_counter()
+            # A threshold of -1 disables the range search: a plain top-k.
+            db.search_similar(
+                f"tenant-{tenant}", random_vector(), limit=5, score_threshold=-1.0
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(
+            f"{tenant_count:>8} {db.get_collection().num_entities:>10} "
+            f"{statistics.median(latencies):>8.2f} {p99:>8.2f}"
+        )
+
+    utility.drop_collection(db.collection_name)
+    db.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--vectors-per-tenant", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    run(args.tenants, args.vectors_per_tenant, args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,52 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.core.config import get_settings
-from app.api.endpoints import embedding, search
+from observability.instrumentation import (
+    METRICS_CONTENT_TYPE,
+    InstrumentationMiddleware,
+    render_metrics,
+)
+from observability.logging import setup_logging, shutdown_logging
+from app.api.endpoints import embedding, health, search
+from app.core.executors import get_ingest_pool, shutdown_pools
+from app.db.vector_store import connect_with_retry, get_vector_store
+from app.services.embedding_cache import get_embedding_cache
+from app.services.query_batcher import get_query_batcher
+from app.services.text_service import shutdown_process_pool
 
 settings = get_settings()
+setup_logging(settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = get_vector_store()
+    connecting = None
+    try:
+        db.startup()
+    except Exception as e:
+        # Keep serving so the readiness probe can report the failure, and
+        # keep trying so the service recovers once the store is reachable.
+        logger.error("Vector store startup failed", extra={"props": {"error": str(e)}})
+        connecting = asyncio.create_task(connect_with_retry(db, get_ingest_pool()))
+    yield
+    if connecting is not None:
+        connecting.cancel()
+        await asyncio.gather(connecting, return_exceptions=True)
+    if get_query_batcher.cache_info().currsize:
+        await get_query_batcher().aclose()
+    shutdown_pools()
+    shutdown_process_pool()
+    cache = get_embedding_cache()
+    if cache is not None:
+        cache.flush()
+    db.shutdown()
+    shutdown_logging()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -10,7 +54,16 @@ app = FastAPI(
     version=settings.APP_VERSION,
     docs_url="/docs",
     redoc_url=None,
+    lifespan=lifespan,
 )
 
+app.add_middleware(InstrumentationMiddleware)
+
 app.include_router(embedding.router, prefix="/api", tags=["Embedding"])
-app.include_router(search.router, prefix="/api", tags=["Search"])
\ No newline at end of file
+app.include_router(search.router, prefix="/api", tags=["Search"])
+app.include_router(health.router, prefix="/api", tags=["Health"])
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,40 @@
+import threading
+
+from app.services.embedding_cache import EmbeddingCache
+
+
+def test_disk_hits_survive_memory_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.db"), max_memory_items=1)
+    cache.put_many("m", ["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+
+    assert cache.get_many("m", ["a", "b", "c"]) == [[1.0, 2.0], [3.0, 4.0], None]
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_lookups_do_not_wait_for_the_writer(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.db"), max_memory_items=1)
+    cache.put_many("m", ["a", "b"], [[1.0], [2.0]])
+    results = []
+
+    # Hold the writer lock as a long ingest ``put_many`` would.
+    with cache._write_lock:
+        reader = threading.Thread(
+            target=lambda: results.append(cache.get_many("m", ["a"]))
+        )
+        reader.start()
+        reader.join(timeout=2)
+        assert not reader.is_alive()
+
+    assert results == [[[1.0]]]
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = EmbeddingCache(
+        str(tmp_path / "cache.db"), max_memory_items=1, max_disk_items=3
+    )
+    cache.put_many("m", [f"t{i}" for i in range(5)], [[float(i)] for i in range(5)])
+    cache.put_many("m", ["t4"], [[4.0]])
+
+    assert cache._disk_items == 3
+    (rows,) = cache._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    assert rows == 3
@@ -0,0 +1,39 @@
+from app.services.lexical_index import LexicalIndex
+
+
+def test_save_merges_upserts_and_deletes_with_the_stored_docs(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical"))
+    index.save([(1, "list users"), (2, "delete orders"), (3, "export invoices")])
+
+    index.save([(2, "delete orders permanently"), (4, "create teams")], deletes=[3])
+
+    reopened = LexicalIndex(str(tmp_path / "lexical"))
+    assert len(reopened) == 3
+    assert [hit["text"] for hit in reopened.search("orders")] == [
+        "delete orders permanently"
+    ]
+    assert reopened.search("invoices") == []
+    assert {hit["id"] for hit in reopened.search("users teams")} == {1, 4}
+
+
+def test_search_reads_hit_texts_from_disk(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical"))
+    index.save((id_, f"chunk {id_} mentions ERR_{id_}") for id_ in range(100))
+
+    assert not hasattr(index, "texts")
+    hits = index.search("err_42 err_7", limit=2)
+    assert sorted((hit["id"], hit["text"]) for hit in hits) == [
+        (7, "chunk 7 mentions ERR_7"),
+        (42, "chunk 42 mentions ERR_42"),
+    ]
+
+
+def test_clear_drops_the_stored_docs(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical"))
+    index.save([(1, "list users")])
+
+    index.clear()
+    index.save([(2, "create teams")])
+
+    assert not index.search("users")
+    assert [hit["id"] for hit in index.search("teams")] == [2]
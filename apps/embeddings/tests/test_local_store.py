@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+
+from app.db.local_store import _Shard
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def test_search_returns_hits_read_under_the_lock(tmp_path):
+    shard = _Shard(str(tmp_path), dim=2, index_type="flat", normalized=True)
+    shard.upsert([1, 2], ["east", "north"], [unit(1, 0), unit(0, 1)], "doc")
+
+    hits = shard.search(np.asarray(unit(1, 0.1)), limit=2, include_vectors=True)
+
+    assert [(id_, text) for id_, text, _, _ in hits] == [(1, "east"), (2, "north")]
+    assert np.allclose(hits[0][2], unit(1, 0))
+    assert shard.search(np.asarray(unit(1, 0)), limit=1)[0][2] is None
+
+
+def test_index_is_written_on_flush_not_per_upsert(tmp_path):
+    shard = _Shard(str(tmp_path), dim=2, index_type="hnsw", normalized=True)
+    shard.upsert([1], ["east"], [unit(1, 0)], "doc")
+    shard.search(np.asarray(unit(1, 0)), limit=1)  # builds and saves the index
+    saved_at = os.stat(shard.index_path).st_mtime_ns
+
+    shard.upsert([2], ["north"], [unit(0, 1)], "doc")
+
+    assert os.stat(shard.index_path).st_mtime_ns == saved_at
+    assert shard.index_dirty
+    shard.flush()
+    assert not shard.index_dirty
+    reopened = _Shard(str(tmp_path), dim=2, index_type="hnsw", normalized=True)
+    assert [text for _, text, _, _ in reopened.search(np.asarray(unit(0, 1)), 1)] == [
+        "north"
+    ]
@@ -0,0 +1,111 @@
+import asyncio
+
+from app.services.query_batcher import QueryEmbeddingBatcher
+
+
+class StubEmbedder:
+    """Records every upstream call and embeds a text as ``[len(text)]``."""
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    async def acreate_embeddings(self, texts, pool):
+        self.calls.append(list(texts))
+        await asyncio.sleep(0)
+        return [[float(len(text))] for text in texts]
+
+
+def test_concurrent_requests_within_the_window_share_one_call():
+    embedder = StubEmbedder()
+
+    async def run():
+        batcher = QueryEmbeddingBatcher(embedder, pool=None, window_ms=20)
+        results = await asyncio.gather(
+            *(batcher.embed(text) for text in ("a", "bb", "ccc"))
+        )
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+
+    assert embedder.calls == [["a", "bb", "ccc"]]
+    assert results == [[1.0], [2.0], [3.0]]
+    assert batcher.stats() == {"requests": 3, "batches": 1, "deduplicated": 0}
+
+
+def test_duplicate_texts_share_one_future():
+    embedder = StubEmbedder()
+
+    async def run():
+        batcher = QueryEmbeddingBatcher(embedder, pool=None, window_ms=20)
+        first = asyncio.ensure_future(batcher.embed("same"))
+        second = asyncio.ensure_future(batcher.embed("same"))
+        await asyncio.sleep(0)
+        shared = batcher._pending["same"]
+        return batcher, shared, await first, await second
+
+    batcher, shared, first, second = asyncio.run(run())
+
+    assert embedder.calls == [["same"]]
+    assert first == second == [4.0]
+    assert shared.done() and shared.result() == [4.0]
+    assert batcher.deduplicated == 1
+
+
+def test_a_full_batch_is_flushed_without_waiting_for_the_window():
+    embedder = StubEmbedder()
+
+    async def run():
+        batcher = QueryEmbeddingBatcher(
+            embedder, pool=None, window_ms=10_000, max_batch_size=2
+        )
+        return await asyncio.wait_for(
+            asyncio.gather(batcher.embed("x"), batcher.embed("yy")), timeout=1
+        )
+
+    assert asyncio.run(run()) == [[1.0], [2.0]]
+    assert embedder.calls == [["x", "yy"]]
+
+
+class HangingEmbedder:
+    async def acreate_embeddings(self, texts, pool):
+        await asyncio.sleep(10)
+
+
+def test_running_batches_are_tracked_until_done():
+    release = asyncio.Event()
+
+    class GatedEmbedder(StubEmbedder):
+        async def acreate_embeddings(self, texts, pool):
+            await release.wait()
+            return await super().acreate_embeddings(texts, pool)
+
+    async def run():
+        batcher = QueryEmbeddingBatcher(GatedEmbedder(), pool=None, window_ms=1)
+        call = asyncio.ensure_future(batcher.embed("a"))
+        await asyncio.sleep(0.01)
+        running = len(batcher._tasks)
+        release.set()
+        result = await call
+        await asyncio.sleep(0)
+        return running, len(batcher._tasks), result
+
+    assert asyncio.run(run()) == (1, 0, [1.0])
+
+
+def test_aclose_cancels_running_and_pending_batches():
+    async def run():
+        batcher = QueryEmbeddingBatcher(HangingEmbedder(), pool=None, window_ms=1)
+        running = asyncio.ensure_future(batcher.embed("running"))
+        await asyncio.sleep(0.01)
+        assert len(batcher._tasks) == 1
+        batcher.window = 10
+        pending = asyncio.ensure_future(batcher.embed("pending"))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(batcher.aclose(), timeout=1)
+        results = await asyncio.gather(running, pending, return_exceptions=True)
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+
+    assert [type(result) for result in results] == [asyncio.CancelledError] * 2
+    assert batcher._tasks == set()
@@ -0,0 +1,57 @@
+import asyncio
+
+from app.core.executors import BlockingPool
+from app.db.vector_store import connect_with_retry
+
+
+class FlakyStore:
+    """Fails ``startup`` until it has been called ``failures + 1`` times."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.attempts = 0
+        self.ready = False
+
+    def startup(self):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("store unreachable")
+        self.ready = True
+
+
+def test_startup_is_retried_until_the_store_is_reachable():
+    store = FlakyStore(failures=2)
+    pool = BlockingPool("test", 1)
+
+    asyncio.run(
+        asyncio.wait_for(
+            connect_with_retry(store, pool, initial_delay=0.01, max_delay=0.02),
+            timeout=2,
+        )
+    )
+    pool.shutdown()
+
+    assert store.ready
+    assert store.attempts == 3
+
+
+def test_retrying_stops_when_cancelled():
+    store = FlakyStore(failures=1_000)
+    pool = BlockingPool("test", 1)
+
+    async def run():
+        task = asyncio.create_task(
+            connect_with_retry(store, pool, initial_delay=0.01, max_delay=0.01)
+        )
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return task
+
+    task = asyncio.run(run())
+    attempts = store.attempts
+    pool.shutdown()
+
+    assert task.cancelled()
+    assert 0 < attempts < 1_000
+    assert not store.ready
@@ -0,0 +1,2 @@
+"""Request IDs, timing spans, Prometheus metrics and JSON logging shared by
+the chat and embeddings services."""
@@ -0,0 +1,286 @@
+"""Request IDs, per-stage timing spans and Prometheus metrics.
+
+The spans of a request are collected in a context variable, so everything
+running on its behalf (tasks it spawns, pool threads started with a copied
+context) adds to the same list. ``InstrumentationMiddleware`` turns them into
+a ``Server-Timing`` header and a closing "Request timing" log line, and every
+span is also observed into a histogram served on ``/metrics``.
+
+Recording a span is a ``perf_counter`` call, a bisect and a list append, so
+this stays on in production. The request ID arrives in (or is generated for)
+``X-Request-ID``, is echoed on the response, is stamped on every log record
+and is forwarded on calls to other services.
+"""
+
+import bisect
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# Routes that are polled and would only add noise to the request log.
+QUIET_ROUTES = ("/metrics", "/health")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_spans_var: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar(
+    "spans", default=None
+)
+
+REGISTRY: List = []
+
+
+class Histogram:
+    """A labelled histogram rendered in the Prometheus text format."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> per-bucket counts (last one is +Inf) followed by the sum
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labels: str):
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bucket] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, series in sorted(snapshot.items()):
+            pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = ",".join(pairs + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Counter:
+    """A labelled, monotonically increasing count."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = dict(self._values)
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for labels, value in sorted(snapshot.items()):
+            pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels)]
+            suffix = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}{suffix} {value:g}")
+        return lines
+
+
+class Gauge:
+    """A value read from ``read`` whenever metrics are rendered."""
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        REGISTRY.append(self)
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.read():g}",
+        ]
+
+
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds",
+    "Time spent in each stage of a request.",
+    ("stage",),
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the last byte of the response is sent.",
+    ("method", "route", "status"),
+)
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+def outgoing_headers() -> Dict[str, str]:
+    """Headers that carry the current request ID to another service."""
+    request_id = request_id_var.get()
+    return {REQUEST_ID_HEADER: request_id} if request_id else {}
+
+
+def record(stage: str, seconds: float):
+    """Record a stage measured elsewhere, e.g. by another service."""
+    STAGE_SECONDS.observe(seconds, stage)
+    spans = _spans_var.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def server_timing(spans: List[Tuple[str, float]]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in spans)
+
+
+def parse_server_timing(header: str) -> List[Tuple[str, float]]:
+    """``(name, seconds)`` pairs from a ``Server-Timing`` header value."""
+    spans = []
+    for entry in header.split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        for param in params:
+            key, _, value = param.partition("=")
+            if name and key == "dur":
+                try:
+                    spans.append((name, float(value) / 1000))
+                except ValueError:
+                    pass
+    return spans
+
+
+class InstrumentationMiddleware:
+    """Assigns request IDs and reports each request's spans.
+
+    ``Server-Timing`` can only list spans that finished before the response
+    headers went out (its ``total`` is the time until then); streamed
+    responses report the rest in the closing "Request timing" log line.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _header(scope, REQUEST_ID_HEADER) or uuid.uuid4().hex
+        spans: List[Tuple[str, float]] = []
+        request_id_token = request_id_var.set(request_id)
+        spans_token = _spans_var.set(spans)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = spans + [("total", time.perf_counter() - started)]
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", []))
+                    + [
+                        (REQUEST_ID_HEADER.lower().encode(), request_id.encode("latin-1")),
+                        (b"server-timing", server_timing(timing).encode()),
+                    ],
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(elapsed, scope["method"], route, str(status))
+            if not any(quiet in route for quiet in QUIET_ROUTES):
+                logger.info(
+                    "Request timing",
+                    extra={
+                        "props": {
+                            "method": scope["method"],
+                            "route": route,
+                            "status": status,
+                            "duration_ms": round(elapsed * 1000, 2),
+                            "spans_ms": _spans_ms(spans),
+                        }
+                    },
+                )
+            _spans_var.reset(spans_token)
+            request_id_var.reset(request_id_token)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request ID in the emitting thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+def _spans_ms(spans: List[Tuple[str, float]]) -> Dict[str, float]:
+    # Stages can repeat (e.g. two retrievals); later ones get a #n suffix.
+    result: Dict[str, float] = {}
+    for name, seconds in spans:
+        key, n = name, 1
+        while key in result:
+            n += 1
+            key = f"{name}#{n}"
+        result[key] = round(seconds * 1000, 2)
+    return result
+
+
+def _header(scope, name: str) -> Optional[str]:
+    wanted = name.lower().encode()
+    for key, value in scope.get("headers", ()):
+        if key == wanted:
+            return value.decode("latin-1")[:128] or None
+    return None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
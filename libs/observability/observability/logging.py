@@ -0,0 +1,71 @@
+"""JSON logs written by a background thread.
+
+Every record becomes one JSON object carrying the request ID and any
+``extra={"props": {...}}`` fields.
+"""
+
+import atexit
+import json
+import logging
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from observability.instrumentation import RequestIdFilter
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+class CustomJSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        log_record = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            log_record["request_id"] = request_id
+        if hasattr(record, "props"):
+            log_record.update(record.props)
+        return json.dumps(log_record, default=str)
+
+
+def setup_logging(level: str = "INFO") -> None:
+    """Route records through a queue so request handlers never block on I/O.
+
+    The handler on the root logger only enqueues; a ``QueueListener`` thread
+    formats records as JSON and writes them to stderr. Records below
+    ``level`` are dropped before any formatting happens.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    json_handler = logging.StreamHandler()
+    json_handler.setFormatter(CustomJSONFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = QueueHandler(log_queue)
+    _queue_handler.addFilter(RequestIdFilter())
+
+    logger = logging.getLogger()
+    logger.setLevel(level.upper())
+    logger.addHandler(_queue_handler)
+
+    _listener = QueueListener(log_queue, json_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        _listener, _queue_handler = None, None